@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks VimhdlClient running headless (with the vim mock) against the
+stub hdlcc server. Results are written as JSON and can be compared against
+a previous run to catch regressions:
+
+    python .ci/benchmarks/bench_client.py --output baseline.json
+    python .ci/benchmarks/bench_client.py --compare baseline.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import logging
+import os.path as p
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, p.abspath(p.join(p.dirname(__file__), '..')))
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.headless_client import HeadlessVim, createClient
+from vimhdl_tests.stub_server import StubServer
+
+from generate_project import generateProject
+
+import vimhdl.project_file as project_file_reader
+from vimhdl.base_requests import BaseRequest
+# pylint: enable=import-error,wrong-import-position
+
+_logger = logging.getLogger(__name__)
+
+# Metrics where higher values are better, all others are the opposite
+_HIGHER_IS_BETTER = ('hooks_calls_per_sec', 'hooks_requests_per_sec')
+
+def _percentile(values, percent):
+    """
+    Returns the given percentile of values
+    """
+    values = sorted(values)
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+def _summarize(name, times):
+    """
+    Returns a dict with statistics of times, in milliseconds
+    """
+    times = [1000 * x for x in times]
+    return {'%s_p50_ms' % name: _percentile(times, 50),
+            '%s_p95_ms' % name: _percentile(times, 95),
+            '%s_p99_ms' % name: _percentile(times, 99),
+            '%s_max_ms' % name: max(times)}
+
+def _getMaxRss():
+    """
+    Returns the peak resident set size of the process in KB, if available
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return rss / 1024 if sys.platform == 'darwin' else rss
+
+def benchGetMessages(client, buffers, iterations):
+    """
+    Times getMessages cycling through buffers. Requests for one buffer also
+    fetch messages for the others, so the cache is exercised as well
+    """
+    times = []
+    for i in range(iterations):
+        vim_buffer = buffers[i % len(buffers)]
+        start = time.time()
+        client.getMessages(vim_buffer)
+        times.append(time.time() - start)
+    return _summarize('get_messages', times)
+
+def benchGetMessagesUncached(client, buffers, iterations):
+    """
+    Times getMessages when every call has to reach the server
+    """
+    times = []
+    for i in range(iterations):
+        client._messages_cache.clear()  # pylint: disable=protected-access
+        start = time.time()
+        client.getMessages(buffers[i % len(buffers)])
+        times.append(time.time() - start)
+    return _summarize('get_messages_uncached', times)
+
+def benchHooks(client, server, calls):
+    """
+    Calls the hooks Vim runs on events as fast as possible, measuring how
+    many calls the client handles per second, how many requests the server
+    gets and how many threads are alive at most
+    """
+    threads_before = threading.active_count()
+    requests_before = sum(server.requests.values())
+    max_threads = threads_before
+
+    start = time.time()
+    for i in range(calls):
+        if i % 3 == 0:
+            client.requestUiMessages('CursorMoved')
+        elif i % 3 == 1:
+            client.onBufferVisit()
+        else:
+            client.onBufferLeave()
+        max_threads = max(max_threads, threading.active_count())
+    calls_elapsed = time.time() - start
+
+    BaseRequest.async_queue.wait(timeout=10)
+    requests_elapsed = time.time() - start
+    # Post responses that were queued
+    client.processPendingEvents()
+
+    return {
+        'hooks_calls_per_sec': calls / calls_elapsed,
+        'hooks_requests_per_sec':
+            (sum(server.requests.values()) - requests_before) /
+            requests_elapsed,
+        'hooks_max_threads': max_threads,
+        'hooks_extra_threads': max_threads - threads_before}
+
+def benchMemory(client, buffers, iterations):
+    """
+    Measures memory allocated while getting messages
+    """
+    result = {}
+    try:
+        import tracemalloc
+    except ImportError:  # Python 2.x
+        tracemalloc = None
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+        for i in range(iterations):
+            client.getMessages(buffers[i % len(buffers)])
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['memory_retained_kb'] = current / 1024.0
+        result['memory_peak_kb'] = peak / 1024.0
+
+    max_rss = _getMaxRss()
+    if max_rss is not None:
+        result['max_rss_kb'] = max_rss
+    return result
+
+def run(args):
+    """
+    Runs all benchmarks, returning the results
+    """
+    log_dir = tempfile.mkdtemp(prefix='vimhdl_bench_')
+
+    if args.project:
+        project_file = p.join(args.project, 'vimhdl.prj')
+        paths = [source.path for source in
+                 project_file_reader.getSources(project_file)]
+        messages_file = p.join(args.project, 'messages.json')
+        if p.exists(messages_file):
+            with open(messages_file) as fd:
+                messages_by_path = json.load(fd)
+        else:
+            messages_by_path = dict((x, args.messages) for x in paths)
+    else:
+        project_file, paths, messages_by_path = generateProject(
+            p.join(log_dir, 'project'), files=args.files,
+            fanout=args.fanout, depth=args.depth,
+            message_density=args.messages)
+
+    server = StubServer(messages=args.messages, latency=args.latency,
+                        failure_rate=args.failure_rate,
+                        messages_by_path=messages_by_path).start()
+    results = {}
+    try:
+        # Logging at the default level would be measured as well
+        with HeadlessVim({'vimhdl_log_dir': log_dir,
+                          'vimhdl_log_level': 'WARNING'}) as headless:
+            buffers = [headless.addBuffer(path, project_file)
+                       for path in paths[:args.buffers]]
+            client = createClient(server)
+            try:
+                results.update(benchGetMessages(client, buffers,
+                                                args.iterations))
+                results.update(benchGetMessagesUncached(client, buffers,
+                                                        args.iterations))
+                results.update(benchHooks(client, server, args.hook_calls))
+                results.update(benchMemory(client, buffers,
+                                           args.iterations))
+            finally:
+                # Requests still queued would fail once the server is
+                # stopped, logging warnings and counting as failures
+                BaseRequest.async_queue.wait()
+                client.shutdown()
+    finally:
+        server.stop()
+        shutil.rmtree(log_dir)
+
+    return {'meta': {'python': platform.python_version(),
+                     'sources': len(paths),
+                     'platform': platform.platform(),
+                     'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'parameters': dict(vars(args))},
+            'results': results}
+
+def compare(results, baseline, tolerance):
+    """
+    Prints how results compare to baseline and returns the names of the
+    metrics that got worse by more than tolerance (a ratio)
+    """
+    regressions = []
+    for name in sorted(baseline):
+        if name not in results or not baseline[name]:
+            continue
+        change = (results[name] - baseline[name]) / float(baseline[name])
+        if name in _HIGHER_IS_BETTER:
+            change = -change
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print("%-32s %12.3f %12.3f %+8.1f%%%s" % (
+            name, baseline[name], results[name], 100 * change,
+            '  <-- regression' if regressed else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=float, default=10,
+                        help="Average number of messages for each path")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Server latency for each request in seconds")
+    parser.add_argument('--failure-rate', type=float, default=0,
+                        help="Ratio of requests that fail")
+    parser.add_argument('--buffers', type=int, default=10,
+                        help="Number of HDL buffers open")
+    parser.add_argument('--files', type=int, default=100,
+                        help="Number of sources on the generated project")
+    parser.add_argument('--fanout', type=int, default=2,
+                        help="Units each generated unit depends on")
+    parser.add_argument('--depth', type=int, default=10,
+                        help="Dependency levels of the generated project")
+    parser.add_argument('--project',
+                        help="Use the project on this directory instead of "
+                        "generating one (see generate_project.py)")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--hook-calls', type=int, default=300)
+    parser.add_argument('--output', help="Where to write results to")
+    parser.add_argument('--compare', help="Results of a previous run")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Ratio a metric can get worse by before being "
+                        "considered a regression")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(report, fd, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)['results']
+        regressions = compare(report['results'], baseline, args.tolerance)
+        if regressions:
+            print("Regressions found: %s" % ', '.join(regressions))
+            sys.exit(1)
+    else:
+        for name, value in sorted(report['results'].items()):
+            print("%-32s %12.3f" % (name, value))
+
+if __name__ == '__main__':
+    main()
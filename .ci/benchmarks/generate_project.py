@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Generates synthetic HDL projects for testing vim-hdl at scale. Units are
+spread over a number of libraries and dependency levels; each unit
+instantiates 'fanout' units from the level below, so the deepest units have
+'depth' levels of dependencies. Besides the sources and a matching
+vimhdl.prj, messages.json maps each source to the number of messages a
+StubServer should report for it:
+
+    python .ci/benchmarks/generate_project.py /tmp/project --files 2000
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import os.path as p
+import random
+from collections import namedtuple
+
+Project = namedtuple('Project', ('project_file', 'sources',
+                                 'messages_by_path'))
+
+_VHDL_PACKAGE = """\
+package {library}_pkg is
+    constant WIDTH : integer := 8;
+end package;
+"""
+
+_VHDL_UNIT = """\
+library ieee;
+use ieee.std_logic_1164.all;
+
+{libraries}
+use {library}.{library}_pkg.all;
+
+entity {name} is
+    port (
+        clk  : in  std_logic;
+        din  : in  std_logic_vector(WIDTH - 1 downto 0);
+        dout : out std_logic_vector(WIDTH - 1 downto 0));
+end entity;
+
+architecture rtl of {name} is
+{signals}
+begin
+{instances}
+    process(clk)
+    begin
+        if rising_edge(clk) then
+            dout <= {result};
+        end if;
+    end process;
+end architecture;
+"""
+
+_VERILOG_UNIT = """\
+module {name} (
+    input  wire       clk,
+    input  wire [7:0] din,
+    output reg  [7:0] dout);
+{signals}
+{instances}
+    always @(posedge clk)
+        dout <= {result};
+endmodule
+"""
+
+def _getLevel(index, count, depth):
+    """
+    Dependency level of the unit at index out of count units
+    """
+    return index * depth // max(count, 1)
+
+def _pickDependencies(rng, index, count, depth, fanout):
+    """
+    Returns indexes of units from the level below the unit at index
+    """
+    level = _getLevel(index, count, depth)
+    if level == 0:
+        return []
+    # First index of each level, i.e., ceil(level * count / depth)
+    start = -(-(level - 1) * count // depth)
+    end = -(-level * count // depth)
+    candidates = range(start, end)
+    return sorted(rng.sample(candidates, min(fanout, len(candidates))))
+
+def _vhdlUnit(name, library, dependencies):
+    """
+    Returns the contents of a VHDL entity instantiating dependencies, a list
+    of (library, name) tuples
+    """
+    libraries = sorted(set([library] + [x[0] for x in dependencies]))
+    signals = ['    signal s_%d : std_logic_vector(WIDTH - 1 downto 0);' % i
+               for i in range(len(dependencies))]
+    instances = ['    u_%d : entity %s.%s port map (clk, din, s_%d);' %
+                 (i, dep_library, dep_name, i)
+                 for i, (dep_library, dep_name) in enumerate(dependencies)]
+    return _VHDL_UNIT.format(
+        name=name, library=library,
+        libraries='\n'.join('library %s;' % x for x in libraries),
+        signals='\n'.join(signals), instances='\n'.join(instances),
+        result=' xor '.join('s_%d' % i for i in range(len(dependencies)))
+        or 'din')
+
+def _verilogUnit(name, dependencies):
+    """
+    Returns the contents of a Verilog module instantiating dependencies, a
+    list of module names
+    """
+    signals = ['    wire [7:0] s_%d;' % i for i in range(len(dependencies))]
+    instances = ['    %s u_%d (clk, din, s_%d);' % (dep_name, i, i)
+                 for i, dep_name in enumerate(dependencies)]
+    return _VERILOG_UNIT.format(
+        name=name, signals='\n'.join(signals),
+        instances='\n'.join(instances),
+        result=' ^ '.join('s_%d' % i for i in range(len(dependencies)))
+        or 'din')
+
+def _write(path, content):
+    if not p.isdir(p.dirname(path)):
+        os.makedirs(p.dirname(path))
+    with open(path, 'w') as fd:
+        fd.write(content)
+
+def generateProject(target, files=100, fanout=2, depth=10, libraries=4,
+                    verilog_ratio=0, message_density=0, builder=None, seed=0):
+    """
+    Writes a project with 'files' sources to the 'target' directory (VHDL
+    packages are not included in the count). verilog_ratio is the ratio of
+    sources written as Verilog modules and message_density is the average
+    number of messages per source. The same arguments always generate the
+    same project
+    """
+    rng = random.Random(seed)
+    target = p.abspath(target)
+    verilog_count = int(round(files * verilog_ratio))
+    vhdl_count = files - verilog_count
+    libraries = max(1, libraries)
+
+    # Entries are (language, library, path)
+    sources = []
+
+    for index in range(libraries):
+        library = 'lib_%d' % index
+        path = p.join(target, library, '%s_pkg.vhd' % library)
+        _write(path, _VHDL_PACKAGE.format(library=library))
+        sources.append(('vhdl', library, path))
+
+    names = ['unit_%04d' % i for i in range(vhdl_count)]
+    for index, name in enumerate(names):
+        library = 'lib_%d' % (index % libraries)
+        dependencies = [
+            ('lib_%d' % (x % libraries), names[x])
+            for x in _pickDependencies(rng, index, vhdl_count, depth, fanout)]
+        path = p.join(target, library, name + '.vhd')
+        _write(path, _vhdlUnit(name, library, dependencies))
+        sources.append(('vhdl', library, path))
+
+    names = ['module_%04d' % i for i in range(verilog_count)]
+    for index, name in enumerate(names):
+        dependencies = [
+            names[x] for x in
+            _pickDependencies(rng, index, verilog_count, depth, fanout)]
+        path = p.join(target, 'verilog', name + '.v')
+        _write(path, _verilogUnit(name, dependencies))
+        sources.append(('verilog', 'verilog_lib', path))
+
+    lines = ['# Generated by generate_project.py']
+    if builder is not None:
+        lines += ['builder = %s' % builder]
+    lines += ['%s %s %s' % (language, library, p.relpath(path, target))
+              for language, library, path in sources]
+
+    project_file = p.join(target, 'vimhdl.prj')
+    _write(project_file, '\n'.join(lines) + '\n')
+
+    messages_by_path = {}
+    for _, _, path in sources:
+        if message_density:
+            messages_by_path[path] = int(
+                rng.expovariate(1.0 / message_density))
+        else:
+            messages_by_path[path] = 0
+
+    with open(p.join(target, 'messages.json'), 'w') as fd:
+        json.dump(messages_by_path, fd, indent=2, sort_keys=True)
+
+    return Project(project_file, [x[2] for x in sources], messages_by_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('target', help="Directory to write the project to")
+    parser.add_argument('--files', type=int, default=100,
+                        help="Number of sources")
+    parser.add_argument('--fanout', type=int, default=2,
+                        help="Units each unit depends on")
+    parser.add_argument('--depth', type=int, default=10,
+                        help="Number of dependency levels")
+    parser.add_argument('--libraries', type=int, default=4,
+                        help="Number of VHDL libraries")
+    parser.add_argument('--verilog-ratio', type=float, default=0,
+                        help="Ratio of sources written in Verilog")
+    parser.add_argument('--message-density', type=float, default=0,
+                        help="Average number of messages per source")
+    parser.add_argument('--builder',
+                        help="Builder to set on the project file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    project = generateProject(
+        args.target, files=args.files, fanout=args.fanout, depth=args.depth,
+        libraries=args.libraries, verilog_ratio=args.verilog_ratio,
+        message_density=args.message_density, builder=args.builder,
+        seed=args.seed)
+
+    print("Wrote %d sources, project file is %s" % (len(project.sources),
+                                                     project.project_file))
+
+if __name__ == '__main__':
+    main()
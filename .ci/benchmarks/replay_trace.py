@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Replays the requests of a trace recorded with g:vimhdl_trace against the
+stub server or a running hdlcc server and reports where time went, both on
+the original session and on the replay:
+
+    python .ci/benchmarks/replay_trace.py <session>.trace.jsonl --speed 10
+    python .ci/benchmarks/replay_trace.py <trace> --url http://localhost:5000
+
+Requests made from Vim's main thread are sent in sequence, the others are
+sent from a pool of threads like the client does. Only requests are
+replayed; the time entry points took is reported from the trace
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os.path as p
+import sys
+import time
+from threading import Lock
+
+sys.path.insert(0, p.abspath(p.join(p.dirname(__file__), '..')))
+sys.path.insert(0, p.abspath(p.join(p.dirname(__file__), '..', '..',
+                                    'python')))
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl_tests.stub_server import StubServer
+from vimhdl.base_requests import AsyncRequestQueue
+from vimhdl.trace import readTrace, toChromeTrace
+# pylint: enable=import-error,wrong-import-position
+
+def _percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+def _summarize(durations):
+    """
+    Returns statistics of durations, in milliseconds
+    """
+    return {'count': len(durations),
+            'total_ms': 1000 * sum(durations),
+            'p50_ms': 1000 * _percentile(durations, 50),
+            'p95_ms': 1000 * _percentile(durations, 95),
+            'max_ms': 1000 * max(durations or [0])}
+
+def _groupBy(records, kind):
+    """
+    Returns a dict with the durations of records of kind grouped by name
+    """
+    result = {}
+    for record in records:
+        if record['k'] == kind:
+            result.setdefault(record['n'], []).append(record['d'])
+    return result
+
+def replay(records, url, speed, timeout):
+    """
+    Sends the requests on records to url. Requests start at their original
+    times divided by speed, or as soon as possible if speed is 0. Returns a
+    list of (record, latency, ok) for every request
+    """
+    import requests
+
+    results = []
+    lock = Lock()
+
+    def send(record):
+        start = time.time()
+        try:
+            response = requests.post(url + '/' + record['n'],
+                                     data=record['p'], timeout=timeout)
+            # Make sure streamed responses are fully read
+            _ = response.content
+            ok = response.ok
+        except requests.exceptions.RequestException:
+            ok = False
+        with lock:
+            results.append((record, time.time() - start, ok))
+
+    pool = AsyncRequestQueue()
+    start = time.time()
+    for record in records:
+        if record['k'] != 'request':
+            continue
+        if speed:
+            delay = start + record['t'] / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        if record['main']:
+            send(record)
+        else:
+            pool.put(lambda record=record: send(record))
+
+    pool.wait()
+    return results
+
+def report(header, records, results):
+    """
+    Returns a dict with statistics of the trace and its replay
+    """
+    duration = max([x['t'] + x['d'] for x in records] or [0])
+    main_thread = sum(x['d'] for x in records
+                      if x['k'] == 'call' and x['main'])
+
+    replayed = {}
+    failures = {}
+    for record, latency, ok in results:
+        replayed.setdefault(record['n'], []).append(latency)
+        failures[record['n']] = failures.get(record['n'], 0) + (not ok)
+
+    requests = {}
+    for name, durations in _groupBy(records, 'request').items():
+        requests[name] = {'original': _summarize(durations),
+                          'replayed': _summarize(replayed.get(name, [])),
+                          'failures': failures.get(name, 0)}
+
+    return {'start': header['start'],
+            'duration_s': duration,
+            'main_thread_busy_s': main_thread,
+            'entry_points': dict((name, _summarize(durations)) for
+                                 name, durations in
+                                 _groupBy(records, 'call').items()),
+            'spans': dict((name, _summarize(durations)) for
+                          name, durations in
+                          _groupBy(records, 'span').items()),
+            'requests': requests}
+
+def printReport(result):
+    print("Session of %.1fs, Vim's main thread was busy for %.3fs (%.1f%%)"
+          % (result['duration_s'], result['main_thread_busy_s'],
+             100 * result['main_thread_busy_s'] /
+             max(result['duration_s'], 1e-6)))
+
+    for title, key in (('Entry point', 'entry_points'), ('Step', 'spans')):
+        print("\n%-24s %7s %10s %9s %9s %9s" % (
+            title, 'count', 'total ms', 'p50 ms', 'p95 ms', 'max ms'))
+        for name, stats in sorted(result[key].items(),
+                                  key=lambda x: -x[1]['total_ms']):
+            print("%-24s %7d %10.1f %9.2f %9.2f %9.2f" % (
+                name, stats['count'], stats['total_ms'], stats['p50_ms'],
+                stats['p95_ms'], stats['max_ms']))
+
+    print("\n%-24s %7s %19s %19s %19s %5s" % (
+        'Request', 'count', 'total ms', 'p50 ms', 'p95 ms', 'fail'))
+    print("%-24s %7s %19s %19s %19s" % ('', '', 'orig / replay',
+                                        'orig / replay', 'orig / replay'))
+    for name, stats in sorted(result['requests'].items(),
+                              key=lambda x: -x[1]['original']['total_ms']):
+        original, replayed = stats['original'], stats['replayed']
+        print("%-24s %7d %9.1f/%9.1f %9.2f/%9.2f %9.2f/%9.2f %5d" % (
+            name, original['count'], original['total_ms'],
+            replayed['total_ms'], original['p50_ms'], replayed['p50_ms'],
+            original['p95_ms'], replayed['p95_ms'], stats['failures']))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('trace', help="Trace file to replay")
+    parser.add_argument('--url',
+                        help="URL of a hdlcc server to replay against. "
+                        "Uses the stub server if not set")
+    parser.add_argument('--messages', type=int, default=10,
+                        help="Messages the stub server returns for each path")
+    parser.add_argument('--speed', type=float, default=1,
+                        help="Replay speed relative to the original "
+                        "session, 0 replays as fast as possible")
+    parser.add_argument('--timeout', type=float, default=30,
+                        help="Timeout for each request in seconds")
+    parser.add_argument('--output', help="Write the report as JSON to")
+    parser.add_argument('--chrome',
+                        help="Only convert the trace to Chrome's trace event "
+                        "format, writing it to this file")
+    args = parser.parse_args()
+
+    header, records = readTrace(args.trace)
+
+    if args.chrome:
+        with open(args.chrome, 'w') as fd:
+            json.dump(toChromeTrace(header, records), fd)
+        return
+
+    if args.url:
+        results = replay(records, args.url, args.speed, args.timeout)
+    else:
+        with StubServer(messages=args.messages) as server:
+            results = replay(records, server.url, args.speed, args.timeout)
+
+    result = report(header, records, results)
+    printReport(result)
+
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(result, fd, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Runs VimhdlClient without Vim by configuring the vim mock with buffers and
+variables, so that the client can talk to a StubServer
+"""
+
+import os.path as p
+import sys
+from collections import OrderedDict
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim, vim
+mockVim()
+# pylint: enable=import-error,wrong-import-position
+
+class FakeProcess(object):  # pylint: disable=useless-object-inheritance
+    """
+    Stands for the server process, which is always running
+    """
+    pid = 0
+    returncode = None
+
+    def poll(self):  # pylint: disable=no-self-use
+        return None
+
+    def wait(self, *_):  # pylint: disable=no-self-use
+        return 0
+
+    terminate = kill = lambda self: None
+
+class Buffer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Minimal Vim buffer
+    """
+    def __init__(self, number, name, project_file=None):
+        self.number = number
+        self.name = name
+        self.valid = True
+        self.options = {'buflisted': True, 'modifiable': True}
+        self.vars = {}
+        self.lines = []
+        if project_file is not None:
+            self.vars['vimhdl_conf_file'] = project_file
+
+    def __getitem__(self, index):
+        return self.lines[index]
+
+    def __setitem__(self, index, value):
+        self.lines[index] = value
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def append(self, lines):
+        self.lines += lines
+
+class _Buffers(object):  # pylint: disable=useless-object-inheritance
+    """
+    Mimics vim.buffers: iterates over buffers and indexes by number
+    """
+    def __init__(self):
+        self._buffers = OrderedDict()
+
+    def add(self, vim_buffer):
+        self._buffers[vim_buffer.number] = vim_buffer
+
+    def __iter__(self):
+        return iter(list(self._buffers.values()))
+
+    def __getitem__(self, number):
+        return self._buffers[number]
+
+    def __len__(self):
+        return len(self._buffers)
+
+class HeadlessVim(object):  # pylint: disable=useless-object-inheritance
+    """
+    Context manager that sets up the vim mock with the given g: variables
+    and buffers added via addBuffer. Vim's functions are replaced by plain
+    functions (instead of mocks) so they don't skew timing or accumulate
+    calls
+    """
+    def __init__(self, vim_globals=None, filetype='vhdl'):
+        self.globals = dict(vim_globals or {})
+        self.filetype = filetype
+        self.buffers = _Buffers()
+        self.current = mock.MagicMock()
+        self.commands = 0
+        self._patches = []
+
+    def addBuffer(self, path, project_file=None):
+        """
+        Adds a buffer for path, making it the current one
+        """
+        vim_buffer = Buffer(len(self.buffers) + 1, path, project_file)
+        self.buffers.add(vim_buffer)
+        self.current.buffer = vim_buffer
+        return vim_buffer
+
+    def _eval(self, expr):
+        if expr.startswith("exists('g:"):
+            return '1' if expr[10:-2] in self.globals else '0'
+        if expr.startswith('g:'):
+            return self.globals[expr[2:]]
+        if expr == '&filetype':
+            return self.filetype
+        return ''
+
+    def _command(self, _):
+        self.commands += 1
+
+    def __enter__(self):
+        self._patches = [
+            mock.patch.object(vim, 'eval', self._eval),
+            mock.patch.object(vim, 'command', self._command),
+            mock.patch.object(vim, 'vars', self.globals),
+            mock.patch.object(vim, 'buffers', self.buffers),
+            mock.patch.object(vim, 'current', self.current)]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *args):
+        for patch in reversed(self._patches):
+            patch.stop()
+
+def createClient(server):
+    """
+    Returns a VimhdlClient talking to server (a StubServer) as it'd be
+    once an HDL buffer is opened. Must be called within a HeadlessVim
+    context, whose g:vimhdl_log_dir should be set to keep logs away from
+    the user's directory
+    """
+    from vimhdl.base_requests import BaseRequest
+    from vimhdl.vim_client import VimhdlClient
+
+    client = VimhdlClient(host='127.0.0.1', port=server.port)
+    client._startSession()  # pylint: disable=protected-access
+    client._health.setProcess(FakeProcess())  # pylint: disable=protected-access
+    BaseRequest.breaker.reset()
+    return client
@@ -0,0 +1,195 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Stub of the hdlcc HTTP server for exercising the client without hdlcc or any
+of its builders. Responses are synthetic and the number of messages, latency
+and failure rate can be configured
+"""
+
+import json
+import logging
+import random
+import time
+from collections import Counter
+from threading import Lock, Thread
+
+try:  # Python 3.x
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+except ImportError:  # Python 2.x
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+
+_logger = logging.getLogger(__name__)
+
+def makeMessages(path, count):
+    """
+    Returns count messages for path in the same format hdlcc uses
+    """
+    return [{'checker'       : 'stub',
+             'filename'      : path,
+             'line_number'   : 1 + i,
+             'column'        : 1,
+             'error_type'    : 'W' if i % 2 else 'E',
+             'error_subtype' : '',
+             'error_number'  : str(i),
+             'error_message' : "Message %d for '%s'" % (i, path)}
+            for i in range(count)]
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # Hooks are fired in bursts, the default of 5 would drop connections
+    request_queue_size = 128
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Dispatches POST /<method> to StubServer.handle
+    """
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        args = dict((key, value[0]) for key, value in parse_qs(body).items())
+
+        stub = self.server.stub
+        request_id = self.headers.get('X-Vimhdl-Request-Id')
+        if request_id is not None:
+            with stub._lock:  # pylint: disable=protected-access
+                stub.request_ids.append(request_id)
+
+        status, content = stub.handle(self.path.lstrip('/'), args)
+        data = content.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+class StubServer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Serves the hdlcc API on localhost from a separate thread.
+    'messages' is the number of messages returned for each path (can be
+    overridden per path via messages_by_path), 'latency' is the time in
+    seconds taken to handle each request and failure_rate is the ratio of
+    requests that fail with HTTP 500. IDs of requests sent with the
+    X-Vimhdl-Request-Id header are kept on request_ids
+    """
+    def __init__(self, messages=0, latency=0, failure_rate=0,
+                 messages_by_path=None, seed=0):
+        self.messages = messages
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages_by_path = dict(messages_by_path or {})
+        self.requests = Counter()
+        self.request_ids = []
+        self._lock = Lock()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self):
+        """
+        Port the server is listening to
+        """
+        return self._server.server_address[1]
+
+    @property
+    def url(self):
+        """
+        URL requests should be sent to
+        """
+        return 'http://127.0.0.1:%d' % self.port
+
+    def start(self):
+        """
+        Starts serving on a random port
+        """
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.stub = self
+        self._thread = Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _getMessages(self, path):
+        """
+        Messages for path
+        """
+        return makeMessages(path,
+                            self.messages_by_path.get(path, self.messages))
+
+    def handle(self, method, args):
+        """
+        Returns the HTTP status and the JSON content for a request
+        """
+        with self._lock:
+            self.requests[method] += 1
+            failed = self._random.random() < self.failure_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if failed:
+            return 500, json.dumps({'error': 'Stub failure'})
+
+        if method == 'get_diagnose_info':
+            result = {'info': ['hdlcc version: stub',
+                               'Builder: stub']}
+        elif method == 'get_messages_by_path':
+            result = {'messages': self._getMessages(args['path'])}
+        elif method == 'get_messages_by_paths':
+            result = {'messages': dict(
+                (path, self._getMessages(path))
+                for path in json.loads(args['paths']))}
+        elif method == 'get_messages_by_project':
+            return 200, '\n'.join(
+                json.dumps({'path': path, 'messages': self._getMessages(path)})
+                for path in sorted(self.messages_by_path))
+        elif method == 'get_ui_messages':
+            result = {'ui_messages': []}
+        elif method in ('on_buffer_visit', 'on_buffer_leave', 'shutdown',
+                        'rebuild_project'):
+            result = {}
+        elif method == 'get_dependencies':
+            result = {'dependencies': []}
+        elif method == 'get_build_sequence':
+            result = {'sequence': []}
+        elif method == 'run_config_generator':
+            result = {'content': '\n'.join(
+                'vhdl lib %s' % path for path in sorted(self.messages_by_path))}
+        else:
+            return 404, json.dumps({'error': 'Unknown method %s' % method})
+
+        return 200, json.dumps(result)
@@ -0,0 +1,90 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os
+import os.path as p
+import shutil
+import stat
+import sys
+import tempfile
+
+from nose2.tools import such
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.atomic_file import AtomicFile, copyFile
+# pylint: enable=import-error,wrong-import-position
+
+def _read(path):
+    with open(path) as fd:
+        return fd.read()
+
+with such.A('atomic file') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        it.path = p.join(it.temp_dir, 'vimhdl.prj')
+        with open(it.path, 'w') as fd:
+            fd.write('original')
+        os.chmod(it.path, 0o640)
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.temp_dir)
+
+    @it.should("only replace the file when committed")
+    def test():
+        fd = AtomicFile(it.path)
+        fd.write('new ')
+        fd.write('contents')
+        it.assertEqual(_read(it.path), 'original')
+        fd.commit()
+        it.assertEqual(_read(it.path), 'new contents')
+        it.assertEqual(stat.S_IMODE(os.stat(it.path).st_mode), 0o640)
+        it.assertEqual(os.listdir(it.temp_dir), ['vimhdl.prj'])
+
+    @it.should("leave the file untouched if an exception is raised")
+    def test():
+        with it.assertRaises(RuntimeError):
+            with AtomicFile(it.path) as fd:
+                fd.write('partial')
+                raise RuntimeError()
+        it.assertEqual(_read(it.path), 'original')
+        it.assertEqual(os.listdir(it.temp_dir), ['vimhdl.prj'])
+
+    @it.should("copy files")
+    def test():
+        backup = p.join(it.temp_dir, '.vimhdl.prj.backup')
+        copyFile(it.path, backup)
+        it.assertEqual(_read(backup), 'original')
+        with open(it.path, 'w') as fd:
+            fd.write('changed')
+        copyFile(it.path, backup)
+        it.assertEqual(_read(backup), 'changed')
+
+it.createTests(globals())
@@ -0,0 +1,137 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os.path as p
+import sys
+import time
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.base_requests import (BaseRequest, CircuitBreaker,
+                                  LatencyHistory, RequestQueuedMessages)
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('circuit breaker') as it:
+
+    @it.should("allow requests until the threshold is reached")
+    def test():
+        breaker = CircuitBreaker(threshold=2, cooldown=10)
+        it.assertTrue(breaker.allowRequest())
+        breaker.onFailure()
+        it.assertTrue(breaker.allowRequest())
+        breaker.onFailure()
+        it.assertTrue(breaker.isOpen())
+        it.assertFalse(breaker.allowRequest())
+
+    @it.should("let a single request probe the server after the cooldown")
+    def test():
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        breaker.onFailure()
+        with mock.patch('time.time', return_value=time.time() + 11):
+            it.assertTrue(breaker.allowRequest())
+            it.assertFalse(breaker.allowRequest())
+
+    @it.should("close once the server responds")
+    def test():
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        breaker.onFailure()
+        breaker.onSuccess()
+        it.assertFalse(breaker.isOpen())
+        it.assertTrue(breaker.allowRequest())
+
+    @it.should("not send requests while open")
+    def test():
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        breaker.onFailure()
+        with mock.patch.object(BaseRequest, 'breaker', breaker):
+            with mock.patch('requests.post') as post:
+                it.assertIsNone(RequestQueuedMessages(None).sendRequest())
+                post.assert_not_called()
+
+it.createTests(globals())
+
+with such.A('request timeout') as it:
+
+    @it.should("use the class timeout until there are enough samples")
+    def test():
+        with mock.patch.object(BaseRequest, 'latencies', LatencyHistory()):
+            it.assertEqual(RequestQueuedMessages(None).getTimeout(),
+                           RequestQueuedMessages.timeout)
+
+    @it.should("adapt to the latencies seen")
+    def test():
+        with mock.patch.object(BaseRequest, 'latencies', LatencyHistory()):
+            request = RequestQueuedMessages(None)
+            for _ in range(10):
+                request.latencies.add(request._meth, 0.1)
+            it.assertAlmostEqual(request.getTimeout(), 0.4)
+
+            # Old samples should be discarded
+            for _ in range(32):
+                request.latencies.add(request._meth, 0.01)
+            it.assertEqual(request.getTimeout(), request.min_timeout)
+
+    @it.should("count read timeouts as latencies, not as server failures")
+    def test():
+        import requests
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        with mock.patch.object(BaseRequest, 'latencies', LatencyHistory()), \
+                mock.patch.object(BaseRequest, 'breaker', breaker), \
+                mock.patch.object(BaseRequest, 'url', 'http://localhost'), \
+                mock.patch('requests.post',
+                           side_effect=requests.exceptions.ReadTimeout):
+            request = RequestQueuedMessages(None)
+            for _ in range(10):
+                request.latencies.add(request._meth, 0.01)
+            for _ in range(10):
+                it.assertIsNone(request.sendRequest())
+
+            it.assertFalse(breaker.isOpen())
+            it.assertEqual(request.getTimeout(), request.timeout)
+
+    @it.should("not open the circuit breaker for requests bypassing it")
+    def test():
+        import requests
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        with mock.patch.object(BaseRequest, 'breaker', breaker), \
+                mock.patch.object(BaseRequest, 'url', 'http://localhost'), \
+                mock.patch('requests.post',
+                           side_effect=requests.exceptions.ConnectionError):
+            request = RequestQueuedMessages(None)
+            it.assertIsNone(request.sendRequest(fast_fail=False))
+            it.assertFalse(breaker.isOpen())
+            it.assertIsNone(request.sendRequest())
+            it.assertTrue(breaker.isOpen())
+
+it.createTests(globals())
@@ -0,0 +1,117 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os
+import os.path as p
+import shutil
+import subprocess as subp
+import sys
+import tempfile
+
+from nose2.tools import such
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.cache_dir import (evict, getProjectCacheDir, markInUse,
+                               release)
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('cache directory') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.root = tempfile.mkdtemp(prefix='vimhdl_test_')
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.root)
+
+    def createCacheDir(project_file, size, mtime):
+        path = getProjectCacheDir(it.root, project_file, '1.0')
+        with open(p.join(path, 'database'), 'w') as fd:
+            fd.write('x' * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    @it.should("use a different directory per project and version")
+    def test():
+        path = getProjectCacheDir(it.root, '/some/project.prj', '1.0')
+        it.assertTrue(p.isdir(path))
+        it.assertEqual(path, getProjectCacheDir(it.root, '/some/project.prj',
+                                                '1.0'))
+        it.assertNotEqual(path, getProjectCacheDir(it.root,
+                                                   '/some/project.prj', '2.0'))
+        it.assertNotEqual(path, getProjectCacheDir(it.root,
+                                                   '/other/project.prj', '1.0'))
+
+    @it.should("remove least recently used directories first")
+    def test():
+        oldest = createCacheDir('/a.prj', 100, 1000)
+        older = createCacheDir('/b.prj', 100, 2000)
+        newest = createCacheDir('/c.prj', 100, 3000)
+
+        evict(it.root, 150)
+
+        it.assertFalse(p.exists(oldest))
+        it.assertFalse(p.exists(older))
+        it.assertTrue(p.exists(newest))
+
+    @it.should("never remove the directory in use")
+    def test():
+        in_use = createCacheDir('/a.prj', 100, 1000)
+        other = createCacheDir('/b.prj', 100, 2000)
+
+        evict(it.root, 150, keep=in_use)
+
+        it.assertTrue(p.exists(in_use))
+        it.assertFalse(p.exists(other))
+
+    @it.should("not remove directories used by other sessions")
+    def test():
+        # PID of a process that's no longer running
+        process = subp.Popen([sys.executable, '-c', ''])
+        process.wait()
+
+        in_use = createCacheDir('/a.prj', 100, 1000)
+        markInUse(in_use, os.getpid())
+        os.utime(in_use, (1000, 1000))
+        stale = createCacheDir('/b.prj', 100, 2000)
+        markInUse(stale, process.pid)
+        os.utime(stale, (2000, 2000))
+        newest = createCacheDir('/c.prj', 100, 3000)
+
+        evict(it.root, 250)
+
+        it.assertTrue(p.exists(in_use))
+        it.assertFalse(p.exists(stale))
+        it.assertTrue(p.exists(newest))
+
+        release(in_use, os.getpid())
+        evict(it.root, 0)
+        it.assertFalse(p.exists(in_use))
+
+it.createTests(globals())
@@ -0,0 +1,129 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os
+import os.path as p
+import shutil
+import tempfile
+import time
+
+from nose2.tools import such
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.headless_client import HeadlessVim, createClient
+from vimhdl_tests.stub_server import StubServer
+from vimhdl.base_requests import BaseRequest
+# pylint: enable=import-error,wrong-import-position
+
+_logger = logging.getLogger(__name__)
+
+# Wall clock times depend on the machine running the tests, so the budgets
+# below are multiplied by this to leave room for loaded CI machines. Set it
+# to 1 to check against the budgets themselves (e.g., on an idle machine)
+_BUDGET_SCALE = float(os.environ.get('VIMHDL_LATENCY_BUDGET_SCALE', 5))
+
+# 99th percentile of the time in microseconds hooks run by autocmds may
+# take. They run on Vim's main thread, so anything more is felt as lag
+_HOOK_BUDGET = int(os.environ.get('VIMHDL_HOOK_LATENCY_BUDGET', 1000))
+
+# Same as above for getting messages, which waits for the server (a stub
+# that responds immediately in this case)
+_GET_MESSAGES_BUDGET = int(os.environ.get(
+    'VIMHDL_GET_MESSAGES_LATENCY_BUDGET', 20000))
+
+_SAMPLES = 200
+
+def _getP99(func):
+    """
+    Returns the 99th percentile of the time in microseconds func takes.
+    Requests sent by func are allowed to finish between calls, so that only
+    the time spent by the caller is measured
+    """
+    func()
+    BaseRequest.async_queue.wait(timeout=5)
+
+    times = []
+    for _ in range(_SAMPLES):
+        start = time.time()
+        func()
+        times.append(1e6 * (time.time() - start))
+        BaseRequest.async_queue.wait(timeout=5)
+
+    times.sort()
+    return times[int(0.99 * (len(times) - 1))]
+
+with such.A('vimhdl client') as it:
+
+    @it.has_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        it.project_file = p.join(it.temp_dir, 'vimhdl.prj')
+        paths = [p.join(it.temp_dir, 'source_%d.vhd' % i) for i in range(10)]
+
+        with open(it.project_file, 'w') as fd:
+            for path in paths:
+                fd.write('vhdl lib %s\n' % path)
+                open(path, 'w').close()
+
+        it.server = StubServer(messages=20).start()
+        it.headless = HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                                   'vimhdl_log_level': 'WARNING'})
+        it.headless.__enter__()
+        it.buffers = [it.headless.addBuffer(x, it.project_file)
+                      for x in paths]
+        it.client = createClient(it.server)
+
+    @it.has_teardown
+    def teardown():
+        it.client.shutdown()
+        it.headless.__exit__()
+        it.server.stop()
+        shutil.rmtree(it.temp_dir)
+
+    def assertWithinBudget(name, func, budget):
+        p99 = _getP99(func)
+        budget *= _BUDGET_SCALE
+        _logger.info("%s p99 is %dus (budget is %dus)", name, p99, budget)
+        it.assertLess(p99, budget, "%s p99 is %dus, budget is %dus" %
+                      (name, p99, budget))
+
+    @it.should("handle UI message requests within the time budget")
+    def test():
+        assertWithinBudget(
+            'requestUiMessages',
+            lambda: it.client.requestUiMessages('CursorMoved'), _HOOK_BUDGET)
+
+    @it.should("handle buffer visits within the time budget")
+    def test():
+        assertWithinBudget('onBufferVisit', it.client.onBufferVisit,
+                           _HOOK_BUDGET)
+
+    @it.should("handle buffer leaves within the time budget")
+    def test():
+        assertWithinBudget('onBufferLeave', it.client.onBufferLeave,
+                           _HOOK_BUDGET)
+
+    @it.should("get messages within the time budget")
+    def test():
+        # Same as vimhdl#getMessagesForCurrentBuffer
+        assertWithinBudget(
+            'getMessages',
+            lambda: it.client.getMessages(it.buffers[0], 'l:loclist'),
+            _GET_MESSAGES_BUDGET)
+
+it.createTests(globals())
@@ -0,0 +1,98 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import json
+import logging
+import os
+import os.path as p
+import re
+import subprocess as subp
+import sys
+import unittest
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+_PYTHON_PATH = p.abspath(p.join(p.dirname(__file__), '..', '..', 'python'))
+
+# Cumulative time in microseconds 'import vimhdl' may take. vimhdl is
+# imported when Vim starts, even if no HDL file is ever opened
+_IMPORT_TIME_BUDGET = int(os.environ.get('VIMHDL_IMPORT_TIME_BUDGET',
+                                         100000))
+
+# Modules that should only be imported when actually needed
+_DEFERRED_MODULES = ('requests', 'urllib3', 'chardet', 'idna',
+                     'multiprocessing', 'subprocess', 'hdlcc',
+                     'vimhdl.config_gen_wrapper', 'vimhdl._version')
+
+# Replaces Vim's module with an empty one (mock is too slow to import) and
+# reports which modules were imported by vimhdl
+_SCRIPT = """
+import json, sys, types
+sys.modules['vim'] = types.ModuleType('vim')
+before = set(sys.modules)
+import vimhdl
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+def _importVimhdl():
+    """
+    Imports vimhdl on a fresh interpreter, returning the modules it imported
+    and the cumulative import time in microseconds
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = _PYTHON_PATH
+    proc = subp.Popen([sys.executable, '-X', 'importtime', '-c', _SCRIPT],
+                      stdout=subp.PIPE, stderr=subp.PIPE, env=env)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0, stderr.decode()
+
+    import_time = None
+    for line in stderr.decode().splitlines():
+        match = re.match(r"import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*vimhdl$",
+                         line)
+        if match:
+            import_time = int(match.group(1))
+
+    return json.loads(stdout.decode()), import_time
+
+with such.A('vimhdl import') as it:
+
+    @it.has_setup
+    def setup():
+        if sys.version_info < (3, 7):
+            raise unittest.SkipTest("-X importtime requires Python 3.7+")
+        # Warm up so that byte compiling doesn't count
+        _importVimhdl()
+
+    @it.should("defer importing heavy dependencies")
+    def test():
+        modules, _ = _importVimhdl()
+        for name in modules:
+            it.assertFalse(
+                any(name == x or name.startswith(x + '.')
+                    for x in _DEFERRED_MODULES),
+                "Module '%s' should not be imported by vimhdl" % name)
+
+    @it.should("import within the time budget")
+    def test():
+        import_time = min(_importVimhdl()[1] for _ in range(3))
+        _logger.info("Importing vimhdl took %dus", import_time)
+        it.assertLess(import_time, _IMPORT_TIME_BUDGET)
+
+it.createTests(globals())
@@ -0,0 +1,106 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os
+import os.path as p
+import sys
+import tempfile
+import time
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.messages_cache import MessagesCache
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('messages cache') as it:
+
+    @it.has_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        it.path = p.join(it.temp_dir, 'source.vhd')
+        open(it.path, 'w').close()
+
+    @it.has_teardown
+    def teardown():
+        os.remove(it.path)
+        os.rmdir(it.temp_dir)
+
+    @it.should("return messages stored only once")
+    def test():
+        cache = MessagesCache()
+        cache.put(it.path, ['some message'])
+        it.assertEqual(cache.pop(it.path), ['some message'])
+        it.assertIsNone(cache.pop(it.path))
+
+    @it.should("discard messages if the file has changed")
+    def test():
+        cache = MessagesCache()
+        cache.put(it.path, ['some message'])
+        mtime = p.getmtime(it.path)
+        os.utime(it.path, (mtime + 10, mtime + 10))
+        it.assertIsNone(cache.pop(it.path))
+
+    @it.should("discard messages older than the TTL")
+    def test():
+        cache = MessagesCache(ttl=1)
+        cache.put(it.path, ['some message'])
+        with mock.patch('time.time', return_value=time.time() + 2):
+            it.assertIsNone(cache.pop(it.path))
+
+    @it.should("only require checking paths modified since last checked")
+    def test():
+        cache = MessagesCache()
+        it.assertTrue(cache.needsCheck(it.path))
+        cache.put(it.path, [])
+        it.assertFalse(cache.needsCheck(it.path))
+        cache.pop(it.path)
+        it.assertFalse(cache.needsCheck(it.path))
+        mtime = p.getmtime(it.path)
+        os.utime(it.path, (mtime + 10, mtime + 10))
+        it.assertTrue(cache.needsCheck(it.path))
+
+    @it.should("keep shared messages until the file changes or they expire")
+    def test():
+        cache = MessagesCache(shared_ttl=1)
+        it.assertIsNone(cache.getShared(it.path))
+        cache.share(it.path, ['some message'])
+        it.assertEqual(cache.getShared(it.path), ['some message'])
+        it.assertEqual(cache.getShared(it.path), ['some message'])
+        with mock.patch('time.time', return_value=time.time() + 2):
+            it.assertIsNone(cache.getShared(it.path))
+        mtime = p.getmtime(it.path)
+        os.utime(it.path, (mtime + 10, mtime + 10))
+        it.assertIsNone(cache.getShared(it.path))
+
+it.createTests(globals())
@@ -0,0 +1,199 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os
+import os.path as p
+import shutil
+import sys
+import tempfile
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.project_file import (Source, findProjectFile, getSources,
+                                 parseSourceLine, updateSources)
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('project file reader') as it:
+
+    @it.should("ignore lines that don't describe sources")
+    def test():
+        for line in ('builder = msim',
+                     'global_build_flags = -93',
+                     '# vhdl lib some_file.vhd',
+                     ''):
+            it.assertEqual(parseSourceLine(line), [])
+
+    @it.should("parse sources relative to the given root")
+    def test():
+        it.assertEqual(
+            parseSourceLine('VHDL lib src/foo.vhd -2008 # comment', '/root'),
+            [Source('vhdl', 'lib', p.normpath('/root/src/foo.vhd'), '-2008')])
+
+    @it.should("expand glob patterns")
+    def test():
+        temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        try:
+            for name in ('a.sv', 'b.sv', 'c.vhd'):
+                open(p.join(temp_dir, name), 'w').close()
+
+            project_file = p.join(temp_dir, 'vimhdl.prj')
+            with open(project_file, 'w') as fd:
+                fd.write('builder = ghdl\n'
+                         'systemverilog lib *.sv\n'
+                         'vhdl other_lib c.vhd\n')
+
+            it.assertEqual(
+                getSources(project_file),
+                [Source('systemverilog', 'lib', p.join(temp_dir, 'a.sv'), ''),
+                 Source('systemverilog', 'lib', p.join(temp_dir, 'b.sv'), ''),
+                 Source('vhdl', 'other_lib', p.join(temp_dir, 'c.vhd'), '')])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @it.should("return no sources if the project file can't be read")
+    def test():
+        it.assertEqual(getSources('/some/path/that/does/not/exist.prj'), [])
+
+    @it.should("find project files on parent directories")
+    def test():
+        temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        try:
+            sub_dir = p.join(temp_dir, 'a', 'b')
+            os.makedirs(sub_dir)
+            it.assertIsNone(findProjectFile(sub_dir, 'some_unlikely.prj'))
+
+            project_file = p.join(temp_dir, 'some_unlikely.prj')
+            open(project_file, 'w').close()
+            it.assertEqual(findProjectFile(sub_dir, 'some_unlikely.prj'),
+                           project_file)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @it.should("update sources added, removed and moved")
+    def test():
+        lines = ['builder = ghdl',
+                 'vhdl lib src/a.vhd -2008',
+                 'vhdl lib src/old/b.vhd',
+                 'vhdl lib src/gone.vhd',
+                 'vhdl other src/*.vhdl']
+
+        generated = ['vhdl lib /root/project/src/a.vhd',
+                     'vhdl lib /root/project/src/new/b.vhd',
+                     'vhdl lib /root/project/src/d.vhd']
+
+        result, changes = updateSources(lines, '/root/project', generated,
+                                        '/some/path')
+
+        it.assertEqual(changes, (1, 1, 1))
+        it.assertEqual(
+            result,
+            ['builder = ghdl',
+             'vhdl lib src/a.vhd -2008',
+             'vhdl lib %s  # moved from %s' % (p.join('src', 'new', 'b.vhd'),
+                                               p.join('src', 'old', 'b.vhd')),
+             '# removed: vhdl lib src/gone.vhd',
+             'vhdl other src/*.vhdl',
+             '',
+             '# Sources added by VimhdlUpdateProjectFile',
+             'vhdl lib %s' % p.join('src', 'd.vhd')])
+
+    @it.should("not change anything if sources are the same")
+    def test():
+        lines = ['vhdl lib a.vhd', 'verilog lib b.v']
+        result, changes = updateSources(lines, '/root', lines, '/root')
+        it.assertEqual(changes, (0, 0, 0))
+        it.assertEqual(result, lines)
+
+    @it.should("not mix up moved sources with the same file name")
+    def test():
+        lines = ['vhdl lib_a a/pkg.vhd',
+                 'vhdl lib_b b/pkg.vhd',
+                 'vhdl lib_c c/top.vhd',
+                 'vhdl lib_d d/top.vhd']
+
+        generated = ['vhdl lib_b /root/new_b/pkg.vhd',
+                     'vhdl lib_a /root/new_a/pkg.vhd',
+                     'vhdl lib /root/new/top.vhd']
+
+        result, changes = updateSources(lines, '/root', generated, '/root')
+
+        # Libraries tell which pkg.vhd is which, but there's no telling
+        # which top.vhd has moved
+        it.assertEqual(changes, (1, 2, 2))
+        it.assertEqual(result[:4], [
+            'vhdl lib_a %s  # moved from %s' % (p.join('new_a', 'pkg.vhd'),
+                                                p.join('a', 'pkg.vhd')),
+            'vhdl lib_b %s  # moved from %s' % (p.join('new_b', 'pkg.vhd'),
+                                                p.join('b', 'pkg.vhd')),
+            '# removed: vhdl lib_c c/top.vhd',
+            '# removed: vhdl lib_d d/top.vhd'])
+
+    @it.should("only remove existing sources within the paths searched")
+    def test():
+        temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        try:
+            root = p.join(temp_dir, 'project')
+            for path in (p.join(root, 'src', 'a.vhd'),
+                         p.join(root, 'src', 'skipped.vhd'),
+                         p.join(temp_dir, 'ip', 'ext.vhd')):
+                if not p.exists(p.dirname(path)):
+                    os.makedirs(p.dirname(path))
+                open(path, 'w').close()
+
+            lines = ['vhdl lib src/a.vhd',
+                     'vhdl lib src/skipped.vhd',
+                     'vhdl iplib ../ip/ext.vhd',
+                     'vhdl iplib ../ip/gone.vhd']
+
+            result, changes = updateSources(lines, root, ['vhdl lib src/a.vhd'],
+                                            root, ['.'])
+
+            # ext.vhd exists but wasn't searched for
+            it.assertEqual(changes, (0, 2, 0))
+            it.assertEqual(result, ['vhdl lib src/a.vhd',
+                                    '# removed: vhdl lib src/skipped.vhd',
+                                    'vhdl iplib ../ip/ext.vhd',
+                                    '# removed: vhdl iplib ../ip/gone.vhd'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @it.should("keep absolute paths that can't be made relative")
+    def test():
+        generated = ['vhdl lib /other/drive/a.vhd']
+        with mock.patch('os.path.relpath', side_effect=ValueError):
+            result, changes = updateSources([], '/root', generated, '/root')
+        it.assertEqual(changes, (1, 0, 0))
+        it.assertEqual(result[-1], 'vhdl lib /other/drive/a.vhd')
+
+it.createTests(globals())
@@ -0,0 +1,202 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import json
+import os.path as p
+import shutil
+import tempfile
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.headless_client import HeadlessVim, createClient
+from vimhdl_tests.stub_server import StubServer
+from vimhdl_tests.vim_mock import vim
+from vimhdl.base_requests import BaseRequest
+from vimhdl.renderer import Renderer, getLineStates
+# pylint: enable=import-error,wrong-import-position
+
+def _record(lnum, error_type, text):
+    return {'lnum': lnum, 'type': error_type, 'text': text}
+
+with such.A('built-in renderer') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        it.calls = []
+
+        def render(expr):
+            # vimhdl#render(bufnr, removed, added)
+            bufnr, removed, added = json.loads(
+                '[' + expr[len('vimhdl#render('):-1] + ']')
+            it.calls.append((bufnr, removed, added))
+            return [str(-1 - i) for i in range(len(added))]
+
+        it.patch = mock.patch.object(vim, 'eval', render)
+        it.patch.start()
+
+    @it.has_test_teardown
+    def teardown():
+        it.patch.stop()
+        shutil.rmtree(it.temp_dir)
+
+    @it.should("show the most severe message of each line")
+    def test():
+        states = getLineStates([_record(1, 'E', 'error 1'),
+                                _record(3, 'E', 'error 3'),
+                                _record(1, 'W', 'warning 1'),
+                                _record(1, 'W', 'warning 1 again'),
+                                _record('', 'W', 'no line')])
+
+        # Messages without a line are shown on the first one
+        it.assertEqual(states, {1: ('vimhdl_error', 'error 1 (+3)'),
+                                3: ('vimhdl_error', 'error 3')})
+
+    @it.should("only update lines whose messages changed")
+    def test():
+        renderer = Renderer()
+        it.assertEqual(renderer.render(1, [_record(1, 'E', 'foo'),
+                                           _record(2, 'W', 'bar')]), 2)
+        it.assertTrue(renderer.isRendered(1))
+
+        _, removed, added = it.calls[-1]
+        it.assertEqual(removed, [])
+        it.assertEqual([x[1:] for x in added],
+                       [[1, 'vimhdl_error', 'foo'],
+                        [2, 'vimhdl_warning', 'bar']])
+        sign_id = added[1][0]
+
+        # Nothing changed, so Vim isn't called
+        it.assertEqual(renderer.render(1, [_record(1, 'E', 'foo'),
+                                           _record(2, 'W', 'bar')]), 0)
+        it.assertEqual(len(it.calls), 1)
+
+        it.assertEqual(renderer.render(1, [_record(1, 'E', 'foo'),
+                                           _record(3, 'W', 'bar')]), 2)
+        _, removed, added = it.calls[-1]
+        # Virtual text ID returned by Vim must be used to remove it
+        it.assertEqual(removed, [[sign_id, -2, 'vimhdl_warning']])
+        it.assertEqual([x[1:] for x in added], [[3, 'vimhdl_warning', 'bar']])
+
+        renderer.reset(1)
+        _, removed, added = it.calls[-1]
+        it.assertEqual(len(removed), 2)
+        it.assertFalse(renderer.isRendered(1))
+
+    @it.should("send a single request for callers waiting on the same path")
+    def test():
+        it.patch.stop()
+        results = []
+        with StubServer(messages=3) as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                vim_buffer = headless.addBuffer(
+                    p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                client._fetchMessagesAsync(vim_buffer, results.append)
+                client._fetchMessagesAsync(vim_buffer, results.append)
+                BaseRequest.async_queue.wait(timeout=5)
+                client.processPendingEvents()
+                client.shutdown()
+        it.patch.start()
+
+        it.assertEqual(server.requests['get_messages_by_path'], 1)
+        it.assertEqual(len(results), 2)
+        it.assertEqual(len(results[0]), 3)
+
+    @it.should("render messages for the current buffer when saved")
+    def test():
+        it.patch.stop()
+        with StubServer(messages=3) as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_renderer': 'native'}) as headless:
+                vim_buffer = headless.addBuffer(
+                    p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                client._renderer = mock.MagicMock()
+                client.requestRender('BufWritePost')
+                BaseRequest.async_queue.wait(timeout=5)
+                client.processPendingEvents()
+                client.shutdown()
+        it.patch.start()
+
+        bufnr, records = client._renderer.render.call_args[0]
+        it.assertEqual(bufnr, vim_buffer.number)
+        it.assertEqual([(x['lnum'], x['type']) for x in records],
+                       [(1, 'E'), (3, 'E'), (2, 'W')])
+        it.assertEqual(vim_buffer.vars['vimhdl_status'], 'E:2 W:1')
+
+    @it.should("share requests between frontends")
+    def test():
+        it.patch.stop()
+        commands = []
+        with StubServer(messages=2) as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_renderer': ['diagnostic', 'ale']}) \
+                    as headless:
+                vim_buffer = headless.addBuffer(
+                    p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                with mock.patch.object(vim, 'command', commands.append):
+                    client.requestRender('BufWritePost')
+                    # ALE asking while vim.diagnostic's request is running
+                    client.requestMessagesAsync(vim_buffer.number,
+                                                'vimhdl#showAleResults')
+                    BaseRequest.async_queue.wait(timeout=5)
+                    client.processPendingEvents()
+                    # Served by the messages just requested
+                    client.requestMessagesAsync(vim_buffer.number,
+                                                'vimhdl#showAleResults')
+                client.shutdown()
+        it.patch.start()
+
+        it.assertEqual(server.requests['get_messages_by_path'], 1)
+        calls = [x for x in commands if x.startswith(
+            ('call vimhdl#setDiagnostics', 'call vimhdl#showAleResults'))]
+        it.assertEqual([x.split('(')[0] for x in calls],
+                       ['call vimhdl#setDiagnostics',
+                        'call vimhdl#showAleResults',
+                        'call vimhdl#showAleResults'])
+        records = json.loads(calls[-1][calls[-1].index('['):-1])
+        it.assertEqual([(x['lnum'], x['type']) for x in records],
+                       [(1, 'E'), (2, 'W')])
+
+    @it.should("hand adapters no messages if the server is down")
+    def test():
+        it.patch.stop()
+        commands = []
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                vim_buffer = headless.addBuffer(
+                    p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                client._isServerAlive = lambda: False
+                with mock.patch.object(vim, 'command', commands.append):
+                    client.requestMessagesAsync(vim_buffer.number,
+                                                'vimhdl#showAleResults')
+                client.shutdown()
+        it.patch.start()
+
+        it.assertIn('call vimhdl#showAleResults(%d, [])' % vim_buffer.number,
+                    commands)
+
+it.createTests(globals())
@@ -22,7 +22,9 @@ import os.path as p
 import re
 import shutil
 import subprocess as subp
+import sys
 import tempfile
+import time
 from contextlib import contextmanager
 
 import mock
@@ -39,6 +41,9 @@ ON_CI = os.environ.get("CI", None) is not None
 NEOVIM_TARGET = os.environ.get("CI_TARGET", "vim") == "neovim"
 VROOM_EXTRA_ARGS = os.environ.get("VROOM_EXTRA_ARGS", None)
 
+sys.path.insert(0, p.abspath(p.join(".ci", "benchmarks")))
+from generate_project import generateProject  # pylint: disable=import-error,wrong-import-position
+
 @contextmanager
 def pushd(path):
     prev = os.getcwd()
@@ -350,4 +355,24 @@ with such.A('vim-hdl test') as it:
             runVroom(vroom_test)
             dbgFindCoverage()
 
+    @it.should("handle generated projects of increasing sizes")
+    @params(100, 1000, 5000)
+    def test(case, files):  # pylint: disable=unused-argument
+        vroom_test = p.abspath(p.join(
+            PATH_TO_TESTS, "test_012_large_generated_project.vroom"))
+
+        # Needs to agree with vroom test file
+        target_path = p.expanduser('~/vimhdl_generated_project')
+        if p.exists(target_path):
+            shutil.rmtree(target_path)
+
+        generateProject(target_path, files=files, fanout=3, depth=20)
+
+        start = time.time()
+        runVroom(vroom_test)
+        _logger.info("Project with %d sources took %.2fs", files,
+                     time.time() - start)
+
+        shutil.rmtree(target_path)
+
 it.createTests(globals())
@@ -0,0 +1,121 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os.path as p
+import sys
+import time
+from threading import Thread
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.base_requests import CircuitBreaker
+from vimhdl.server_health import DEGRADED, DOWN, HEALTHY, ServerHealth
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('server health') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.breaker = CircuitBreaker(threshold=2, cooldown=10)
+        it.health = ServerHealth(it.breaker)
+        it.process = mock.MagicMock()
+        it.process.poll.return_value = None
+        it.health.setProcess(it.process)
+
+    @it.should("be down until a process is set")
+    def test():
+        health = ServerHealth(it.breaker)
+        it.assertEqual(health.getState(), DOWN)
+        it.assertFalse(health.shouldRestart())
+
+    @it.should("follow request outcomes")
+    def test():
+        it.assertEqual(it.health.getState(), HEALTHY)
+        it.breaker.onFailure()
+        it.assertEqual(it.health.getState(), DEGRADED)
+        it.breaker.onFailure()
+        it.assertEqual(it.health.getState(), DOWN)
+        it.breaker.onSuccess()
+        it.assertEqual(it.health.getState(), HEALTHY)
+
+    @it.should("cache the process state")
+    def test():
+        for _ in range(10):
+            it.health.isProcessRunning()
+        it.assertEqual(it.process.poll.call_count, 1)
+
+    @it.should("restart a process that has exited with back-off")
+    def test():
+        it.process.poll.return_value = 1
+        it.health._last_poll = 0
+        it.assertEqual(it.health.getState(), DOWN)
+        it.assertTrue(it.health.shouldRestart())
+        it.health.onRestart()
+        it.assertFalse(it.health.shouldRestart())
+        it.health.onStartDone()
+        # Still waiting for the back-off delay
+        it.assertFalse(it.health.shouldRestart())
+        with mock.patch('time.time', return_value=time.time() + 1.5):
+            it.assertTrue(it.health.shouldRestart())
+
+    @it.should("restart a running process only if unresponsive for long")
+    def test():
+        it.breaker.onFailure()
+        it.breaker.onFailure()
+        it.assertEqual(it.health.getState(), DOWN)
+        it.assertFalse(it.health.shouldRestart())
+        with mock.patch('time.time',
+                        return_value=time.time() +
+                        it.health.unresponsive_timeout + 1):
+            it.assertTrue(it.health.shouldRestart())
+
+    @it.should("report the server down once when checked by several threads")
+    def test():
+        it.breaker.onFailure()
+        it.breaker.onFailure()
+
+        def check():
+            for _ in range(100):
+                it.health.getState()
+
+        with mock.patch('vimhdl.server_health._logger') as logger:
+            threads = [Thread(target=check) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        it.assertEqual(logger.info.call_count, 1)
+
+it.createTests(globals())
@@ -0,0 +1,111 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import gzip
+import logging
+import os
+import os.path as p
+import shutil
+import sys
+import tempfile
+
+from nose2.tools import such
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.session_log import (CompressingRotatingFileHandler, SessionLog,
+                                removeOldSessions)
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('session log') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.log_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.log_dir)
+
+    @it.should("write records at the configured level or above")
+    def test():
+        level = logging.getLogger('vimhdl').level
+        session_log = SessionLog(it.log_dir, 'INFO')
+        session_log.start()
+        logger = logging.getLogger('vimhdl.some_module')
+        logger.debug("some debug message")
+        logger.info("some info message")
+        session_log.stop()
+        # Logger level is restored when done
+        it.assertEqual(logging.getLogger('vimhdl').level, level)
+
+        with open(session_log.getPath('vimhdl.log')) as fd:
+            content = fd.read()
+        it.assertIn("some info message", content)
+        it.assertNotIn("some debug message", content)
+
+    @it.should("compress rotated files")
+    def test():
+        path = p.join(it.log_dir, 'some.log')
+        handler = CompressingRotatingFileHandler(path, maxBytes=100,
+                                                 backupCount=2)
+        logger = logging.getLogger('vimhdl_test_rotation')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for i in range(10):
+                logger.warning("message %d %s", i, 'x' * 60)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        it.assertEqual(sorted(os.listdir(it.log_dir)),
+                       ['some.log', 'some.log.1.gz', 'some.log.2.gz'])
+        with gzip.open(path + '.1.gz') as fd:
+            it.assertIn(b"message 8", fd.read())
+
+    @it.should("compress and remove logs from old sessions")
+    def test():
+        # Sessions with PIDs that are very unlikely to exist
+        for i in range(5):
+            for suffix in ('vimhdl.log', 'hdlcc.log'):
+                open(p.join(it.log_dir, '20160101-00000%d-999999%d.%s' %
+                            (i, i, suffix)), 'w').close()
+        current = '20160102-000000-%d' % os.getpid()
+        open(p.join(it.log_dir, current + '.vimhdl.log'), 'w').close()
+
+        removeOldSessions(it.log_dir, current, max_sessions=3)
+
+        it.assertEqual(
+            sorted(os.listdir(it.log_dir)),
+            ['20160101-000003-9999993.hdlcc.log.gz',
+             '20160101-000003-9999993.vimhdl.log.gz',
+             '20160101-000004-9999994.hdlcc.log.gz',
+             '20160101-000004-9999994.vimhdl.log.gz',
+             current + '.vimhdl.log'])
+
+it.createTests(globals())
@@ -0,0 +1,111 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os
+import os.path as p
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import queue
+except ImportError:  # Python 2.x
+    import Queue as queue
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.source_watcher import (InotifyBackend, PollingBackend,
+                                   SourceWatcher)
+# pylint: enable=import-error,wrong-import-position
+
+def _write(path, content='', mtime=None):
+    with open(path, 'w') as fd:
+        fd.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+with such.A('source watcher') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        os.makedirs(p.join(it.temp_dir, 'src'))
+        it.sources = [p.join(it.temp_dir, 'src', x)
+                      for x in ('a.vhd', 'b.vhd')]
+        for path in it.sources:
+            _write(path, mtime=1000)
+        it.project_file = p.join(it.temp_dir, 'vimhdl.prj')
+        _write(it.project_file, 'vhdl lib src/a.vhd\nvhdl lib src/b.vhd\n')
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.temp_dir)
+
+    @it.should("report files changed when polling")
+    def test():
+        backend = PollingBackend(it.sources, interval=0)
+        it.assertEqual(backend.read(0), [])
+        _write(it.sources[1], mtime=2000)
+        it.assertEqual(backend.read(0), [it.sources[1]])
+        it.assertEqual(backend.read(0), [])
+
+    @it.should("report files changed via inotify")
+    def test():
+        try:
+            backend = InotifyBackend([p.join(it.temp_dir, 'src')])
+        except OSError:
+            raise unittest.SkipTest("inotify is not available")
+        try:
+            it.assertEqual(backend.read(0), [])
+            _write(it.sources[0], 'changed')
+            it.assertIn(it.sources[0], backend.read(1))
+        finally:
+            backend.close()
+
+    @it.should("batch changes to sources of the project")
+    def test():
+        changes = queue.Queue()
+        watcher = SourceWatcher(it.project_file, changes.put, debounce=0.2,
+                                poll_interval=0.05)
+        watcher.start()
+        try:
+            # Let the watcher set up before changing anything
+            time.sleep(0.2)
+            _write(p.join(it.temp_dir, 'src', 'not_a_source.vhd'))
+            for path in it.sources:
+                _write(path, 'changed', mtime=3000)
+            it.assertEqual(changes.get(timeout=5), set(it.sources))
+            time.sleep(0.5)
+            it.assertTrue(changes.empty())
+        finally:
+            watcher.stop()
+
+it.createTests(globals())
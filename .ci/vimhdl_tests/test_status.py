@@ -0,0 +1,121 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os.path as p
+import shutil
+import tempfile
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.headless_client import HeadlessVim, createClient
+from vimhdl_tests.stub_server import StubServer
+from vimhdl_tests.vim_mock import vim
+from vimhdl.base_requests import BaseRequest
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('vimhdl status') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.temp_dir)
+
+    @it.should("set error and warning counts when getting messages")
+    def test():
+        with StubServer(messages=5) as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                vim_buffer = headless.addBuffer(
+                    p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                client.getMessages(vim_buffer, 'l:loclist')
+                BaseRequest.async_queue.wait(timeout=5)
+                client.processPendingEvents()
+                client.shutdown()
+
+        # Stub server alternates between errors and warnings
+        it.assertEqual(vim_buffer.vars['vimhdl_status'], 'E:3 W:2')
+        it.assertIn('vimhdl_checked_tick', vim_buffer.vars)
+        it.assertIn('last check', headless.globals['vimhdl_status'])
+
+    @it.should("not mark buffers as checked if getting messages failed")
+    def test():
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                vim_buffer = headless.addBuffer(
+                    p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                client._getMessagesByPath = lambda *args: None
+                client.getMessages(vim_buffer, 'l:loclist')
+                client.shutdown()
+
+        it.assertNotIn('vimhdl_checked_tick', vim_buffer.vars)
+
+    @it.should("not redraw status lines when handling hooks")
+    def test():
+        commands = []
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                headless.addBuffer(p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                with mock.patch.object(vim, 'command', commands.append):
+                    for _ in range(5):
+                        client.requestUiMessages('CursorMoved')
+                        BaseRequest.async_queue.wait(timeout=5)
+                    client.onBufferVisit()
+                    client.onBufferLeave()
+                    BaseRequest.async_queue.wait(timeout=5)
+                client.shutdown()
+
+        it.assertEqual(server.requests['get_ui_messages'], 5)
+        it.assertNotIn('redrawstatus!', commands)
+        it.assertNotIn('call vimhdl#startPolling()', commands)
+
+    @it.should("redraw status lines only when the status changes")
+    def test():
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                client = createClient(server)
+                client._progress = 'vimhdl: rebuilding'
+                commands = headless.commands
+                it.assertTrue(client._updateStatus())
+                it.assertEqual(headless.commands, commands + 1)
+                it.assertFalse(client._updateStatus())
+                it.assertEqual(headless.commands, commands + 1)
+                client.shutdown()
+
+    @it.should("report progress and clear it when done")
+    def test():
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                client = createClient(server)
+                client._setProgress('vimhdl: rebuilding 10%')
+                it.assertEqual(headless.globals['vimhdl_status'],
+                               'vimhdl: rebuilding 10%')
+                client._setProgress('')
+                it.assertEqual(headless.globals['vimhdl_status'], '')
+                client.shutdown()
+
+it.createTests(globals())
@@ -0,0 +1,150 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import json
+import os.path as p
+import shutil
+import tempfile
+import time
+
+from nose2.tools import such
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.headless_client import HeadlessVim, createClient
+from vimhdl_tests.stub_server import StubServer
+from vimhdl.base_requests import BaseRequest, RequestQueuedMessages
+from vimhdl.trace import TraceRecorder, readTrace, toChromeTrace
+# pylint: enable=import-error,wrong-import-position
+
+with such.A('session trace') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+
+    @it.has_test_teardown
+    def teardown():
+        BaseRequest.recorder = None
+        shutil.rmtree(it.temp_dir)
+
+    @it.should("record calls and requests")
+    def test():
+        path = p.join(it.temp_dir, 'trace.jsonl')
+        recorder = TraceRecorder(path)
+        recorder.start()
+        BaseRequest.recorder = recorder
+
+        recorder.recordCall('onBufferVisit', time.time(), 0.001, ('foo', 1))
+        with StubServer() as server:
+            BaseRequest.url = server.url
+            RequestQueuedMessages(project_file='foo.prj').sendRequest()
+        recorder.stop()
+
+        header, records = readTrace(path)
+        it.assertIn('start', header)
+        it.assertEqual(len(records), 2)
+
+        call, request = records
+        # Server should get the ID recorded on the trace
+        it.assertEqual(server.request_ids, [request['id']])
+        it.assertEqual(call['k'], 'call')
+        it.assertEqual(call['n'], 'onBufferVisit')
+        it.assertEqual(call['a'], ['foo'])
+        it.assertTrue(call['main'])
+
+        it.assertEqual(request['k'], 'request')
+        it.assertEqual(request['n'], 'get_ui_messages')
+        it.assertEqual(request['p'], {'project_file': 'foo.prj'})
+        it.assertTrue(request['ok'])
+        it.assertGreater(request['rs'], 0)
+
+    @it.should("record entry points called by others only once")
+    def test():
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_trace': '1'}) as headless:
+                headless.addBuffer(p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                # Calls processPendingEvents, which is an entry point too
+                client.onBufferVisit()
+                BaseRequest.async_queue.wait(timeout=5)
+                client.shutdown()
+
+        path = p.join(it.temp_dir, client._session_log.session +
+                      '.trace.jsonl')
+        _, records = readTrace(path)
+        it.assertEqual([x['n'] for x in records if x['k'] == 'call'],
+                       ['onBufferVisit'])
+        it.assertIn('on_buffer_visit',
+                    [x['n'] for x in records if x['k'] == 'request'])
+
+    @it.should("export traces in the background")
+    def test():
+        path = p.join(it.temp_dir, 'export.json')
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_trace': '1'}) as headless:
+                headless.addBuffer(p.join(it.temp_dir, 'source.vhd'))
+                client = createClient(server)
+                client.onBufferVisit()
+                BaseRequest.async_queue.wait(timeout=5)
+                client.exportTrace(path)
+                limit = time.time() + 5
+                while client.processPendingEvents() and time.time() < limit:
+                    time.sleep(0.01)
+                client.shutdown()
+
+        with open(path) as fd:
+            events = json.load(fd)['traceEvents']
+        it.assertIn('onBufferVisit', [x['name'] for x in events])
+
+    @it.should("convert traces to Chrome's trace event format")
+    def test():
+        header = {'trace': 1, 'start': 100, 'pid': 42}
+        records = [
+            {'t': 1, 'd': 0.5, 'k': 'call', 'n': 'getMessages',
+             'main': True, 'th': 'MainThread'},
+            {'t': 1.25, 'd': 0.1, 'k': 'span', 'n': 'json decode',
+             'main': True, 'th': 'MainThread'},
+            {'t': 2, 'd': 0.25, 'k': 'request', 'n': 'on_buffer_visit',
+             'main': False, 'th': 'Thread-1', 'id': '42-1', 'q': 0.5,
+             'ps': 10, 'rs': 2, 'ok': True}]
+
+        events = toChromeTrace(header, records)['traceEvents']
+        spans = dict((x['name'], x) for x in events if x['ph'] == 'X')
+
+        it.assertEqual(spans['getMessages']['ts'], 101e6)
+        it.assertEqual(spans['getMessages']['dur'], 0.5e6)
+        it.assertEqual(spans['getMessages']['tid'], 0)
+        it.assertEqual(spans['json decode']['tid'], 0)
+        it.assertEqual(spans['on_buffer_visit']['args']['id'], '42-1')
+        it.assertNotEqual(spans['on_buffer_visit']['tid'], 0)
+        # Time waiting to be sent comes right before the request, as an
+        # async event so that it doesn't overlap with the thread's slices
+        it.assertNotIn('queued on_buffer_visit', spans)
+        queued = dict((x['ph'], x) for x in events
+                      if x['name'] == 'queued on_buffer_visit')
+        it.assertEqual(sorted(queued), ['b', 'e'])
+        it.assertEqual(queued['b']['ts'], 101.5e6)
+        it.assertEqual(queued['e']['ts'], 102e6)
+        it.assertEqual(queued['b']['id'], '42-1')
+        it.assertEqual(queued['e']['id'], '42-1')
+        it.assertIn({'name': 'thread_name', 'ph': 'M', 'pid': 42, 'tid':
+                     spans['on_buffer_visit']['tid'],
+                     'args': {'name': 'Thread-1'}}, events)
+
+it.createTests(globals())
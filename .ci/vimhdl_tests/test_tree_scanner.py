@@ -0,0 +1,106 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import os
+import os.path as p
+import shutil
+import sys
+import tempfile
+
+from nose2.tools import such
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
+    for path in (p.join(base_path, 'python'),
+                 p.join(base_path, 'dependencies', 'hdlcc')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.tree_scanner import TreeScanner
+# pylint: enable=import-error,wrong-import-position
+
+def _touch(path, mtime=None):
+    open(path, 'a').close()
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+with such.A('tree scanner') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        for path in ('a/b/c', 'a/d', 'e'):
+            os.makedirs(p.join(it.temp_dir, path))
+        for path in ('a/foo.vhd', 'a/b/c/bar.sv', 'e/baz.v', 'e/notes.txt'):
+            _touch(p.join(it.temp_dir, path), 1000)
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.temp_dir)
+
+    @it.should("find all directories and HDL files")
+    def test():
+        scanner = TreeScanner()
+        scanner.scan([it.temp_dir])
+        listings = scanner.listings
+        it.assertEqual(
+            sorted(listings),
+            sorted(p.normpath(p.join(it.temp_dir, x)) for x in
+                   ('', 'a', 'a/b', 'a/b/c', 'a/d', 'e')))
+        it.assertEqual(listings[p.join(it.temp_dir, 'e')][2], ['baz.v'])
+
+    @it.should("keep the fingerprint if nothing changed")
+    def test():
+        fingerprint = TreeScanner().scan([it.temp_dir])
+        scanner = TreeScanner()
+        it.assertEqual(scanner.scan([it.temp_dir]), fingerprint)
+
+        # Unchanged directories are not listed again
+        scanner = TreeScanner(scanner.listings)
+        it.assertEqual(scanner.scan([it.temp_dir]), fingerprint)
+        it.assertEqual(scanner._listed, 0)
+
+    @it.should("change the fingerprint when sources change")
+    def test():
+        fingerprint = TreeScanner().scan([it.temp_dir])
+
+        _touch(p.join(it.temp_dir, 'a', 'foo.vhd'), 2000)
+        changed = TreeScanner().scan([it.temp_dir])
+        it.assertNotEqual(changed, fingerprint)
+
+        _touch(p.join(it.temp_dir, 'e', 'notes.txt'), 2000)
+        it.assertEqual(TreeScanner().scan([it.temp_dir]), changed)
+
+    @it.should("list again directories whose entries changed")
+    def test():
+        scanner = TreeScanner()
+        scanner.scan([it.temp_dir])
+        path = p.join(it.temp_dir, 'a', 'd')
+        _touch(p.join(path, 'new.vhd'))
+        os.utime(path, (3000, 3000))
+
+        scanner = TreeScanner(scanner.listings)
+        scanner.scan([it.temp_dir])
+        it.assertEqual(scanner._listed, 1)
+        it.assertEqual(scanner.listings[path][2], ['new.vhd'])
+
+it.createTests(globals())
@@ -0,0 +1,309 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import json
+import os
+import os.path as p
+import shutil
+import tempfile
+import time
+import unittest
+from threading import Event, Thread
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 2.x
+    import mock
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.headless_client import HeadlessVim, createClient
+from vimhdl_tests.stub_server import StubServer
+from vimhdl_tests.vim_mock import vim
+from vimhdl import vim_helpers
+from vimhdl.base_requests import BaseRequest, RequestProjectRebuild
+from vimhdl.vim_client import VimhdlClient
+# pylint: enable=import-error,wrong-import-position
+
+def _failing(server, method, status, times=1):
+    """
+    Makes server respond to method with status for the next times requests
+    """
+    handle = server.handle
+    failures = [times]
+
+    def wrapper(meth, args):
+        if meth == method and failures[0]:
+            failures[0] -= 1
+            with server._lock:
+                server.requests[meth] += 1
+            return status, json.dumps({'error': 'Stub failure'})
+        return handle(meth, args)
+
+    server.handle = wrapper
+
+def _drainEvents(client):
+    """
+    Returns the functions queued to run on Vim's main thread
+    """
+    funcs = []
+    while not client._events.empty():
+        funcs.append(client._events.get_nowait()[0])
+    return funcs
+
+def _waitJobs(client, timeout=5):
+    """
+    Waits for the client's background jobs to finish
+    """
+    limit = time.time() + timeout
+    while client._running_jobs and time.time() < limit:
+        time.sleep(0.01)
+
+class _StalledHandler(BaseHTTPRequestHandler):
+    """
+    Streams a single line and then stops sending anything until the
+    server's 'release' event is set
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        line = b'{"total": 2, "compiled": 1}\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+        self.server.release.wait(10)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+with such.A('vimhdl client') as it:
+
+    @it.has_test_setup
+    def setup():
+        it.temp_dir = tempfile.mkdtemp(prefix='vimhdl_test_')
+        it.paths = [p.join(it.temp_dir, 'source_%d.vhd' % i)
+                    for i in range(3)]
+
+    @it.has_test_teardown
+    def teardown():
+        shutil.rmtree(it.temp_dir)
+
+    def requestMessages(server):
+        with HeadlessVim({'vimhdl_log_dir': it.temp_dir}):
+            client = createClient(server)
+            first = client._requestMessages(None, it.paths)
+            second = client._requestMessages(None, it.paths)
+            client.shutdown()
+        return client, first, second
+
+    @it.should("keep batching messages after a transient failure")
+    def test():
+        with StubServer(messages=1) as server:
+            _failing(server, 'get_messages_by_paths', 500)
+            client, first, second = requestMessages(server)
+
+        it.assertTrue(client._batch_supported)
+        it.assertEqual(list(first), it.paths[:1])
+        it.assertEqual(sorted(second), sorted(it.paths))
+        it.assertEqual(server.requests['get_messages_by_paths'], 2)
+
+    @it.should("stop batching messages if the server rejects it")
+    def test():
+        with StubServer(messages=1) as server:
+            _failing(server, 'get_messages_by_paths', 404)
+            client, _, second = requestMessages(server)
+
+        it.assertFalse(client._batch_supported)
+        it.assertEqual(list(second), it.paths[:1])
+        it.assertEqual(server.requests['get_messages_by_paths'], 1)
+
+    @it.should("warn if project diagnostics fail mid-stream")
+    def test():
+        with StubServer(messages=1,
+                        messages_by_path={it.paths[0]: 1}) as server:
+            handle = server.handle
+
+            def truncated(meth, args):
+                status, content = handle(meth, args)
+                if meth == 'get_messages_by_project':
+                    content += '\n{"path": '
+                return status, content
+
+            server.handle = truncated
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}):
+                client = createClient(server)
+                client._streamProjectMessages(None)
+                funcs = _drainEvents(client)
+                client.shutdown()
+
+        # Messages received before the failure are still shown
+        it.assertEqual(funcs, [client._appendToQuickfix,
+                               vim_helpers.postVimWarning])
+
+    @it.should("ignore rebuild events scheduled before it was cancelled")
+    def test():
+        lines = [{'total': 1, 'compiled': 1},
+                 {'path': it.paths[0], 'messages': [{'line_number': 1}]}]
+        commands = []
+        with StubServer() as server:
+            server.handle = lambda meth, args: (
+                200, '\n'.join(json.dumps(x) for x in lines))
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir}) as headless:
+                headless.addBuffer(it.paths[0])
+                client = createClient(server)
+                client.rebuildProject()
+                _waitJobs(client)
+                client.cancelRebuild()
+                with mock.patch.object(vim, 'command', commands.append):
+                    client.processPendingEvents()
+                progress = vim.vars['vimhdl_progress']
+                client.shutdown()
+
+        it.assertEqual([x for x in commands if 'setqflist' in x], [])
+        it.assertEqual(progress, '')
+
+    @it.should("stop waiting for a stalled rebuild when cancelled")
+    def test():
+        server = HTTPServer(('127.0.0.1', 0), _StalledHandler)
+        server.release = Event()
+        thread = Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        request = RequestProjectRebuild()
+        request.url = 'http://127.0.0.1:%d' % server.server_address[1]
+        items = request.sendStreamingRequest()
+        it.assertEqual(next(items), {'total': 2, 'compiled': 1})
+
+        start = time.time()
+        Thread(target=lambda: (time.sleep(0.2), request.abort())).start()
+        try:
+            list(items)
+        except IOError:
+            pass
+        elapsed = time.time() - start
+
+        server.release.set()
+        server.shutdown()
+        server.server_close()
+        it.assertLess(elapsed, 5)
+
+    @it.should("restart the source watcher when the project file changes")
+    def test():
+        project_files = [p.join(it.temp_dir, x) for x in ('a.prj', 'b.prj')]
+        for project_file in project_files:
+            open(project_file, 'w').close()
+
+        with StubServer() as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_watch_sources': 1,
+                              'vimhdl_conf_file': project_files[0]}) \
+                    as headless:
+                headless.addBuffer(it.paths[0])
+                client = createClient(server)
+                client.onBufferVisit()
+                first = client._watcher
+                client.onBufferVisit()
+                it.assertIs(client._watcher, first)
+
+                headless.globals['vimhdl_conf_file'] = project_files[1]
+                client.onBufferVisit()
+                second = client._watcher
+                BaseRequest.async_queue.wait(timeout=5)
+                client.shutdown()
+
+        it.assertEqual(first.project_file, project_files[0])
+        it.assertTrue(first._stop.is_set())
+        it.assertEqual(second.project_file, project_files[1])
+
+    @it.should("render sources changed outside Vim on rendered buffers")
+    def test():
+        project_file = p.join(it.temp_dir, 'vimhdl.prj')
+        for path in it.paths[:2]:
+            open(path, 'w').close()
+
+        with StubServer(messages=2) as server:
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_renderer': 'native'}) as headless:
+                rendered, other = [headless.addBuffer(x, project_file)
+                                   for x in it.paths[:2]]
+                client = createClient(server)
+                client._renderer = mock.MagicMock()
+                client._rendered.add(rendered.number)
+                client._onSourcesChanged(project_file, it.paths[:2])
+                client.processPendingEvents()
+                client.shutdown()
+
+        it.assertEqual(server.requests['get_messages_by_path'], 0)
+        bufnr, records = client._renderer.render.call_args[0]
+        it.assertEqual(client._renderer.render.call_count, 1)
+        it.assertEqual(bufnr, rendered.number)
+        it.assertEqual(len(records), 2)
+        # Buffers not rendered yet get the cached messages when entered
+        it.assertNotIn('vimhdl_status', other.vars)
+
+    @it.should("only start logging once the server is needed")
+    def test():
+        log_dir = p.join(it.temp_dir, 'logs')
+        with HeadlessVim({'vimhdl_log_dir': log_dir}):
+            client = VimhdlClient()
+            it.assertIsNone(client._session_log)
+            it.assertFalse(p.exists(log_dir))
+            client._startSession()
+            it.assertTrue(p.isdir(log_dir))
+            client.shutdown()
+
+    @it.should("keep the project file if generating it fails mid-way")
+    def test():
+        try:
+            import hdlcc  # pylint: disable=unused-variable
+        except ImportError:
+            raise unittest.SkipTest("ConfigGenWrapper requires hdlcc")
+
+        project_file = p.join(it.temp_dir, 'vimhdl.prj')
+        with open(project_file, 'w') as fd:
+            fd.write('vhdl lib original.vhd\n')
+
+        with StubServer() as server:
+            server.handle = lambda meth, args: (
+                200, json.dumps({'lines': ['vhdl lib source_%d.vhd' % i
+                                           for i in range(600)]}) +
+                '\n{"lines": ')
+            with HeadlessVim({'vimhdl_log_dir': it.temp_dir,
+                              'vimhdl_conf_file': project_file}) as headless:
+                vim_buffer = headless.addBuffer(project_file)
+                client = createClient(server)
+                with it.assertRaises(ValueError):
+                    client._createProjectFile([it.temp_dir], None)
+                client.processPendingEvents()
+                client.shutdown()
+
+        with open(project_file) as fd:
+            it.assertEqual(fd.read(), 'vhdl lib original.vhd\n')
+        it.assertEqual(vim_buffer.lines, ['vhdl lib original.vhd'])
+        # Temporary file has been removed
+        it.assertEqual(
+            sorted(x for x in os.listdir(it.temp_dir)
+                   if x.startswith('.vimhdl.prj')),
+            ['.vimhdl.prj.backup'])
+
+it.createTests(globals())
@@ -88,10 +88,16 @@ function! s:setupCommands() abort
     command! VimhdlInfo              call s:printInfo()
     command! VimhdlViewDependencies  call s:viewDependencies()
     command! VimhdlRebuildProject    call s:pyEval('bool(vimhdl_client.rebuildProject())')
+    command! VimhdlCancelRebuild     call s:pyEval('bool(vimhdl_client.cancelRebuild())')
     command! VimhdlRestartServer     call s:restartServer()
     command! VimhdlViewBuildSequence call s:viewBuildSequence()
+    command! VimhdlProjectDiagnostics call s:projectDiagnostics()
     command! -nargs=* -complete=dir 
                 \ VimhdlCreateProjectFile call s:createProjectFile(<f-args>)
+    command! -nargs=* -complete=dir
+                \ VimhdlUpdateProjectFile call s:updateProjectFile(<f-args>)
+    command! -nargs=1 -complete=file
+                \ VimhdlExportTrace call s:exportTrace(<f-args>)
 endfunction
 " }
 " { s:setupHooks() Setup filetype hooks
@@ -111,6 +117,12 @@ function! s:setupHooks(...) abort
         endfor
         execute('autocmd! BufLeave ' . l:ext . ' ' .
                \':' . s:python_command . ' vimhdl_client.onBufferLeave()')
+        if s:isRendering()
+            for l:event in ['BufEnter', 'BufWritePost']
+                execute('autocmd ' . l:event . ' ' . l:ext . ' ' .
+                       \':' . s:python_command . ' vimhdl_client.requestRender(''' . l:event . ''')')
+            endfor
+        endif
 
     endfor
     augroup END
@@ -129,6 +141,154 @@ function! s:setupSyntastic(...) abort
 
 endfunction
 " }
+" { s:getRenderers() Returns the frontends set by g:vimhdl_renderer
+" ============================================================================
+function! s:getRenderers() abort
+    let l:renderers = get(g:, 'vimhdl_renderer', 'syntastic')
+    return type(l:renderers) == type([]) ? l:renderers : [l:renderers]
+endfunction
+" }
+" { s:isRendering() Tells if vim-hdl shows messages without being asked to
+" ============================================================================
+function! s:isRendering() abort
+    return count(s:getRenderers(), 'native') ||
+                \ count(s:getRenderers(), 'diagnostic')
+endfunction
+" }
+" { s:setupRenderer() Setup signs and virtual text used by the renderer
+" ============================================================================
+function! s:setupRenderer() abort
+    highlight default link VimhdlError ErrorMsg
+    highlight default link VimhdlWarning WarningMsg
+    sign define vimhdl_error text=E> texthl=VimhdlError
+    sign define vimhdl_warning text=W> texthl=VimhdlWarning
+    let s:highlights = {'vimhdl_error': 'VimhdlError',
+                \ 'vimhdl_warning': 'VimhdlWarning'}
+
+    let s:virtual_text = ''
+    if !get(g:, 'vimhdl_virtual_text', 1)
+        return
+    endif
+    if has('nvim-0.5')
+        let s:virtual_text = 'extmark'
+        let s:namespace = nvim_create_namespace('vimhdl')
+    elseif has('textprop') && has('patch-9.0.0121')
+        let s:virtual_text = 'textprop'
+        for [l:name, l:highlight] in items(s:highlights)
+            if empty(prop_type_get(l:name))
+                call prop_type_add(l:name, {'highlight': l:highlight})
+            endif
+        endfor
+    endif
+endfunction
+" }
+" { s:addVirtualText() Adds text after a line, returning its ID or 0
+" ============================================================================
+function! s:addVirtualText(bufnr, lnum, name, text) abort
+    try
+        if s:virtual_text ==# 'extmark'
+            return nvim_buf_set_extmark(a:bufnr, s:namespace, a:lnum - 1, 0,
+                        \ {'virt_text': [[a:text, s:highlights[a:name]]]})
+        elseif s:virtual_text ==# 'textprop'
+            return prop_add(a:lnum, 0, {'type': a:name, 'bufnr': a:bufnr,
+                        \ 'text': a:text, 'text_align': 'after',
+                        \ 'text_padding_left': 2})
+        endif
+    catch
+        " Line is past the end of the buffer
+    endtry
+    return 0
+endfunction
+" }
+" { s:removeVirtualText() Removes text added by s:addVirtualText()
+" ============================================================================
+function! s:removeVirtualText(bufnr, id, name) abort
+    if s:virtual_text ==# 'extmark'
+        silent! call nvim_buf_del_extmark(a:bufnr, s:namespace, a:id)
+    elseif s:virtual_text ==# 'textprop'
+        silent! call prop_remove({'id': a:id, 'type': a:name,
+                    \ 'bufnr': a:bufnr, 'both': 1})
+    endif
+endfunction
+" }
+" { s:setupAle() Register vim-hdl as a source of ALE results
+" ============================================================================
+function! s:setupAle() abort
+    augroup vimhdl_ale
+        autocmd!
+        autocmd User ALEWantResults
+                    \ call s:onAleWantResults(g:ale_want_results_buffer)
+    augroup END
+endfunction
+" }
+" { s:onAleWantResults() Checks a buffer for ALE in the background
+" ============================================================================
+function! s:onAleWantResults(bufnr) abort
+    if !count(['vhdl', 'verilog', 'systemverilog'],
+                \ getbufvar(a:bufnr, '&filetype'))
+        return
+    endif
+    call ale#other_source#StartChecking(a:bufnr, 'vimhdl')
+    call s:pyEval('bool(vimhdl_client.requestMessagesAsync(' . a:bufnr .
+                \ ', "vimhdl#showAleResults"))')
+endfunction
+" }
+" { vimhdl#showAleResults() Hands messages of a buffer to ALE
+" ============================================================================
+function! vimhdl#showAleResults(bufnr, records) abort
+    let l:loclist = map(copy(a:records), {_, x -> {
+                \ 'lnum': x.lnum, 'col': x.col, 'text': x.text,
+                \ 'type': x.type, 'code': x.nr}})
+    call ale#other_source#ShowResults(a:bufnr, 'vimhdl', l:loclist)
+endfunction
+" }
+" { s:setupDiagnostics() Setup Neovim's vim.diagnostic to show messages
+" ============================================================================
+function! s:setupDiagnostics() abort
+    if !has('nvim-0.6')
+        call s:postWarning('vim.diagnostic requires Neovim 0.6 or later')
+        return
+    endif
+    let s:diagnostics_namespace = nvim_create_namespace('vimhdl.diagnostic')
+endfunction
+" }
+" { vimhdl#setDiagnostics() Sets vim.diagnostic's messages for a buffer
+" ============================================================================
+function! vimhdl#setDiagnostics(bufnr, records) abort
+    if !exists('s:diagnostics_namespace')
+        return
+    endif
+    " vim.diagnostic uses 0 based lines and columns
+    let l:diagnostics = map(copy(a:records), {_, x -> {
+                \ 'lnum': max([x.lnum - 1, 0]), 'col': max([x.col - 1, 0]),
+                \ 'message': x.text, 'severity': x.type ==# 'E' ? 1 : 2,
+                \ 'source': 'vimhdl', 'code': x.nr}})
+    call luaeval('vim.diagnostic.set(_A[1], _A[2], _A[3])',
+                \ [s:diagnostics_namespace, a:bufnr, l:diagnostics])
+endfunction
+" }
+" { vimhdl#render() Updates the lines of a buffer whose messages changed
+" ============================================================================
+" Called by the client with [sign ID, virtual text ID, name] of lines to clear
+" and [sign ID, line, name, text] of lines to add. Returns the IDs of the
+" virtual text added
+function! vimhdl#render(bufnr, removed, added) abort
+    for [l:sign_id, l:text_id, l:name] in a:removed
+        silent! execute 'sign unplace ' . l:sign_id . ' buffer=' . a:bufnr
+        if l:text_id
+            call s:removeVirtualText(a:bufnr, l:text_id, l:name)
+        endif
+    endfor
+
+    let l:text_ids = []
+    for [l:sign_id, l:lnum, l:name, l:text] in a:added
+        silent! execute 'sign place ' . l:sign_id . ' line=' . l:lnum .
+                    \ ' name=' . l:name . ' buffer=' . a:bufnr
+        call add(l:text_ids, s:addVirtualText(a:bufnr, l:lnum, l:name, l:text))
+    endfor
+    return l:text_ids
+endfunction
+"}
 " { s:printInfo() Handle for VimHdlInfo command
 " ============================================================================
 function! s:printInfo() abort
@@ -146,16 +306,8 @@ function! s:restartServer() abort
         call s:postWarning("Not a HDL file, can't restart server")
         return
     endif
-    echom 'Restarting hdlcc server'
-    let l:python = s:using_python2 ? 'python2' : 'python3'
-    exec s:python_until_eof
-_logger.info("Restarting hdlcc server")
-vimhdl_client.shutdown()
-del vimhdl_client
-vimhdl_client = vimhdl.VimhdlClient(python=vim.eval('l:python'))
-vimhdl_client.startServer()
-_logger.info("hdlcc restart done")
-EOF
+    let g:vimhdl_server_started = 1
+    call s:pyEval('bool(vimhdl_client.restartServer())')
 endfunction
 " }
 " { vimhdl#getMessagesForCurrentBuffer()
@@ -197,6 +349,13 @@ function! s:viewBuildSequence() abort
     endfor
 endfunction
 "}
+" { s:projectDiagnostics() Handle for VimhdlProjectDiagnostics command
+" ============================================================================
+function! s:projectDiagnostics() abort
+    call s:startServer()
+    call s:pyEval('bool(vimhdl_client.getProjectDiagnostics())')
+endfunction
+"}
 " { s:createProjectFile
 " ============================================================================
 function! s:createProjectFile(...) abort
@@ -209,6 +368,22 @@ vimhdl_client.updateHelperWrapper()
 EOF
 endfunction
 "}
+" { s:updateProjectFile
+" ============================================================================
+function! s:updateProjectFile(...) abort
+    call s:startServer()
+
+    let b:local_arg = a:000
+    call s:pyEval('bool(vimhdl_client.updateProjectFile())')
+endfunction
+"}
+" { s:exportTrace
+" ============================================================================
+function! s:exportTrace(path) abort
+    let l:path = a:path
+    call s:pyEval('bool(vimhdl_client.exportTrace(vim.eval("l:path")))')
+endfunction
+"}
 " { s:onVimhdlTempQuit() Handles leaving the temporary config file edit
 " ============================================================================
 function! s:onVimhdlTempQuit()
@@ -226,14 +401,108 @@ function! vimhdl#setup() abort
         call s:setupPython()
         call s:setupCommands()
         call s:setupHooks('*.vhd', '*.vhdl', '*.v', '*.sv')
-        call s:setupSyntastic('vhdl', 'verilog', 'systemverilog')
+        let l:renderers = s:getRenderers()
+        if count(l:renderers, 'syntastic')
+            call s:setupSyntastic('vhdl', 'verilog', 'systemverilog')
+        endif
+        if count(l:renderers, 'native')
+            call s:setupRenderer()
+        endif
+        if count(l:renderers, 'diagnostic')
+            call s:setupDiagnostics()
+        endif
+        if count(l:renderers, 'ale')
+            call s:setupAle()
+        endif
+        if get(g:, 'vimhdl_prewarm', 0)
+            call s:prewarmServer()
+        endif
     endif
 
     if count(['vhdl', 'verilog', 'systemverilog'], &filetype)
         call s:startServer()
+        if s:isRendering()
+            call s:pyEval('bool(vimhdl_client.requestRender("FileType"))')
+        endif
     endif
 endfunction
 " }
+" { vimhdl#startPolling() Polls the client for results of background jobs
+" ============================================================================
+function! vimhdl#startPolling() abort
+    " Without timers, results are handled when hooks are triggered
+    if exists('s:poll_timer') || !has('timers')
+        return
+    endif
+    let s:poll_timer = timer_start(100, function('s:onPollTimer'),
+                \ {'repeat': -1})
+endfunction
+"}
+" { vimhdl#startWatchPolling() Polls the client while sources are watched
+" ============================================================================
+" Changes made outside Vim are handled by another thread, which can't use
+" Vim's API, so results are picked up from here even if Vim is idle
+function! vimhdl#startWatchPolling() abort
+    if exists('s:watch_timer') || !has('timers')
+        return
+    endif
+    let s:watch_timer = timer_start(1000, function('s:onWatchTimer'),
+                \ {'repeat': -1})
+endfunction
+"}
+" { vimhdl#stopWatchPolling()
+" ============================================================================
+function! vimhdl#stopWatchPolling() abort
+    if exists('s:watch_timer')
+        call timer_stop(s:watch_timer)
+        unlet s:watch_timer
+    endif
+endfunction
+"}
+" { vimhdl#status() Text for the statusline
+" ============================================================================
+" Statuslines are evaluated on every redraw, so this only reads variables the
+" client keeps up to date. Buffer counts are marked as stale when the buffer
+" has changed since it was last checked
+function! vimhdl#status() abort
+    let l:counts = get(b:, 'vimhdl_status', '')
+    if l:counts !=# '' && get(b:, 'vimhdl_checked_tick', -1) != b:changedtick
+        let l:counts .= ' (stale)'
+    endif
+    let l:status = get(g:, 'vimhdl_status', '')
+    if l:counts ==# '' || l:status ==# ''
+        return l:counts . l:status
+    endif
+    return l:counts . ' ' . l:status
+endfunction
+"}
+" { s:onPollTimer() Handles pending events until there's nothing left to do
+" ============================================================================
+function! s:onPollTimer(timer) abort
+    if !s:pyEval('vimhdl_client.processPendingEvents()')
+        call timer_stop(a:timer)
+        unlet! s:poll_timer
+    endif
+endfunction
+"}
+" { s:onWatchTimer() Handles events generated by the source watcher
+" ============================================================================
+function! s:onWatchTimer(timer) abort
+    call s:pyEval('bool(vimhdl_client.processPendingEvents())')
+endfunction
+"}
+" { s:prewarmServer() Starts hdlcc server in the background
+" ============================================================================
+function! s:prewarmServer() abort
+    if (exists('g:vimhdl_server_started') && g:vimhdl_server_started)
+        return
+    endif
+
+    if s:pyEval('vimhdl_client.prewarm()')
+        let g:vimhdl_server_started = 1
+    endif
+endfunction
+"}
 " { s:startServer() Starts hdlcc server
 " ============================================================================
 function! s:startServer() abort
@@ -21,8 +21,27 @@ tools.  See https://github.com/suoto/vim-hdl for more information
 
 from __future__ import print_function
 
+import sys
+
 from .vim_client import VimhdlClient
 
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+def _getVersion():
+    """
+    Returns vim-hdl version. Versioneer may need to call git to find it out
+    """
+    from ._version import get_versions
+    return get_versions()['version']
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """
+        Defers getting the version until it's actually needed to keep
+        importing vimhdl (which happens when Vim starts) fast
+        """
+        if name == '__version__':
+            globals()['__version__'] = _getVersion()
+            return globals()['__version__']
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+else:  # pragma: no cover
+    __version__ = _getVersion()
@@ -0,0 +1,126 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Writes files atomically: contents go to a temporary file on the same
+directory which replaces the destination only when complete, so readers
+never see partially written files
+"""
+
+import logging
+import os
+import os.path as p
+import shutil
+import sys
+import tempfile
+
+_logger = logging.getLogger(__name__)
+
+_ON_WINDOWS = sys.platform == 'win32'
+
+def replaceFile(src, dst):
+    """
+    Renames src to dst, overwriting dst if it exists
+    """
+    try:
+        os.replace(src, dst)
+    except AttributeError:  # Python 2.x
+        # Renaming on top of an existing file is only atomic (and allowed)
+        # on POSIX systems
+        if _ON_WINDOWS and p.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+def _syncDir(path):
+    """
+    Makes sure directory entry changes (such as renames) on path are
+    written to disk
+    """
+    if _ON_WINDOWS:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class AtomicFile(object):  # pylint: disable=useless-object-inheritance
+    """
+    File-like object whose contents replace 'path' when committed. Can be
+    used as a context manager, in which case contents are committed unless
+    an exception is raised
+    """
+    def __init__(self, path, mode='w'):
+        self.path = p.abspath(path)
+        handle, self._temp = tempfile.mkstemp(
+            dir=p.dirname(self.path), prefix='.%s.' % p.basename(self.path),
+            suffix='.tmp')
+        self._fd = os.fdopen(handle, mode)
+
+    def write(self, data):
+        """
+        Writes data to the temporary file
+        """
+        self._fd.write(data)
+
+    def commit(self):
+        """
+        Writes contents to disk and replaces the destination file with them
+        """
+        self._fd.flush()
+        os.fsync(self._fd.fileno())
+        self._fd.close()
+
+        # mkstemp creates files only readable by the owner
+        if p.exists(self.path):
+            shutil.copymode(self.path, self._temp)
+        else:
+            os.chmod(self._temp, 0o644)
+
+        replaceFile(self._temp, self.path)
+        _syncDir(p.dirname(self.path))
+
+    def discard(self):
+        """
+        Removes the temporary file, leaving the destination file untouched
+        """
+        self._fd.close()
+        try:
+            os.remove(self._temp)
+        except OSError:
+            _logger.warning("Unable to remove %s", self._temp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+def copyFile(src, dst):
+    """
+    Atomically replaces dst with a copy of src
+    """
+    with open(src, 'rb') as src_fd:
+        with AtomicFile(dst, 'wb') as dst_fd:
+            shutil.copyfileobj(src_fd, dst_fd)
@@ -20,29 +20,252 @@ Wrapper for vim-hdl usage within Vim's Python interpreter
 
 import json
 import logging
-from threading import Thread
+import socket
+import time
+from collections import deque
+from threading import Lock, Thread
 
-import requests
+from vimhdl.trace import REQUEST_ID_HEADER
+
+try:  # Python 3.x
+    import queue
+except ImportError:  # Python 2.x
+    import Queue as queue
 
 _logger = logging.getLogger(__name__)
 
+# Adaptive timeouts are this many times the 95th percentile of latencies
+# seen for the same method
+_TIMEOUT_FACTOR = 4
+# Minimum number of samples before using adaptive timeouts
+_MIN_LATENCY_SAMPLES = 5
+# Delay between attempts when retrying
+_RETRY_DELAY = 0.1
+# Number of threads sending asynchronous requests
+_ASYNC_WORKERS = 4
+
+def _iterJsonLines(response):
+    """
+    Iterates over a streamed response, decoding each line as a JSON object
+    """
+    try:
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line.decode('utf-8'))
+    finally:
+        response.close()
+
+class CircuitBreaker(object):  # pylint: disable=useless-object-inheritance
+    """
+    Tracks consecutive failures to reach the server. After 'threshold'
+    failures in a row, requests fail immediately for 'cooldown' seconds.
+    After that, a single request is let through to probe the server; if it
+    also fails, the cooldown is doubled up to 'max_cooldown' seconds
+    """
+    def __init__(self, threshold=3, cooldown=2, max_cooldown=60):
+        self._lock = Lock()
+        self._threshold = threshold
+        self._base_cooldown = cooldown
+        self._max_cooldown = max_cooldown
+        self._cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0
+
+    @property
+    def failures(self):
+        """
+        Number of consecutive failures
+        """
+        return self._failures
+
+    def isOpen(self):
+        """
+        Tells if requests are being refused
+        """
+        with self._lock:
+            return (self._failures >= self._threshold and
+                    time.time() < self._open_until)
+
+    def allowRequest(self):
+        """
+        Returns True if a request can be sent
+        """
+        with self._lock:
+            if self._failures < self._threshold:
+                return True
+            now = time.time()
+            if now < self._open_until:
+                return False
+            # Let this request probe the server and hold others back until
+            # it's done
+            self._open_until = now + self._cooldown
+            return True
+
+    def onSuccess(self):
+        """
+        Reports the server has responded
+        """
+        with self._lock:
+            self._failures = 0
+            self._cooldown = self._base_cooldown
+
+    def onFailure(self):
+        """
+        Reports the server could not be reached
+        """
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self._threshold:
+                self._open_until = time.time() + self._cooldown
+                self._cooldown = min(2 * self._cooldown, self._max_cooldown)
+
+    def reset(self):
+        """
+        Clears failures, used when the server has been (re)started
+        """
+        self.onSuccess()
+
+class LatencyHistory(object):  # pylint: disable=useless-object-inheritance
+    """
+    Keeps the latest latencies seen for each request method
+    """
+    def __init__(self, size=32):
+        self._lock = Lock()
+        self._size = size
+        self._samples = {}
+
+    def add(self, meth, latency):
+        """
+        Adds a latency sample for meth
+        """
+        with self._lock:
+            if meth not in self._samples:
+                self._samples[meth] = deque(maxlen=self._size)
+            self._samples[meth].append(latency)
+
+    def percentile(self, meth, ratio=0.95):
+        """
+        Returns the given percentile of latencies seen for meth or None if
+        there are not enough samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(meth, ()))
+        if len(samples) < _MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(ratio * len(samples)))]
+
+class AsyncRequestQueue(object):  # pylint: disable=useless-object-inheritance
+    """
+    Runs jobs on a few long lived threads. Hooks run on Vim's main thread
+    and starting a thread for each request would make them wait until the
+    new thread is running
+    """
+    def __init__(self, workers=_ASYNC_WORKERS):
+        self._queue = queue.Queue()
+        self._workers = workers
+        self._threads = []
+        self._lock = Lock()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job()
+            except: # pragma: no cover
+                _logger.exception("Error running asynchronous job")
+            finally:
+                self._queue.task_done()
+
+    def put(self, job):
+        """
+        Schedules job to run on one of the worker threads, starting them if
+        needed
+        """
+        self._queue.put(job)
+        if len(self._threads) < self._workers:
+            with self._lock:
+                while len(self._threads) < self._workers:
+                    thread = Thread(target=self._worker)
+                    # Don't let pending requests prevent Vim from exiting
+                    thread.daemon = True
+                    thread.start()
+                    self._threads.append(thread)
+
+    @property
+    def pending(self):
+        """
+        Number of jobs scheduled that haven't finished yet
+        """
+        return self._queue.unfinished_tasks
+
+    def wait(self, timeout=None):
+        """
+        Waits until all jobs scheduled are done. Returns False if they
+        didn't finish within timeout
+        """
+        limit = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                if limit is None:
+                    self._queue.all_tasks_done.wait()
+                    continue
+                remaining = limit - time.time()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
 class BaseRequest(object):  # pylint: disable=useless-object-inheritance
     """
     Base request object
     """
     _meth = ''
+    # Timeout in seconds. With adaptive_timeout set, this is the upper bound
+    # and the actual value is derived from latencies previously seen for the
+    # same method, but never lower than min_timeout
     timeout = 10
+    min_timeout = 1
+    adaptive_timeout = False
+    # Number of times to retry when the server can't be reached
+    retries = 0
     url = None
 
+    # Shared by all requests since they all talk to the same server
+    breaker = CircuitBreaker()
+    latencies = LatencyHistory()
+    async_queue = AsyncRequestQueue()
+    # TraceRecorder requests are written to, if tracing is enabled
+    recorder = None
+
     def __init__(self, **kwargs):
         self.payload = kwargs
+        # HTTP status of the response, None if the server wasn't reached
+        self.status = None
+        # Set when sent asynchronously, to tell how long it waited
+        self._queued_at = None
+        # Response being streamed, so that it can be aborted
+        self._response = None
         _logger.debug("Creating request for '%s' with payload '%s'",
                       self._meth, self.payload)
 
+    def getTimeout(self):
+        """
+        Returns the timeout to use for this request
+        """
+        if not self.adaptive_timeout:
+            return self.timeout
+
+        latency = self.latencies.percentile(self._meth)
+        if latency is None:
+            return self.timeout
+
+        return max(self.min_timeout,
+                   min(self.timeout, _TIMEOUT_FACTOR * latency))
+
     def sendRequestAsync(self, func=None):
         """
-        Processes the request in a separate thread and puts the
-        received request on queue Q
+        Processes the request in a separate thread and calls func with the
+        response
         """
         def asyncRequest():
             """
@@ -54,49 +277,197 @@ class BaseRequest(object):  # pylint: disable=useless-object-inheritance
                     func(result)
             except: # pragma: no cover
                 _logger.exception("Error sending request")
-                raise
-        Thread(target=asyncRequest).start()
+        self._queued_at = time.time()
+        self.async_queue.put(asyncRequest)
 
-    def sendRequest(self):
+    def _post(self, fast_fail, stream=False):
+        """
+        Posts the request, retrying if the server can't be reached. Returns
+        the response object or None if the server could not be reached or
+        if the circuit breaker is open and fast_fail is set. Requests sent
+        without fast_fail bypass the circuit breaker, so their failures
+        don't count towards opening it
+        """
+        if fast_fail and not self.breaker.allowRequest():
+            _logger.debug("Server is not responding, won't send '%s'",
+                          self._meth)
+            return None
+
+        # Importing requests is expensive and vimhdl is imported when Vim
+        # starts, so only do it when the first request is sent
+        import requests
+
+        headers = None
+        recorder = self.recorder
+        if recorder is not None:
+            headers = {REQUEST_ID_HEADER: recorder.nextRequestId()}
+
+        attempt = 0
+        while True:
+            start = time.time()
+            timeout = self.getTimeout()
+            try:
+                response = requests.post(self.url + '/' + self._meth,
+                                         data=self.payload,
+                                         headers=headers,
+                                         timeout=timeout,
+                                         stream=stream)
+                break
+            # Both requests and urllib3 have different exceptions depending
+            # on their versions, so we'll catch any exceptions for now until
+            # we work out which ones actually happen
+            except BaseException as exc:
+                if attempt < self.retries and \
+                        isinstance(exc, requests.exceptions.ConnectionError):
+                    attempt += 1
+                    time.sleep(_RETRY_DELAY)
+                    continue
+                _logger.warning("Sending request '%s' raised exception: '%s'",
+                                str(self), str(exc))
+                if isinstance(exc, requests.exceptions.ReadTimeout):
+                    # The server is up but slow. Taking the timeout into
+                    # account keeps adaptive timeouts from getting too
+                    # short, and only requests that can't reach the server
+                    # should open the circuit breaker
+                    if not stream:
+                        if isinstance(timeout, tuple):
+                            timeout = timeout[1]
+                        self.latencies.add(self._meth,
+                                           max(timeout, time.time() - start))
+                elif fast_fail:
+                    self.breaker.onFailure()
+                self._record(start, None, stream, headers)
+                return None
+
+        self.breaker.onSuccess()
+        self.status = response.status_code
+        if response.ok and not stream:
+            self.latencies.add(self._meth, time.time() - start)
+
+        self._record(start, response, stream, headers)
+        return response
+
+    def _record(self, start, response, stream, headers):
+        """
+        Writes the request to the trace, if enabled
+        """
+        recorder = self.recorder
+        if recorder is None or headers is None:
+            return
+        queued = None
+        if self._queued_at is not None:
+            queued = start - self._queued_at
+        recorder.recordRequest(self._meth, self.payload, start,
+                               time.time() - start, response, stream,
+                               request_id=headers[REQUEST_ID_HEADER],
+                               queued=queued)
+
+    def sendRequest(self, fast_fail=True):
         """
         Blocking send request. Returns a response object should the
         server respond. It only catches a ConnectionError exception
         (this means the server could not be reached). In this case,
-        return is None
+        return is None. With fast_fail set, None is returned right away
+        while the circuit breaker is open; otherwise the request is always
+        sent and its outcome doesn't affect the breaker
         """
-        try:
-            response = requests.post(self.url + '/' + self._meth,
-                                     data=self.payload,
-                                     timeout=self.timeout)
-            if not response.ok: # pragma: no cover
-                _logger.warning("Server response error: '%s'", response.text)
-                response = None
-
-        # Both requests and urllib3 have different exceptions depending
-        # on their versions, so we'll catch any exceptions for now until
-        # we work out which ones actually happen
-        except BaseException as exc:
-            _logger.warning("Sending request '%s' raised exception: '%s'",
-                            str(self), str(exc))
-            return None
+        response = self._post(fast_fail)
+        if response is not None and not response.ok: # pragma: no cover
+            _logger.warning("Server response error: '%s'", response.text)
+            response = None
 
         return response
 
+    def sendStreamingRequest(self, fast_fail=True):
+        """
+        Blocking send request asking the server to stream its response.
+        Returns an iterator over the JSON objects the server sends (one per
+        line) or None if the server could not be reached. The timeout applies
+        to the time between chunks instead of the whole response. fast_fail
+        works as in sendRequest
+        """
+        response = self._post(fast_fail, stream=True)
+        if response is None:
+            return None
+
+        if not response.ok:
+            _logger.warning("Server response error: '%s'", response.text)
+            response.close()
+            return None
+
+        self._response = response
+        return _iterJsonLines(response)
+
+    def abort(self):
+        """
+        Makes the thread reading the streamed response stop right away. Can
+        be called from any thread. Closing the response would wait for the
+        read in progress, so the socket is shut down instead if it can be
+        found; otherwise the reader stops when its read times out
+        """
+        response = self._response
+        try:
+            sock = response.raw._fp.fp.raw._sock  # pylint: disable=protected-access
+        except AttributeError:
+            _logger.debug("Unable to find the socket of '%s'", self._meth)
+            return
+
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except (socket.error, OSError) as exc:
+            _logger.debug("Error shutting down socket: %s", exc)
+
 class RequestMessagesByPath(BaseRequest):
     """
     Request messages for the quickfix list
     """
     _meth = 'get_messages_by_path'
+    timeout = 30
+    min_timeout = 5
+    adaptive_timeout = True
+    retries = 1
 
     def __init__(self, project_file, path):
         super(RequestMessagesByPath, self).__init__(
             project_file=project_file, path=path)
 
+class RequestMessagesByPaths(BaseRequest):
+    """
+    Request messages for multiple paths at once. Messages on the response
+    are indexed by path
+    """
+    _meth = 'get_messages_by_paths'
+    timeout = 60
+    min_timeout = 5
+    adaptive_timeout = True
+    retries = 1
+
+    def __init__(self, project_file, paths):
+        super(RequestMessagesByPaths, self).__init__(
+            project_file=project_file, paths=json.dumps(paths))
+
+class RequestProjectMessages(BaseRequest):
+    """
+    Request messages for all sources of the project. The server streams one
+    JSON object per source as soon as its messages are available
+    """
+    _meth = 'get_messages_by_project'
+    # Applies to the connection and to the time between sources
+    timeout = (10, 60)
+
+    def __init__(self, project_file):
+        super(RequestProjectMessages, self).__init__(
+            project_file=project_file)
+
 class RequestQueuedMessages(BaseRequest):
     """
     Request UI messages
     """
     _meth = 'get_ui_messages'
+    # Polled from hooks, should be quick
+    timeout = 2
+    min_timeout = 0.2
+    adaptive_timeout = True
 
     def __init__(self, project_file):
         super(RequestQueuedMessages, self).__init__(
@@ -107,6 +478,7 @@ class RequestHdlccInfo(BaseRequest):
     Request UI messages
     """
     _meth = 'get_diagnose_info'
+    timeout = 5
 
     def __init__(self, project_file=None):
         super(RequestHdlccInfo, self).__init__(
@@ -120,9 +492,14 @@ class ListWorkingBuilders(BaseRequest):
 
 class RequestProjectRebuild(BaseRequest):
     """
-    Request UI messages
+    Request the project to be rebuilt. Servers that support it stream
+    progress and messages for every source as it gets built
     """
     _meth = 'rebuild_project'
+    # Rebuilding may take a long time, but progress is streamed as each
+    # source is built, so the read timeout only needs to cover the slowest
+    # source
+    timeout = (10, 120)
 
     def __init__(self, project_file=None):
         super(RequestProjectRebuild, self).__init__(
@@ -133,6 +510,9 @@ class OnBufferVisit(BaseRequest):
     Notifies the server that a buffer has been visited
     """
     _meth = 'on_buffer_visit'
+    timeout = 2
+    min_timeout = 0.2
+    adaptive_timeout = True
 
     def __init__(self, project_file, path):
         super(OnBufferVisit, self).__init__(
@@ -143,6 +523,9 @@ class OnBufferLeave(BaseRequest):
     Notifies the server that a buffer has been left
     """
     _meth = 'on_buffer_leave'
+    timeout = 2
+    min_timeout = 0.2
+    adaptive_timeout = True
 
     def __init__(self, project_file, path):
         super(OnBufferLeave, self).__init__(
@@ -153,6 +536,7 @@ class GetDependencies(BaseRequest):
     Notifies the server that a buffer has been left
     """
     _meth = 'get_dependencies'
+    retries = 1
 
     def __init__(self, project_file, path):
         super(GetDependencies, self).__init__(
@@ -163,16 +547,28 @@ class GetBuildSequence(BaseRequest):
     Notifies the server that a buffer has been left
     """
     _meth = 'get_build_sequence'
+    retries = 1
 
     def __init__(self, project_file, path):
         super(GetBuildSequence, self).__init__(
             project_file=project_file, path=path)
 
+class RequestShutdown(BaseRequest):
+    """
+    Asks the server to save its state and exit
+    """
+    _meth = 'shutdown'
+    timeout = 1
+
 class RunConfigGenerator(BaseRequest):
     """
-    Notifies the server that a buffer has been left
+    Runs a project file generator. Servers that support it stream the
+    resulting lines as they're generated
     """
     _meth = 'run_config_generator'
+    # Searching large trees may take a while. Applies to the connection and
+    # to the time between chunks
+    timeout = (10, 120)
 
     def __init__(self, generator, *args, **kwargs):
         super(RunConfigGenerator, self).__init__(
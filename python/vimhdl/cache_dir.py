@@ -0,0 +1,176 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Handles the directories where the hdlcc server keeps its design database
+between sessions. There's one directory per project file and hdlcc version
+(plus one per set of paths searched by the project file generator) and the
+least recently used ones are removed when the total size exceeds a limit.
+Directories used by a running Vim session are marked so that other
+sessions don't remove them
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import os.path as p
+import shutil
+
+_logger = logging.getLogger(__name__)
+
+# Directories in use have a file named this followed by the PID of the
+# process using it
+_IN_USE_PREFIX = '.in-use-'
+
+def getDefaultCacheRoot():
+    """
+    Returns the default location for cache directories
+    """
+    return p.join(os.environ.get('XDG_CACHE_HOME', p.expanduser('~/.cache')),
+                  'vimhdl')
+
+def getProjectCacheDir(root, project_file, version):
+    """
+    Returns the cache directory for project_file and the given hdlcc
+    version, creating it if needed. The directory's modification time is
+    updated so that it's marked as recently used
+    """
+    key = hashlib.sha1(p.abspath(project_file).encode('utf-8')).hexdigest()
+    path = p.join(root, '%s-%s' % (key[:16], version))
+
+    if not p.exists(path):
+        os.makedirs(path)
+    os.utime(path, None)
+    return path
+
+def getGeneratorCacheFile(root, paths):
+    """
+    Returns the file where results of the project file generator for paths
+    are kept, creating its directory if needed. Like project directories,
+    it's marked as recently used and subject to eviction
+    """
+    key = hashlib.sha1('\n'.join(
+        sorted(p.abspath(x) for x in paths)).encode('utf-8')).hexdigest()
+    path = p.join(root, 'generator-%s' % key[:16])
+
+    if not p.exists(path):
+        os.makedirs(path)
+    os.utime(path, None)
+    return p.join(path, 'sources.json')
+
+def markInUse(path, pid=None):
+    """
+    Marks path as being used by pid (defaults to the current process) and
+    as recently used
+    """
+    pid = os.getpid() if pid is None else pid
+    open(p.join(path, _IN_USE_PREFIX + str(pid)), 'w').close()
+    os.utime(path, None)
+
+def release(path, pid=None):
+    """
+    Removes the mark set by markInUse. The directory is marked as recently
+    used, since it's been used until now
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        os.remove(p.join(path, _IN_USE_PREFIX + str(pid)))
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _isProcessRunning(pid):
+    """
+    Tells if a process with the given PID is running
+    """
+    if os.name == 'nt':
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+def _isInUse(path):
+    """
+    Tells if path is marked as used by a process that's still running
+    """
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return False
+
+    for name in names:
+        if not name.startswith(_IN_USE_PREFIX):
+            continue
+        try:
+            pid = int(name[len(_IN_USE_PREFIX):])
+        except ValueError:
+            continue
+        if _isProcessRunning(pid):
+            return True
+    return False
+
+def _getSize(path):
+    """
+    Returns the total size in bytes of the files inside path
+    """
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += p.getsize(p.join(dirpath, filename))
+            except OSError:
+                pass
+    return size
+
+def evict(root, max_size, keep=None):
+    """
+    Removes the least recently used cache directories inside root until
+    their total size is below max_size bytes. 'keep' and directories in use
+    by other processes are never removed
+    """
+    if not p.isdir(root):
+        return
+
+    entries = []
+    for name in os.listdir(root):
+        path = p.join(root, name)
+        if p.isdir(path):
+            entries.append((p.getmtime(path), path, _getSize(path)))
+
+    total = sum(size for _, _, size in entries)
+
+    # Oldest first
+    for _, path, size in sorted(entries):
+        if total <= max_size:
+            break
+        if keep is not None and p.samefile(path, keep):
+            continue
+        if _isInUse(path):
+            _logger.debug("Not removing %s, it's in use", path)
+            continue
+        _logger.info("Removing cache directory %s (%d bytes)", path, size)
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -21,10 +21,10 @@ in case something goes wrong
 """
 
 import logging
-import os
 import os.path as p
 
 import vim  # pylint: disable=import-error
+from vimhdl.atomic_file import AtomicFile, copyFile, replaceFile
 from vimhdl.vim_helpers import getProjectFile, presentDialog
 from hdlcc.utils import toBytes
 
@@ -51,17 +51,53 @@ class ConfigGenWrapper(object):
     _logger = logging.getLogger(__name__)
 
     def __init__(self):
-        self._project_file = toBytes(getProjectFile() or
+        self._project_file = None
+        self._backup_file = None
+        self._setProjectFile()
+
+        self._fd = None
+        self._bufnr = None
+
+    def _setProjectFile(self, project_file=None):
+        """
+        Sets the project file to write, defaulting to the one currently
+        configured
+        """
+        self._project_file = toBytes(project_file or getProjectFile() or
                                      self._default_conf_filename).decode()
 
         self._backup_file = p.join(
             p.dirname(self._project_file),
             '.' + p.basename(self._project_file) + '.backup')
 
-    def run(self, text):
+    def run(self, text, notes=None, project_file=None):
         """
         Runs the wrapper using 'text' as content
         """
+        self.start(notes, project_file)
+        self.append(text.splitlines())
+        self.finish()
+
+    def _getPreface(self, notes=None):
+        """
+        Returns the preface lines, with notes added before the line marking
+        the end of the preface
+        """
+        lines = str(self._preface).splitlines()
+        if notes:
+            lines[-1:-1] = ['# ' + note for note in notes] + ['#']
+        return lines
+
+    def start(self, notes=None, project_file=None):
+        """
+        Backs up the project file (defaults to the one currently configured)
+        and opens the new one for editing with only the preface (plus notes,
+        if any). Contents are added via append() as they're generated and
+        finish() must be called when done, or discard() if they couldn't be
+        generated
+        """
+        self._setProjectFile(project_file)
+
         # Cleanup autogroups before doing anything
         vim.command('autocmd! vimhdl BufUnload')
 
@@ -69,23 +105,97 @@ class ConfigGenWrapper(object):
         if 'vimhdl_conf_file' not in vim.vars:
             vim.vars['vimhdl_conf_file'] = self._project_file
 
-        # Backup
+        # Backup. The project file itself is only replaced when the new one
+        # is complete
         if p.exists(self._project_file):
             self._logger.info("Backing up %s to %s", self._project_file,
                               self._backup_file)
-            os.rename(self._project_file, self._backup_file)
-
-        contents = '\n'.join([str(self._preface), text,
-                              '', '# vim: filetype=vimhdl'])
+            copyFile(self._project_file, self._backup_file)
 
         self._logger.info("Writing contents to %s", self._project_file)
-        open(self._project_file, 'w').write(contents)
+        preface = self._getPreface(notes)
+        self._fd = AtomicFile(self._project_file)
+        self._fd.write('\n'.join(preface) + '\n')
 
-        # Need to open the resulting file and then setup auto commands to avoid
-        # triggering them when loading / unloading the new buffer
         self._openResultingFileForEdit()
+        self._bufnr = vim.current.buffer.number
+        vim.current.buffer[:] = preface
+        # Prevent edits while lines are still being generated
+        vim.current.buffer.options['modifiable'] = False
+
+    def _getBuffer(self):
+        """
+        Returns the buffer the project file is being generated on or None if
+        it has been unloaded
+        """
+        try:
+            vbuffer = vim.buffers[self._bufnr]
+        except KeyError:
+            return None
+        return vbuffer if vbuffer.valid else None
+
+    def append(self, lines):
+        """
+        Appends lines to the project file and to its buffer
+        """
+        if not lines:
+            return
+
+        self._fd.write('\n'.join(lines) + '\n')
+
+        vbuffer = self._getBuffer()
+        if vbuffer is None:
+            return
+
+        vbuffer.options['modifiable'] = True
+        vbuffer.append([str(line) for line in lines])
+        vbuffer.options['modifiable'] = False
+
+    def finish(self):
+        """
+        Completes the project file started by start()
+        """
+        self.append(['', '# vim: filetype=vimhdl'])
+        self._fd.commit()
+        self._fd = None
+
+        vbuffer = self._getBuffer()
+        if vbuffer is not None:
+            vbuffer.options['modifiable'] = True
+            # Buffer and file contents are the same, so reloading the file
+            # that has been replaced is silent
+            vbuffer.options['modified'] = False
+            vbuffer.options['autoread'] = True
+            vim.command('checktime %d' % self._bufnr)
+
+        # Setting up auto commands only now avoids triggering them when
+        # loading / unloading the new buffer and prevents saving the file
+        # before it's complete
         self._setupOnQuitAutocmds()
 
+    def discard(self):
+        """
+        Drops the project file started by start(), leaving the existing one
+        untouched. Its buffer is set back to the existing file's contents
+        """
+        self._fd.discard()
+        self._fd = None
+
+        vbuffer = self._getBuffer()
+        if vbuffer is None:
+            return
+
+        lines = []
+        if p.exists(self._project_file):
+            with open(self._project_file) as fd:
+                lines = [line.rstrip('\r\n') for line in fd]
+
+        vbuffer.options['modifiable'] = True
+        vbuffer[:] = lines
+        vbuffer.options['modified'] = False
+        if vbuffer.vars.get('is_vimhdl_generated', False):
+            del vbuffer.vars['is_vimhdl_generated']
+
     def _setupOnQuitAutocmds(self):
         """
         Creates an autocmd for the specified file only
@@ -106,7 +216,8 @@ class ConfigGenWrapper(object):
         # If the current buffer is already pointing to the project file, reuse
         # it
         if not p.exists(vim.current.buffer.name) or \
-                p.samefile(vim.current.buffer.name, self._project_file):
+                (p.exists(self._project_file) and
+                 p.samefile(vim.current.buffer.name, self._project_file)):
             vim.command('edit! %s' % self._project_file)
         else:
             vim.command('vsplit %s' % self._project_file)
@@ -149,7 +260,7 @@ class ConfigGenWrapper(object):
         Restores the backup file (if exists) as the main project file
         """
         if p.exists(self._backup_file):
-            os.rename(self._backup_file, self._project_file)
+            replaceFile(self._backup_file, self._project_file)
         else:
             self._logger.info("No backup file exists, can't recover")
 
@@ -169,5 +280,5 @@ class ConfigGenWrapper(object):
             return
 
         # Update and save
-        vim.current.buffer[ : ] = list(vim.current.buffer)[lnum + 1 : ]
+        del vim.current.buffer[:lnum + 1]
         vim.command('write!')
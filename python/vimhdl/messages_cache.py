@@ -0,0 +1,129 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Cache of messages received from the hdlcc server indexed by path
+"""
+
+import logging
+import os.path as p
+import time
+from threading import Lock
+
+_logger = logging.getLogger(__name__)
+
+def getMtime(path):
+    """
+    Returns the modification time of path or None if it can't be read
+    """
+    try:
+        return p.getmtime(path)
+    except OSError:
+        return None
+
+class MessagesCache(object):  # pylint: disable=useless-object-inheritance
+    """
+    Holds messages fetched for paths other than the one that was requested,
+    so that a single request can serve checks for multiple buffers. Entries
+    are only valid while the path's modification time doesn't change and
+    for at most 'ttl' seconds. Messages just requested for a path are also
+    shared for 'shared_ttl' seconds with other frontends checking it
+    """
+    def __init__(self, ttl=10, shared_ttl=2):
+        self._ttl = ttl
+        self._shared_ttl = shared_ttl
+        self._lock = Lock()
+        # path -> (mtime, timestamp, messages)
+        self._entries = {}
+        # Same as above for messages shared by share()
+        self._shared = {}
+        # path -> mtime of the file when its messages were last used
+        self._checked = {}
+
+    def put(self, path, messages):
+        """
+        Stores messages for path
+        """
+        with self._lock:
+            self._entries[path] = (getMtime(path), time.time(), messages)
+
+    def pop(self, path):
+        """
+        Returns the messages stored for path if they're still valid or None
+        otherwise. Entries are consumed, so further calls will return None
+        until path is updated again
+        """
+        mtime = getMtime(path)
+        with self._lock:
+            self._checked[path] = mtime
+            try:
+                entry_mtime, timestamp, messages = self._entries.pop(path)
+            except KeyError:
+                return None
+
+        if entry_mtime != mtime or time.time() - timestamp > self._ttl:
+            _logger.debug("Discarding stale messages for %s", path)
+            return None
+
+        return messages
+
+    def share(self, path, messages):
+        """
+        Keeps messages just requested for path for a short while, so that
+        other frontends checking path at about the same time (e.g. ALE and
+        the renderer when a file is saved) get them without a new request.
+        Unlike put(), these are not consumed when returned
+        """
+        with self._lock:
+            self._shared[path] = (getMtime(path), time.time(), messages)
+
+    def getShared(self, path):
+        """
+        Returns the messages shared for path if it hasn't been modified since
+        and they're recent enough or None otherwise
+        """
+        with self._lock:
+            entry = self._shared.get(path)
+        if entry is None:
+            return None
+
+        mtime, timestamp, messages = entry
+        if mtime != getMtime(path) or \
+                time.time() - timestamp > self._shared_ttl:
+            return None
+
+        return messages
+
+    def needsCheck(self, path):
+        """
+        Tells if path has neither pending messages nor has been checked
+        since it was last modified
+        """
+        with self._lock:
+            if path in self._entries:
+                return False
+            if path not in self._checked:
+                return True
+            return self._checked[path] != getMtime(path)
+
+    def clear(self):
+        """
+        Removes all entries
+        """
+        with self._lock:
+            self._entries.clear()
+            self._shared.clear()
+            self._checked.clear()
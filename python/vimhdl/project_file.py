@@ -0,0 +1,202 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Minimal reader for hdlcc project files, only concerned about which sources
+are part of the project
+"""
+
+import glob
+import logging
+import os.path as p
+import re
+from collections import Counter, OrderedDict, namedtuple
+
+_logger = logging.getLogger(__name__)
+
+_COMMENTS = re.compile(r"\s*#.*$")
+_SOURCE_LINE = re.compile(
+    r"^\s*(?P<language>vhdl|verilog|systemverilog)\s+"
+    r"(?P<library>\S+)\s+(?P<path>\S+)\s*(?P<flags>.*?)\s*$", flags=re.I)
+
+Source = namedtuple('Source', ('language', 'library', 'path', 'flags'))
+
+def parseSourceLine(line, root='.'):
+    """
+    Returns a list of Source objects described by line (more than one if
+    the path is a glob pattern) or an empty list if line does not describe a
+    source. Relative paths are relative to 'root'
+    """
+    match = _SOURCE_LINE.match(_COMMENTS.sub('', line))
+    if match is None:
+        return []
+
+    language, library, path, flags = match.group(
+        'language', 'library', 'path', 'flags')
+
+    path = p.normpath(p.join(root, p.expanduser(path)))
+
+    if glob.has_magic(path):
+        paths = sorted(glob.glob(path))
+    else:
+        paths = [path]
+
+    return [Source(language.lower(), library, x, flags) for x in paths]
+
+def findProjectFile(path, filename='vimhdl.prj'):
+    """
+    Searches for filename on path and its parents, returning the first one
+    found or None
+    """
+    path = p.abspath(path)
+    while True:
+        candidate = p.join(path, filename)
+        if p.isfile(candidate):
+            return candidate
+        parent = p.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+def getSources(project_file):
+    """
+    Returns a list of Source objects with the sources found on project_file
+    """
+    root = p.dirname(p.abspath(project_file))
+    sources = []
+    try:
+        with open(project_file) as fd:
+            for line in fd:
+                sources += parseSourceLine(line, root)
+    except IOError:
+        _logger.warning("Unable to read project file '%s'", project_file)
+
+    return sources
+
+def _relPath(path, root):
+    """
+    Returns path relative to root or the absolute path if that's not
+    possible (e.g., when they're on different drives on Windows)
+    """
+    try:
+        return p.relpath(path, root)
+    except ValueError:
+        return path
+
+def _formatSource(source, root):
+    """
+    Returns the project file line for source, with its path relative to
+    root
+    """
+    return ' '.join(
+        x for x in (source.language, source.library,
+                    _relPath(source.path, root), source.flags) if x)
+
+def _findMoved(missing, added, key):
+    """
+    Returns a dict mapping paths of missing sources to the added sources
+    they moved to, matched by key(source). Matches are only made when
+    there's a single missing and a single added source with the same key
+    """
+    missing_keys = Counter(key(source) for source in missing)
+    added_by_key = {}
+    for source in added:
+        added_by_key.setdefault(key(source), []).append(source)
+
+    moved = {}
+    for source in missing:
+        candidates = added_by_key.get(key(source), [])
+        if missing_keys[key(source)] == 1 and len(candidates) == 1:
+            moved[source.path] = candidates[0]
+    return moved
+
+def _isUnder(path, parents):
+    """
+    Tells if path is one of parents or is inside any of them
+    """
+    return any(path == parent or path.startswith(parent.rstrip(p.sep) + p.sep)
+               for parent in parents)
+
+def updateSources(lines, root, generated_lines, generated_root,
+                  searched_paths=('.', )):
+    """
+    Updates the project file contents in 'lines' (relative to root) with the
+    sources described by generated_lines (relative to generated_root), found
+    by searching searched_paths (also relative to generated_root).
+    Sources that were removed are commented out, sources that moved (the
+    file name is the same but the directory changed) keep their library and
+    flags and new sources are added to the end. Sources the generator didn't
+    report are only taken as removed or moved if they no longer exist or if
+    they're within the paths searched, so that sources added by hand from
+    elsewhere (e.g., IP cores) are kept. Moves are matched by library and
+    file name, falling back to the file name alone, and only when that can't
+    be mistaken for another source. Lines with glob patterns are left
+    untouched. Returns the updated lines and a tuple with the number of
+    sources added, removed and moved
+    """
+    generated = OrderedDict()
+    for line in generated_lines:
+        for source in parseSourceLine(line, generated_root):
+            generated.setdefault(source.path, source)
+
+    searched = [p.normpath(p.join(generated_root, p.expanduser(x)))
+                for x in searched_paths]
+
+    existing = set()
+    missing = []
+    for lnum, line in enumerate(lines):
+        match = _SOURCE_LINE.match(_COMMENTS.sub('', line))
+        if match is None:
+            continue
+        sources = parseSourceLine(line, root)
+        existing.update(source.path for source in sources)
+        if glob.has_magic(match.group('path')) or \
+                sources[0].path in generated:
+            continue
+        if not p.exists(sources[0].path) or \
+                _isUnder(sources[0].path, searched):
+            missing.append((lnum, sources[0]))
+
+    added = OrderedDict((path, source) for path, source in generated.items()
+                        if path not in existing)
+
+    # Library names given by the generator may differ from the ones on the
+    # project file, hence the fallback to file names only
+    moves = _findMoved([source for _, source in missing], added.values(),
+                       lambda source: (source.library,
+                                       p.basename(source.path)))
+    moves.update(_findMoved(
+        [source for _, source in missing if source.path not in moves],
+        [source for source in added.values()
+         if source not in moves.values()],
+        lambda source: p.basename(source.path)))
+
+    result = list(lines)
+    for lnum, source in missing:
+        if source.path in moves:
+            new_path = moves[source.path].path
+            del added[new_path]
+            result[lnum] = '%s  # moved from %s' % (
+                _formatSource(source._replace(path=new_path), root),
+                _relPath(source.path, root))
+        else:
+            result[lnum] = '# removed: ' + lines[lnum].strip()
+
+    if added:
+        result += ['', '# Sources added by VimhdlUpdateProjectFile']
+        result += [_formatSource(source, root) for source in added.values()]
+
+    return result, (len(added), len(missing) - len(moves), len(moves))
@@ -0,0 +1,119 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Built-in renderer that shows messages as signs and virtual text (Neovim
+extmarks or Vim text properties) without Syntastic
+"""
+
+import logging
+from itertools import count
+
+import vim  # pylint: disable=import-error
+from vimhdl.vim_helpers import toVimLiteral
+
+_logger = logging.getLogger(__name__)
+
+# Signs are placed with IDs starting from here to stay clear of the ones
+# placed by other plugins
+_SIGN_ID_BASE = 48000
+
+# Names of the signs and text property types defined by s:setupRenderer()
+_ERROR = 'vimhdl_error'
+_WARNING = 'vimhdl_warning'
+
+def getLineStates(records):
+    """
+    Returns a dict mapping line numbers to (name, text) of what should be
+    shown on them, given records sorted by _sortBuildMessages. Only the most
+    severe message of each line is shown, followed by the number of other
+    messages on the same line
+    """
+    lines = {}
+    for record in records:
+        lnum = record['lnum'] if isinstance(record['lnum'], int) else 0
+        # Messages not tied to a line are shown on the first one
+        lnum = max(lnum, 1)
+        if lnum in lines:
+            lines[lnum][2] += 1
+            continue
+        name = _ERROR if record['type'] == 'E' else _WARNING
+        lines[lnum] = [name, record['text'], 0]
+
+    result = {}
+    for lnum, (name, text, others) in lines.items():
+        if others:
+            text += ' (+%d)' % others
+        result[lnum] = (name, text)
+    return result
+
+class Renderer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Places signs and virtual text for messages on buffers. What was placed
+    on each buffer is kept so that rendering new messages only touches lines
+    whose messages changed. Must be used from Vim's main thread
+    """
+    def __init__(self):
+        self._ids = count(_SIGN_ID_BASE)
+        # bufnr -> {lnum: (name, text, sign ID, virtual text ID)}
+        self._placed = {}
+
+    def isRendered(self, bufnr):
+        """
+        Tells if messages have been rendered on bufnr
+        """
+        return bufnr in self._placed
+
+    def render(self, bufnr, records):
+        """
+        Shows records on bufnr, returning the number of lines updated
+        """
+        wanted = getLineStates(records)
+        placed = self._placed.setdefault(bufnr, {})
+
+        removed = []
+        for lnum, (name, text, sign_id, text_id) in list(placed.items()):
+            if wanted.get(lnum) != (name, text):
+                removed.append([sign_id, text_id, name])
+                del placed[lnum]
+
+        added = [[next(self._ids), lnum, name, text]
+                 for lnum, (name, text) in sorted(wanted.items())
+                 if lnum not in placed]
+
+        if not removed and not added:
+            return 0
+
+        _logger.debug("Buffer %d: removing %d and adding %d line(s)",
+                      bufnr, len(removed), len(added))
+
+        # Single call regardless of how many lines changed
+        text_ids = vim.eval('vimhdl#render(%d, %s, %s)' % (
+            bufnr, toVimLiteral(removed), toVimLiteral(added)))
+
+        for (sign_id, lnum, name, text), text_id in zip(added, text_ids):
+            placed[lnum] = (name, text, sign_id, int(text_id))
+
+        return len(removed) + len(added)
+
+    def reset(self, bufnr):
+        """
+        Removes everything placed on bufnr, which is needed when it's
+        reloaded since text properties are lost
+        """
+        if bufnr in self._placed:
+            self.render(bufnr, [])
+            del self._placed[bufnr]
@@ -0,0 +1,182 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Keeps track of the hdlcc server state so that hooks don't have to wait on a
+server that is known to be unresponsive
+"""
+
+import logging
+import time
+from threading import Lock
+
+_logger = logging.getLogger(__name__)
+
+HEALTHY = 'healthy'
+DEGRADED = 'degraded'
+DOWN = 'down'
+
+class ServerHealth(object):  # pylint: disable=useless-object-inheritance,too-many-instance-attributes
+    """
+    Server health state machine. The server is healthy while its process is
+    running and requests are being responded, degraded if requests have
+    recently failed and down if the process has exited or if the circuit
+    breaker is refusing requests. Can be used from any thread
+    """
+    # Interval in seconds between checks of the server process
+    poll_interval = 1
+    # Interval in seconds between probing a server that's not healthy
+    heartbeat_interval = 5
+    # Time in seconds before restarting a server that's running but not
+    # responding
+    unresponsive_timeout = 30
+    # Restarts back-off, in seconds
+    restart_delay = 1
+    max_restart_delay = 60
+    # Time in seconds the server must be healthy before restarts back-off is
+    # reset
+    stable_time = 60
+
+    def __init__(self, breaker):
+        self._lock = Lock()
+        self._breaker = breaker
+        self._process = None
+        self._last_poll = 0
+        self._exited = True
+        self._last_heartbeat = 0
+        self._down_since = None
+        self._delay = self.restart_delay
+        self._next_restart = 0
+        self._starting = False
+        self._started_at = None
+
+    def setProcess(self, process):
+        """
+        Sets the server process to monitor
+        """
+        with self._lock:
+            self._process = process
+            self._last_poll = 0
+            self._started_at = time.time()
+
+    def isProcessRunning(self):
+        """
+        Tells if the server process is running. The result is cached for
+        poll_interval seconds
+        """
+        with self._lock:
+            return self._isProcessRunning()
+
+    def _isProcessRunning(self):
+        """
+        Same as isProcessRunning, but expects the lock to be held
+        """
+        if self._process is None:
+            return False
+
+        now = time.time()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            self._exited = self._process.poll() is not None
+        return not self._exited
+
+    def getState(self):
+        """
+        Returns the current server state
+        """
+        with self._lock:
+            if not self._isProcessRunning() or self._breaker.isOpen():
+                if self._down_since is None:
+                    _logger.info("Server is down")
+                    self._down_since = time.time()
+                return DOWN
+
+            self._down_since = None
+
+            if self._breaker.failures:
+                return DEGRADED
+
+            # Only reset back-off once the server has been stable for a
+            # while to avoid restarting a server that keeps crashing too
+            # often
+            if self._started_at is not None and \
+                    time.time() - self._started_at > self.stable_time:
+                self._delay = self.restart_delay
+
+            return HEALTHY
+
+    def shouldSendHeartbeat(self):
+        """
+        Tells if the server should be probed. Only used when the server is
+        not healthy, since regular requests already tell us if the server is
+        responding
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_heartbeat < self.heartbeat_interval:
+                return False
+            self._last_heartbeat = now
+            return True
+
+    def shouldRestart(self):
+        """
+        Tells if the server should be restarted now, either because it has
+        exited or because it has not responded for too long. Restarts are
+        spaced with exponential back-off
+        """
+        with self._lock:
+            if self._process is None or self._starting:
+                return False
+
+            now = time.time()
+            if now < self._next_restart:
+                return False
+
+            if self._isProcessRunning():
+                return (self._down_since is not None and
+                        now - self._down_since > self.unresponsive_timeout)
+
+            return True
+
+    def isStarting(self):
+        """
+        Tells if the server is starting up, i.e., it's not expected to
+        respond yet
+        """
+        return self._starting
+
+    def onStartup(self):
+        """
+        Reports the server is being started
+        """
+        with self._lock:
+            self._starting = True
+
+    def onRestart(self):
+        """
+        Reports a restart has been started
+        """
+        with self._lock:
+            self._starting = True
+            self._next_restart = time.time() + self._delay
+            self._delay = min(2 * self._delay, self.max_restart_delay)
+
+    def onStartDone(self):
+        """
+        Reports a start or restart has finished (successfully or not)
+        """
+        with self._lock:
+            self._starting = False
@@ -0,0 +1,220 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Log files for vimhdl sessions. Each Vim session writes to its own set of
+files on the log directory; the client log is written by a separate thread
+and rotated (and compressed) when it gets too big. Logs from old sessions are
+compressed and removed when there are too many of them
+"""
+
+import errno
+import gzip
+import logging
+import logging.handlers
+import os
+import os.path as p
+import re
+import shutil
+import sys
+import time
+from threading import Thread
+
+try:  # Python 3.x
+    import queue
+except ImportError:  # Python 2.x
+    import Queue as queue
+
+_logger = logging.getLogger(__name__)
+
+_FORMAT = "%(asctime)s %(levelname)-8s %(threadName)s %(name)s: %(message)s"
+
+# Number of sessions whose logs are kept
+_MAX_SESSIONS = 10
+
+_ON_WINDOWS = sys.platform == 'win32'
+
+def getDefaultLogDir():
+    """
+    Returns the default location for log files
+    """
+    return p.join(os.environ.get('XDG_STATE_HOME',
+                                 p.expanduser('~/.local/state')),
+                  'vimhdl', 'logs')
+
+def _compress(path):
+    """
+    Compresses path to path + '.gz', removing the original file
+    """
+    with open(path, 'rb') as src:
+        with gzip.open(path + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler that compresses rotated files, which are named
+    <filename>.1.gz, <filename>.2.gz and so on
+    """
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if self.backupCount > 0:
+            for i in range(self.backupCount - 1, 0, -1):
+                src = '%s.%d.gz' % (self.baseFilename, i)
+                if p.exists(src):
+                    os.rename(src, '%s.%d.gz' % (self.baseFilename, i + 1))
+            if p.exists(self.baseFilename):
+                rotated = '%s.1' % self.baseFilename
+                os.rename(self.baseFilename, rotated)
+                _compress(rotated)
+
+        if not self.delay:
+            self.stream = self._open()
+
+def _isSessionActive(log_dir, session, names):
+    """
+    Tells if the Vim process that owns the session might still be using its
+    log files
+    """
+    match = re.search(r"-(\d+)$", session)
+    # os.kill would terminate the process on Windows, so only check if the
+    # files have been touched recently
+    if _ON_WINDOWS or match is None:
+        return any(time.time() - p.getmtime(p.join(log_dir, name)) < 86400
+                   for name in names)
+    try:
+        os.kill(int(match.group(1)), 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+def removeOldSessions(log_dir, current, max_sessions=_MAX_SESSIONS):
+    """
+    Compresses logs left uncompressed by previous sessions and removes the
+    ones from the oldest sessions so that at most max_sessions are kept.
+    Session files are named <session>.<suffix> and files from sessions that
+    are still running are left untouched
+    """
+    sessions = {}
+    for name in os.listdir(log_dir):
+        session = name.split('.', 1)[0]
+        if session != current:
+            sessions.setdefault(session, []).append(name)
+
+    for session, names in list(sessions.items()):
+        if _isSessionActive(log_dir, session, names):
+            del sessions[session]
+
+    # Session names start with their timestamp
+    old = sorted(sessions)
+    for session in old[:max(0, len(old) - max_sessions + 1)]:
+        for name in sessions.pop(session):
+            _logger.debug("Removing %s", name)
+            os.remove(p.join(log_dir, name))
+
+    for names in sessions.values():
+        for name in names:
+            if name.endswith('.log'):
+                try:
+                    _compress(p.join(log_dir, name))
+                except (IOError, OSError):
+                    _logger.warning("Unable to compress %s", name)
+
+class SessionLog(object):  # pylint: disable=useless-object-inheritance
+    """
+    Sets up logging for the current session on log_dir. Records from the
+    'vimhdl' logger at 'level' or above are handed over to a queue and
+    written to disk by a separate thread, so logging calls don't wait on
+    file I/O
+    """
+    def __init__(self, log_dir, level='INFO', max_bytes=1024 * 1024,
+                 backup_count=3):
+        self.log_dir = log_dir
+        self.session = '%s-%d' % (time.strftime('%Y%m%d-%H%M%S'),
+                                  os.getpid())
+        self._level = getattr(logging, str(level).upper(), logging.INFO)
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._file_handler = None
+        self._handler = None
+        self._listener = None
+        # Level of the 'vimhdl' logger before starting, restored when done
+        self._previous_level = logging.NOTSET
+
+    def getPath(self, suffix):
+        """
+        Returns the path of this session's log file with the given suffix
+        """
+        return p.join(self.log_dir, '%s.%s' % (self.session, suffix))
+
+    def start(self):
+        """
+        Starts logging to the session's client log file
+        """
+        if not p.isdir(self.log_dir):
+            os.makedirs(self.log_dir)
+
+        self._file_handler = CompressingRotatingFileHandler(
+            self.getPath('vimhdl.log'), maxBytes=self._max_bytes,
+            backupCount=self._backup_count, delay=True)
+        self._file_handler.setFormatter(logging.Formatter(_FORMAT))
+
+        try:
+            log_queue = queue.Queue()
+            self._handler = logging.handlers.QueueHandler(log_queue)
+            self._listener = logging.handlers.QueueListener(
+                log_queue, self._file_handler)
+            self._listener.start()
+        except AttributeError:  # Python 2.x
+            self._handler = self._file_handler
+
+        # Setting the level on the logger (instead of the handler) avoids
+        # creating and formatting records that would be discarded
+        logger = logging.getLogger('vimhdl')
+        self._previous_level = logger.level
+        logger.setLevel(self._level)
+        logger.addHandler(self._handler)
+
+        thread = Thread(target=self._removeOldSessions)
+        thread.daemon = True
+        thread.start()
+
+    def _removeOldSessions(self):
+        """
+        Cleans up logs from old sessions. Runs on a separate thread
+        """
+        try:
+            removeOldSessions(self.log_dir, self.session)
+        except (IOError, OSError):
+            _logger.exception("Unable to clean up old logs")
+
+    def stop(self):
+        """
+        Writes pending records and stops logging
+        """
+        if self._handler is None:
+            return
+        logger = logging.getLogger('vimhdl')
+        logger.removeHandler(self._handler)
+        logger.setLevel(self._previous_level)
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self._file_handler.close()
+        self._handler = None
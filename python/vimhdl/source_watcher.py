@@ -0,0 +1,233 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Watches the sources of a project for changes made outside Vim. Uses inotify
+when available and polls modification times otherwise
+"""
+
+import logging
+import os
+import os.path as p
+import select
+import struct
+import time
+from threading import Event, Thread
+
+import vimhdl.project_file as project_file_reader
+from vimhdl.messages_cache import getMtime
+
+_logger = logging.getLogger(__name__)
+
+# inotify event masks, from sys/inotify.h
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyBackend(object):  # pylint: disable=useless-object-inheritance
+    """
+    Reports files changed on a set of directories via Linux's inotify.
+    Raises OSError if inotify is not available or the directories can't be
+    watched
+    """
+    _mask = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+             _IN_CREATE | _IN_DELETE)
+
+    def __init__(self, dirs):
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            init = libc.inotify_init
+            add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            raise OSError("inotify is not available")
+
+        self._fd = init()
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+
+        self._dirs = {}
+        for path in dirs:
+            wd = add_watch(self._fd, path.encode('utf-8'), self._mask)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                self.close()
+                raise OSError(errno, "Unable to watch %s" % path)
+            self._dirs[wd] = path
+
+    def read(self, timeout):
+        """
+        Returns the paths that changed, waiting up to timeout seconds for
+        changes to happen
+        """
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return []
+
+        data = os.read(self._fd, 64 * 1024)
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if wd in self._dirs and name:
+                paths.append(p.join(self._dirs[wd], name.decode('utf-8')))
+        return paths
+
+    def close(self):
+        """
+        Stops watching
+        """
+        os.close(self._fd)
+
+class PollingBackend(object):  # pylint: disable=useless-object-inheritance
+    """
+    Reports files changed by polling their modification times every
+    'interval' seconds
+    """
+    def __init__(self, paths, interval=2):
+        self._interval = interval
+        self._mtimes = dict((path, getMtime(path)) for path in paths)
+        self._next_poll = time.time() + interval
+
+    def read(self, timeout):
+        """
+        Returns the paths that changed, waiting up to timeout seconds for
+        changes to happen
+        """
+        delay = self._next_poll - time.time()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+
+        self._next_poll = time.time() + self._interval
+
+        paths = []
+        for path, mtime in self._mtimes.items():
+            current = getMtime(path)
+            if current != mtime:
+                self._mtimes[path] = current
+                paths.append(path)
+        return paths
+
+    def close(self):
+        """
+        Stops watching
+        """
+        self._mtimes.clear()
+
+class SourceWatcher(object):  # pylint: disable=useless-object-inheritance
+    """
+    Watches the sources of project_file (and the project file itself) on a
+    separate thread. Changes are batched and 'callback' is called with the
+    set of sources changed once no other change happens for 'debounce'
+    seconds. Sources are read again if the project file changes
+    """
+    def __init__(self, project_file, callback, debounce=0.5,
+                 poll_interval=2):
+        self._project_file = p.abspath(project_file)
+        self._callback = callback
+        self._debounce = debounce
+        self._poll_interval = poll_interval
+        self._stop = Event()
+        self._thread = None
+        self._backend = None
+        self._paths = set()
+
+    @property
+    def project_file(self):
+        """
+        Project file whose sources are being watched
+        """
+        return self._project_file
+
+    def _setup(self):
+        """
+        Reads the sources from the project file and starts watching them
+        """
+        if self._backend is not None:
+            self._backend.close()
+
+        self._paths = set(
+            p.normpath(source.path) for source in
+            project_file_reader.getSources(self._project_file))
+        self._paths.add(self._project_file)
+
+        dirs = set(p.dirname(path) for path in self._paths)
+        dirs = [path for path in dirs if p.isdir(path)]
+
+        try:
+            self._backend = InotifyBackend(dirs)
+            _logger.info("Watching %d directories with inotify", len(dirs))
+        except OSError as exc:
+            _logger.info("Polling %d files for changes (%s)",
+                         len(self._paths), exc)
+            self._backend = PollingBackend(self._paths, self._poll_interval)
+
+    def _run(self):
+        """
+        Collects changes until stopped
+        """
+        self._setup()
+        pending = set()
+        last_change = 0
+
+        while not self._stop.is_set():
+            # Wake up often enough to notice when we're asked to stop
+            changed = self._backend.read(self._debounce if pending else 1)
+            changed = set(p.normpath(x) for x in changed) & self._paths
+
+            if self._project_file in changed:
+                _logger.info("Project file changed, reading sources again")
+                changed.discard(self._project_file)
+                self._setup()
+
+            if changed:
+                pending |= changed
+                last_change = time.time()
+            elif pending and time.time() - last_change >= self._debounce:
+                _logger.debug("Sources changed: %s", sorted(pending))
+                try:
+                    self._callback(pending)
+                except: # pragma: no cover
+                    _logger.exception("Error handling changed sources")
+                pending = set()
+
+        self._backend.close()
+
+    def start(self):
+        """
+        Starts watching on a separate thread
+        """
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops watching
+        """
+        self._stop.set()
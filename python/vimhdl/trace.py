@@ -0,0 +1,250 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Traces of vimhdl sessions. Calls Vim makes to the client and requests the
+client sends to the server are written to a file with one JSON object per
+line, which can be replayed later with .ci/benchmarks/replay_trace.py or
+converted to Chrome's trace event format by toChromeTrace.
+
+The first line is a header and each of the others is a record with the
+following keys:
+    t     Start time in seconds since the trace started
+    d     Duration in seconds
+    k     'call' for entry points called by Vim, 'request' for requests and
+          'span' for steps within them, such as decoding responses
+    n     Name of the entry point, request method or step
+    main  Whether it ran on Vim's main thread
+    th    Name of the thread it ran on
+Call records may have 'a' with the arguments that are strings. Request
+records have the request payload 'p', its size 'ps', the response size 'rs'
+(null for streamed responses) and 'ok', which is false if the server could
+not be reached or responded with an error. Requests also have the ID sent
+to the server on the X-Vimhdl-Request-Id header as 'id' and, if they were
+sent asynchronously, the time they waited to be sent as 'q'
+"""
+
+import json
+import logging
+import os
+import time
+from itertools import count
+from threading import Lock, current_thread
+
+_logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+# Header with the request ID, so the server can match its own spans to the
+# client's
+REQUEST_ID_HEADER = 'X-Vimhdl-Request-Id'
+
+def _getThreadInfo():
+    name = current_thread().name
+    return name == 'MainThread', name
+
+class _NullSpan(object):  # pylint: disable=useless-object-inheritance
+    """
+    Span used when tracing is disabled
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span(object):  # pylint: disable=useless-object-inheritance
+    """
+    Context manager that records the time taken by the code it wraps
+    """
+    def __init__(self, recorder, name):
+        self._recorder = recorder
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.time()
+        return self
+
+    def __exit__(self, *_):
+        self._recorder.recordSpan(self._name, self._start,
+                                  time.time() - self._start)
+
+class TraceRecorder(object):  # pylint: disable=useless-object-inheritance
+    """
+    Writes trace records to path. Records can be written by any thread
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._fd = None
+        self._start = None
+        self._request_ids = count(1)
+        # Number of entry points currently running on the main thread, so
+        # that entry points calling others are recorded only once
+        self.depth = 0
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        with self._lock:
+            if self._fd is not None:
+                self._fd.write(line)
+
+    def start(self):
+        """
+        Opens the trace file and writes the header
+        """
+        self._start = time.time()
+        self._fd = open(self.path, 'w')
+        _logger.info("Writing trace to %s", self.path)
+        self._write({'trace': TRACE_VERSION, 'start': self._start,
+                     'pid': os.getpid()})
+
+    def flush(self):
+        """
+        Writes buffered records to the trace file
+        """
+        with self._lock:
+            if self._fd is not None:
+                self._fd.flush()
+
+    def stop(self):
+        """
+        Closes the trace file
+        """
+        with self._lock:
+            if self._fd is not None:
+                self._fd.close()
+                self._fd = None
+
+    def _makeRecord(self, kind, name, start, duration):
+        main, thread = _getThreadInfo()
+        return {'t': round(start - self._start, 6),
+                'd': round(duration, 6),
+                'k': kind,
+                'n': name,
+                'main': main,
+                'th': thread}
+
+    def nextRequestId(self):
+        """
+        Returns a new ID for a request
+        """
+        return '%d-%d' % (os.getpid(), next(self._request_ids))
+
+    def span(self, name):
+        """
+        Returns a context manager that records the time taken by the code it
+        wraps as a step called name
+        """
+        return Span(self, name)
+
+    def recordSpan(self, name, start, duration):
+        """
+        Records a step within a call or request
+        """
+        self._write(self._makeRecord('span', name, start, duration))
+
+    def recordCall(self, name, start, duration, args=()):
+        """
+        Records a call to an entry point
+        """
+        record = self._makeRecord('call', name, start, duration)
+        args = [x for x in args if isinstance(x, str)]
+        if args:
+            record['a'] = args
+        self._write(record)
+
+    def recordRequest(self, meth, payload, start, duration, response=None,
+                      stream=False, request_id=None, queued=None):
+        """
+        Records a request sent to the server. response is None if the server
+        could not be reached. queued is the time asynchronous requests waited
+        to be sent
+        """
+        if response is None or stream:
+            response_size = None
+        else:
+            response_size = len(response.content)
+
+        record = self._makeRecord('request', meth, start, duration)
+        record.update({'p': payload,
+                       'ps': len(json.dumps(payload, default=str)),
+                       'rs': response_size,
+                       'ok': response is not None and response.ok,
+                       'id': request_id})
+        if queued is not None:
+            record['q'] = round(queued, 6)
+        self._write(record)
+
+def readTrace(path):
+    """
+    Returns the header and the list of records of the trace on path
+    """
+    with open(path) as fd:
+        header = json.loads(fd.readline())
+        if header.get('trace') != TRACE_VERSION:
+            raise ValueError("Unsupported trace version: %s" %
+                             header.get('trace'))
+        # The last line may still be being written if the trace is in use
+        records = [json.loads(line) for line in fd
+                   if line.endswith('\n') and line.strip()]
+    return header, records
+
+def toChromeTrace(header, records):
+    """
+    Converts a trace to Chrome's trace event format, which can be opened with
+    chrome://tracing or https://ui.perfetto.dev. Time asynchronous requests
+    waited to be sent is shown as separate 'queued' async events, keyed by
+    the request ID, since they overlap with whatever the thread sending them
+    was doing before
+    """
+    pid = header.get('pid', 0)
+    thread_ids = {}
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+               'args': {'name': 'vimhdl client'}}]
+
+    def getThreadId(record):
+        name = record.get('th') or ('MainThread' if record['main'] else
+                                    'Worker')
+        if name not in thread_ids:
+            # Keep the main thread on top
+            thread_ids[name] = 0 if name == 'MainThread' else \
+                    len(thread_ids) + 1
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': thread_ids[name], 'args': {'name': name}})
+        return thread_ids[name]
+
+    for record in records:
+        start = 1e6 * (header['start'] + record['t'])
+        tid = getThreadId(record)
+        args = dict((key, record[key]) for key in
+                    ('a', 'id', 'ps', 'rs', 'ok') if key in record)
+
+        events.append({'name': record['n'], 'cat': record['k'], 'ph': 'X',
+                       'ts': start, 'dur': 1e6 * record['d'], 'pid': pid,
+                       'tid': tid, 'args': args})
+
+        if record.get('q'):
+            queued = {'name': 'queued ' + record['n'], 'cat': 'queue',
+                      'id': record.get('id') or str(len(events)),
+                      'pid': pid, 'tid': tid}
+            events.append(dict(queued, ph='b', ts=start - 1e6 * record['q']))
+            events.append(dict(queued, ph='e', ts=start))
+
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
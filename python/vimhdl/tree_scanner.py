@@ -0,0 +1,124 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Fingerprints directory trees with HDL sources, so that the project file
+generator only runs when something has changed
+"""
+
+import hashlib
+import logging
+import os
+import os.path as p
+import stat
+
+_logger = logging.getLogger(__name__)
+
+# Extensions of files that affect the generated project file
+_EXTENSIONS = ('.vhd', '.vhdl', '.v', '.vh', '.sv', '.svh')
+
+def _listDir(path):
+    """
+    Returns the subdirectories and HDL files (not following symlinks) of
+    path
+    """
+    dirs = []
+    files = []
+    for name in os.listdir(path):
+        try:
+            mode = os.lstat(p.join(path, name)).st_mode
+        except OSError:
+            continue
+        if stat.S_ISDIR(mode):
+            dirs.append(name)
+        elif p.splitext(name)[1].lower() in _EXTENSIONS:
+            files.append(name)
+    return dirs, files
+
+class TreeScanner(object):  # pylint: disable=useless-object-inheritance
+    """
+    Walks directory trees and fingerprints them based on the modification
+    times of directories and HDL files. Directory listings are cached by the
+    directory's modification time (which changes when entries are added,
+    removed or renamed), so only directories that changed since the last
+    scan are listed again. The server's finder walks the trees on its own
+    whenever something changed, so this is only meant to tell if it needs
+    to run at all
+    """
+    def __init__(self, listings=None):
+        # path -> [mtime, dirs, files]
+        self._listings = dict(listings or {})
+        self._listed = 0
+
+    @property
+    def listings(self):
+        """
+        Directory listings found on the last scan, can be used to create
+        another scanner
+        """
+        return self._listings
+
+    def _scanDir(self, path, listings, entries):
+        """
+        Returns the subdirectories of path after adding path and its files
+        to entries
+        """
+        try:
+            mtime = p.getmtime(path)
+        except OSError:
+            return []
+
+        cached = self._listings.get(path)
+        if cached is not None and cached[0] == mtime:
+            dirs, files = cached[1], cached[2]
+        else:
+            try:
+                dirs, files = _listDir(path)
+            except OSError:
+                return []
+            self._listed += 1
+
+        entries.append((path, mtime))
+        for name in files:
+            try:
+                entries.append((p.join(path, name),
+                                p.getmtime(p.join(path, name))))
+            except OSError:
+                pass
+
+        listings[path] = [mtime, dirs, files]
+        return [p.join(path, name) for name in dirs]
+
+    def scan(self, paths):
+        """
+        Scans paths and returns a fingerprint of the trees found
+        """
+        listings = {}
+        entries = []
+        self._listed = 0
+
+        pending = [p.abspath(path) for path in paths]
+        while pending:
+            pending += self._scanDir(pending.pop(), listings, entries)
+
+        self._listings = listings
+        _logger.debug("Scanned %d directories, %d listed", len(listings),
+                      self._listed)
+
+        digest = hashlib.sha1()
+        for path, mtime in sorted(entries):
+            digest.update(('%s %r\n' % (path, mtime)).encode('utf-8'))
+        return digest.hexdigest()
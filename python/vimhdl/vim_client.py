@@ -16,28 +16,80 @@
 # along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
 "Wrapper for vim-hdl usage within Vim's Python interpreter"
 
+import functools
+import json
 import logging
 import os
 import os.path as p
-import subprocess as subp
 import sys
 import time
-from multiprocessing import Queue
+from collections import deque
+from threading import Event, Lock, Thread
 
 import vim  # pylint: disable=import-error
 import vimhdl
+import vimhdl.cache_dir as cache_dir
+import vimhdl.project_file as project_file_reader
 import vimhdl.vim_helpers as vim_helpers
+from vimhdl.atomic_file import AtomicFile
 from vimhdl.base_requests import (BaseRequest, GetBuildSequence,
                                   GetDependencies, OnBufferLeave,
                                   OnBufferVisit, RequestHdlccInfo,
-                                  RequestMessagesByPath, RequestProjectRebuild,
-                                  RequestQueuedMessages, RunConfigGenerator)
-from vimhdl.config_gen_wrapper import ConfigGenWrapper
+                                  RequestMessagesByPath,
+                                  RequestMessagesByPaths,
+                                  RequestProjectMessages,
+                                  RequestProjectRebuild,
+                                  RequestQueuedMessages, RequestShutdown,
+                                  RunConfigGenerator)
+from vimhdl.messages_cache import MessagesCache, getMtime
+from vimhdl.renderer import Renderer
+from vimhdl.server_health import DEGRADED, DOWN, HEALTHY, ServerHealth
+from vimhdl.trace import (NULL_SPAN, TraceRecorder, readTrace,
+                          toChromeTrace)
+from vimhdl.tree_scanner import TreeScanner
+
+try:  # Python 3.x
+    import queue
+except ImportError:  # Python 2.x
+    import Queue as queue
 
 _ON_WINDOWS = sys.platform == 'win32'
 
+# Extensions of the files we set hooks up for
+_HDL_EXTENSIONS = ('.vhd', '.vhdl', '.v', '.sv')
+
+# Time in seconds to wait for the server to exit after asking it to shutdown
+# and after sending SIGTERM
+_SHUTDOWN_TIMEOUT = 2
+_TERMINATE_TIMEOUT = 1
+
+# Default limit for the size of all cache directories, in MB
+_DEFAULT_CACHE_MAX_SIZE = 512
+
+# Number of paths per request when the server can't stream project messages
+_PROJECT_MESSAGES_CHUNK_SIZE = 20
+
+# Number of lines of the generated project file handled at a time
+_GENERATOR_CHUNK_SIZE = 500
+
+# Number of lines of the server's output kept in memory
+_SERVER_OUTPUT_LINES = 100
+
 _logger = logging.getLogger(__name__)
 
+def _iterChunks(iterable, size):
+    """
+    Yields lists with up to size items from iterable
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 def _sortKey(record):
     """
     Key for sorting records
@@ -60,6 +112,67 @@ def _sortBuildMessages(records):
     records.sort(key=_sortKey)
     return records
 
+def _toVimMessage(msg, filename='', bufnr=None):
+    """
+    Converts a message received from the server into a dict Vim can use on
+    the quickfix or location lists
+    """
+    text = str(msg['error_message']) if msg['error_message'] else ''
+    vim_fmt_dict = {
+        'lnum'     : str(msg['line_number']) or '-1',
+        'filename' : str(msg['filename']) or filename,
+        'valid'    : '1',
+        'text'     : text,
+        'nr'       : str(msg['error_number']) or '0',
+        'type'     : str(msg['error_type']) or 'E',
+        'col'      : str(msg['column']) or '0'}
+    if bufnr is not None:
+        vim_fmt_dict['bufnr'] = str(bufnr)
+    try:
+        vim_fmt_dict['subtype'] = str(msg['error_subtype'])
+    except KeyError:
+        pass
+
+    _logger.debug(vim_fmt_dict)
+    return vim_fmt_dict
+
+def _traced(func):
+    """
+    Records calls to entry points on the trace, if enabled
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        recorder = BaseRequest.recorder
+        # Entry points called by others are already accounted for
+        if recorder is None or recorder.depth:
+            return func(self, *args, **kwargs)
+
+        recorder.depth += 1
+        start = time.time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            recorder.depth -= 1
+            recorder.recordCall(func.__name__, start, time.time() - start,
+                                args)
+    return wrapper
+
+def _formatCounts(messages):
+    """
+    Returns the number of errors and warnings on messages (as converted by
+    _toVimMessage) in the format used by vimhdl#status()
+    """
+    errors = sum(1 for x in messages if x['type'] == 'E')
+    return 'E:%d W:%d' % (errors, len(messages) - errors)
+
+def _span(name):
+    """
+    Returns a context manager that records the time taken by the code it
+    wraps on the trace, if enabled
+    """
+    recorder = BaseRequest.recorder
+    return NULL_SPAN if recorder is None else recorder.span(name)
+
 # pylint:disable=inconsistent-return-statements
 
 class VimhdlClient:  #pylint: disable=too-many-instance-attributes
@@ -81,28 +194,248 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
         self._python = options.get('python', 'python')
         self._host = options.get('host', 'localhost')
         self._port = options.get('port', vim_helpers.getUnusedLocalhostPort())
-        self._log_level = str(options.get('log_level', 'DEBUG'))
-        self._log_stream = options.get('log_target', '/tmp/hdlcc.log')
+        self._log_level = str(options.get(
+            'log_level', vim_helpers.getVimGlobal('vimhdl_log_level', 'INFO')))
+        self._log_target = options.get('log_target')
+        # Started by _startSession
+        self._session_log = None
 
         self._posted_notifications = []
-
-        self._ui_queue = Queue()
-        self.helper_wrapper = ConfigGenWrapper()
+        # Most recent lines the server wrote to stdout and stderr
+        self._server_output = deque(maxlen=_SERVER_OUTPUT_LINES)
+
+        self._ui_queue = queue.Queue()
+        self._health = ServerHealth(BaseRequest.breaker)
+        self._messages_cache = MessagesCache()
+        # Cleared if the server doesn't handle requesting messages for
+        # multiple paths at once. It's never set back, so it can be cleared
+        # from any thread
+        self._batch_supported = True
+        self._renderer = Renderer()
+        # Numbers of the buffers rendered by requestRender
+        self._rendered = set()
+        # Paths whose messages are being requested asynchronously and the
+        # callbacks waiting for them. Only used on Vim's main thread
+        self._fetching = {}
+        # Callables produced by background jobs that must run on Vim's main
+        # thread
+        self._events = queue.Queue()
+        self._jobs_lock = Lock()
+        self._running_jobs = 0
+        # Set to cancel the running project rebuild
+        self._rebuild_cancel = None
+        # Request of the running project rebuild, aborted when cancelled
+        self._rebuild_request = None
+        self._helper_wrapper = None
+        self._watcher = None
+        # Cache directory marked as in use by this session
+        self._cache_dir = None
+        self._generator_running = False
+        self._generator_started = False
+        self._generator_lines = 0
+        # State shown by vimhdl#status(), which reads an unset g:vimhdl_status
+        # as empty
+        self._status = ''
+        self._progress = ''
+        self._last_check_latency = None
+        self._polling = False
 
         # Set url on the BaseRequest class as well
         BaseRequest.url = 'http://{}:{}'.format(self._host, self._port)
 
+    def _startSession(self):
+        """
+        Starts logging to this session's files and recording the trace (if
+        enabled). Only done once the server is needed, i.e., when an HDL
+        buffer is opened, so that Vim sessions not editing HDL files don't
+        create files or start threads
+        """
+        if self._session_log is not None:
+            return
+        self._session_log = self._startSessionLog()
+        self._startTrace()
+
+    def _startSessionLog(self):
+        """
+        Starts writing logs to this session's files on the log directory,
+        falling back to the temporary directory if it can't be created
+        """
+        from vimhdl.session_log import SessionLog, getDefaultLogDir
+        import tempfile
+
+        log_dir = p.expanduser(vim_helpers.getVimGlobal('vimhdl_log_dir',
+                                                        getDefaultLogDir()))
+        session_log = SessionLog(log_dir, self._log_level)
+        try:
+            session_log.start()
+        except (IOError, OSError):
+            session_log = SessionLog(tempfile.gettempdir(), self._log_level)
+            session_log.start()
+            self._logger.exception("Unable to use '%s' for logs", log_dir)
+
+        self._logger.info("Logging to %s", session_log.getPath('vimhdl.log'))
+        return session_log
+
+    def _startTrace(self):
+        """
+        Starts recording a trace of the session if enabled by the user
+        """
+        if not int(vim_helpers.getVimGlobal('vimhdl_trace', 0)):
+            return
+
+        recorder = TraceRecorder(self._session_log.getPath('trace.jsonl'))
+        try:
+            recorder.start()
+        except (IOError, OSError):
+            self._logger.exception("Unable to write trace")
+            return
+        BaseRequest.recorder = recorder
+
+    def _stopTrace(self):  # pylint: disable=no-self-use
+        """
+        Stops recording the trace, if enabled
+        """
+        recorder = BaseRequest.recorder
+        if recorder is not None:
+            BaseRequest.recorder = None
+            recorder.stop()
+
+    @property
+    def helper_wrapper(self):
+        """
+        Project file generator wrapper. Created when first used because it
+        depends on hdlcc, which is slow to import
+        """
+        if self._helper_wrapper is None:
+            from vimhdl.config_gen_wrapper import ConfigGenWrapper
+            self._helper_wrapper = ConfigGenWrapper()
+        return self._helper_wrapper
+
     def startServer(self):
         """
         Starts the hdlcc server, waits until it responds and register
         server shutdown when exiting Vim's Python interpreter
         """
         self._startServerProcess()
-        self._waitForServerSetup()
+        if not self._waitForServerSetup():
+            self._postError("Unable to talk to server")
+        self._startWatcher()
 
         import atexit
         atexit.register(self.shutdown)
 
+    def prewarm(self):
+        """
+        Starts the server in the background and requests the project to be
+        parsed, provided a project file is set or can be found on the current
+        directory or its parents. Returns True if the server was started
+        """
+        project_file = vim_helpers.getProjectFile() or \
+                project_file_reader.findProjectFile(os.getcwd(),
+                                                    self._default_conf_filename)
+        if project_file is None:
+            self._logger.info("No project file found, won't prewarm")
+            return False
+
+        # Make sure buffers opened from now on use the same project file
+        if 'vimhdl_conf_file' not in vim.vars:
+            vim.vars['vimhdl_conf_file'] = project_file
+
+        self._logger.info("Prewarming server for %s", project_file)
+        self._startServerProcess()
+        self._health.onStartup()
+        self._startBackgroundJob(self._waitForPrewarm, project_file)
+        self._startWatcher(project_file)
+
+        import atexit
+        atexit.register(self.shutdown)
+
+        return True
+
+    def _startWatcher(self, project_file=None):
+        """
+        Starts watching the project sources for changes made outside Vim if
+        enabled by the user. If the project file is not the one being
+        watched (e.g., g:vimhdl_conf_file has changed), the watcher is
+        restarted
+        """
+        if not int(vim_helpers.getVimGlobal('vimhdl_watch_sources', 0)):
+            return
+
+        project_file = project_file or vim_helpers.getProjectFile()
+        if project_file is None:
+            self._logger.debug("No project file set, won't watch sources")
+            return
+
+        if self._watcher is not None:
+            if self._watcher.project_file == p.abspath(project_file):
+                return
+            self._logger.info("Project file changed to %s, restarting "
+                              "source watcher", project_file)
+            self._watcher.stop()
+            self._watcher = None
+
+        from vimhdl.source_watcher import SourceWatcher
+        self._watcher = SourceWatcher(
+            project_file,
+            lambda paths: self._onSourcesChanged(project_file, paths))
+        self._watcher.start()
+        vim.command('call vimhdl#startWatchPolling()')
+
+    def _onSourcesChanged(self, project_file, paths):
+        """
+        Requests messages for sources changed outside Vim so that the server
+        rebuilds them right away, caching the results for when they're
+        checked and updating buffers already rendered. Sources checked since
+        they were last modified (e.g. saved from Vim) are skipped. Runs on
+        the watcher thread, so only uses state that's safe to use from any
+        thread (the messages cache and server health have their own locks)
+        """
+        paths = sorted(x for x in paths if self._messages_cache.needsCheck(x))
+        if not paths or self._health.getState() != HEALTHY:
+            return
+
+        self._logger.info("Updating messages for %d source(s) changed",
+                          len(paths))
+        updated = []
+        for path, messages in self._iterMessagesByPaths(project_file, paths):
+            self._messages_cache.put(path, messages)
+            updated.append(path)
+
+        if updated:
+            self._runOnMainThread(self._renderChangedSources, updated)
+
+    def _renderChangedSources(self, paths):
+        """
+        Renders messages cached by _onSourcesChanged on buffers that have
+        already been rendered, so they don't wait for the buffers to be
+        entered or saved
+        """
+        paths = set(paths)
+        for vim_buffer in vim.buffers:
+            bufnr = vim_buffer.number
+            path = p.abspath(vim_buffer.name)
+            if bufnr not in self._rendered or path not in paths:
+                continue
+            messages = self._getCachedMessages(path)
+            if messages is not None:
+                changedtick = vim.eval(
+                    "getbufvar({0}, 'changedtick')".format(bufnr))
+                self._renderMessages(bufnr, changedtick, messages)
+
+    def _waitForPrewarm(self, project_file):
+        """
+        Waits for the server to respond and then requests project info, which
+        makes the server parse the project. Runs on a separate thread
+        """
+        started = self._waitForServerSetup()
+        self._health.onStartDone()
+        if started:
+            RequestHdlccInfo(project_file=project_file).sendRequest()
+            self._runOnMainThread(self._renderCurrentBuffer)
+        else:
+            self._runOnMainThread(self._postError, "Unable to talk to server")
+
     def _postError(self, msg):
         """
         Post errors to the user once
@@ -121,17 +454,162 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
     def _isServerAlive(self):
         """
-        Checks if the the server is alive
+        Checks if the the server is alive. Uses the cached server state so
+        that hooks don't wait on a server that is known to be unresponsive,
+        probing or restarting it when needed
         """
-        is_alive = self._server.poll() is None
-        if not is_alive:
+        state = self._health.getState()
+        if state == HEALTHY:
+            return True
+
+        # Server is not expected to respond yet
+        if self._health.isStarting():
+            return False
+
+        if self._health.isProcessRunning() and \
+                self._health.shouldSendHeartbeat():
+            RequestHdlccInfo().sendRequestAsync()
+
+        if state == DEGRADED:
+            return True
+
+        if self._health.shouldRestart():
+            self._restartServer()
+        elif self._health.isProcessRunning():
+            self._postWarning("hdlcc server is not responding")
+        else:
             self._postWarning("hdlcc server is not running")
-        return is_alive
+
+        return False
+
+    def _restartServer(self):
+        """
+        Restarts the server using a new port and waits for it to respond on
+        a background job. The client state is kept, so the server is told
+        which buffers are open once it's up, and the server's on-disk project
+        cache is reused instead of rebuilding from scratch
+        """
+        self._logger.warning("Restarting hdlcc server")
+        vim_helpers.postVimWarning("Restarting hdlcc server")
+        self._health.onRestart()
+        self._stopServerProcess()
+        self._messages_cache.clear()
+
+        self._port = vim_helpers.getUnusedLocalhostPort()
+        BaseRequest.url = 'http://{}:{}'.format(self._host, self._port)
+
+        self._startServerProcess()
+        self._startBackgroundJob(self._waitForServerRestart)
+
+    def _waitForServerRestart(self):
+        """
+        Waits for a restarted server to respond. Runs on a separate thread
+        """
+        started = self._waitForServerSetup()
+        # Buffers are rendered again once the server responds, which is
+        # skipped while it's starting
+        self._health.onStartDone()
+        if started:
+            self._runOnMainThread(self._replayBufferVisits)
+            self._runOnMainThread(vim_helpers.postVimInfo,
+                                  "hdlcc server restarted")
+        else:
+            self._runOnMainThread(self._postError,
+                                  "Unable to talk to server after restart")
+
+    def _replayBufferVisits(self):
+        """
+        Notifies the server of all HDL buffers open, current buffer last so
+        that it's the most recently visited
+        """
+        current = vim.current.buffer
+        for vim_buffer in self._getHdlBuffers():
+            if vim_buffer.number != current.number:
+                OnBufferVisit(
+                    project_file=vim_helpers.getProjectFile(vim_buffer),
+                    path=vim_buffer.name).sendRequestAsync()
+
+        if current.name and \
+                p.splitext(current.name)[1].lower() in _HDL_EXTENSIONS:
+            OnBufferVisit(project_file=vim_helpers.getProjectFile(),
+                          path=current.name).sendRequestAsync()
+
+        self._renderCurrentBuffer()
+
+    def _renderCurrentBuffer(self):
+        """
+        Renders the current buffer if the built-in renderer or vim.diagnostic
+        are enabled, so that buffers opened while the server was starting
+        show its messages without having to be saved
+        """
+        if not set(self._getRenderers()) & set(('native', 'diagnostic')):
+            return
+        name = vim.current.buffer.name
+        if name and p.splitext(name)[1].lower() in _HDL_EXTENSIONS:
+            self.requestRender('ServerReady')
+
+    @_traced
+    def restartServer(self):
+        """
+        Restarts the server right away regardless of its state
+        """
+        if self._server is None:
+            self.startServer()
+            return
+        self._restartServer()
+
+    def _getHdlccVersion(self):  # pylint: disable=no-self-use
+        """
+        Returns the version of hdlcc bundled with vim-hdl
+        """
+        try:
+            import hdlcc  # pylint: disable=import-error
+            return hdlcc.__version__
+        except ImportError:
+            return 'unknown'
+
+    def _setupCacheDir(self):
+        """
+        Returns the directory the server should use to keep its design
+        database across sessions (or None if caching is disabled) and
+        removes the least recently used ones in the background if they're
+        taking too much space
+        """
+        project_file = vim_helpers.getProjectFile()
+        root = vim_helpers.getVimGlobal('vimhdl_cache_dir',
+                                        cache_dir.getDefaultCacheRoot())
+        if project_file is None or not root:
+            return None
+
+        max_size = 1024 * 1024 * int(vim_helpers.getVimGlobal(
+            'vimhdl_cache_max_size', _DEFAULT_CACHE_MAX_SIZE))
+
+        try:
+            path = cache_dir.getProjectCacheDir(
+                p.expanduser(root), project_file, self._getHdlccVersion())
+            cache_dir.markInUse(path)
+        except (IOError, OSError):
+            self._logger.exception("Unable to create cache directory")
+            return None
+
+        if self._cache_dir not in (None, path):
+            cache_dir.release(self._cache_dir)
+        self._cache_dir = path
+
+        thread = Thread(target=cache_dir.evict,
+                        args=(p.expanduser(root), max_size, path))
+        thread.daemon = True
+        thread.start()
+
+        return path
 
     def _startServerProcess(self):
         """
         Starts the hdlcc server
         """
+        import subprocess as subp
+
+        self._startSession()
         self._logger.info("Running vim_hdl client setup")
 
         vimhdl_path = p.abspath(p.join(p.dirname(__file__), '..', '..'))
@@ -143,71 +621,269 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
                hdlcc_server,
                '--host', self._host,
                '--port', str(self._port),
-               '--stdout', '/tmp/hdlcc-stdout.log',
-               '--stderr', '/tmp/hdlcc-stderr.log',
+               '--stdout', self._session_log.getPath('hdlcc-stdout.log'),
+               '--stderr', self._session_log.getPath('hdlcc-stderr.log'),
                '--attach-to-pid', str(os.getpid()),
                '--log-level', self._log_level,
-               '--log-stream', self._log_stream]
+               '--log-stream', (self._log_target or
+                                self._session_log.getPath('hdlcc.log'))]
 
-        self._logger.info("Starting hdlcc server with '%s'", cmd)
+        env = dict(os.environ)
+        server_cache_dir = self._setupCacheDir()
+        if server_cache_dir is not None:
+            env['HDLCC_CACHE_DIR'] = server_cache_dir
+
+        self._logger.info("Starting hdlcc server with '%s' (cache dir is "
+                          "'%s')", cmd, server_cache_dir)
 
         try:
             if _ON_WINDOWS:
                 self._server = subp.Popen(
-                    cmd, stdout=subp.PIPE, stderr=subp.PIPE,
+                    cmd, stdout=subp.PIPE, stderr=subp.PIPE, env=env,
                     creationflags=subp.CREATE_NEW_PROCESS_GROUP)
             else:
                 self._server = subp.Popen(
-                    cmd, stdout=subp.PIPE, stderr=subp.PIPE,
+                    cmd, stdout=subp.PIPE, stderr=subp.PIPE, env=env,
                     preexec_fn=os.setpgrp)
 
-            if not self._isServerAlive():
+            self._health.setProcess(self._server)
+            self._startPipeDrainers(self._server)
+            if not self._health.isProcessRunning():
                 vim_helpers.postVimError("Failed to launch hdlcc server")
         except subp.CalledProcessError:
             self._logger.exception("Error calling '%s'", " ".join(cmd))
 
+    def _drainPipe(self, pipe, name):
+        """
+        Reads lines from one of the server's pipes until it's closed,
+        keeping the most recent ones. Runs on a separate thread
+        """
+        for line in iter(pipe.readline, b''):
+            line = line.decode('utf-8', 'replace').rstrip()
+            self._logger.debug("Server %s: %s", name, line)
+            self._server_output.append('%s: %s' % (name, line))
+        pipe.close()
+
+    def _startPipeDrainers(self, server):
+        """
+        Starts threads to read the server's stdout and stderr. If nobody
+        reads them, the server blocks once the pipe buffers are full
+        """
+        for pipe, name in ((server.stdout, 'stdout'),
+                           (server.stderr, 'stderr')):
+            thread = Thread(target=self._drainPipe, args=(pipe, name),
+                            name='hdlcc-%s' % name)
+            thread.daemon = True
+            thread.start()
+
     def _waitForServerSetup(self):
         """
-        Wait for ~10s until the server is actually responding
+        Wait for ~10s until the server is actually responding. Returns True
+        if the server responded
         """
         for _ in range(10):
             time.sleep(0.2)
             request = RequestHdlccInfo()
-            response = request.sendRequest()
+            # The server is expected to not respond for a while, so bypass
+            # the circuit breaker to not let this affect other requests
+            response = request.sendRequest(fast_fail=False)
             self._logger.debug(response)
             if response:
                 self._logger.info("Ok, server is really up")
-                return
+                BaseRequest.breaker.reset()
+                return True
             self._logger.info("Server is not responding yet")
 
-        self._postError("Unable to talk to server")
+        return False
 
-    def shutdown(self):
+    def _waitForServerExit(self, timeout):
         """
-        Kills the hdlcc server
+        Waits up to timeout seconds for the server process to exit. Returns
+        True if it has exited
         """
-        if not self._isServerAlive():
+        deadline = time.time() + timeout
+        while self._server.poll() is None:
+            if time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _stopServerProcess(self, graceful=True):
+        """
+        Stops the hdlcc server process if it's running. When graceful is set
+        and the server is responding, it's asked to save its state and exit
+        first, escalating to SIGTERM and SIGKILL only if it doesn't exit in
+        time
+        """
+        if self._server is None or self._server.poll() is not None:
             self._logger.warning("Server is not running")
             return
-        self._logger.debug("Sending shutdown signal")
-        os.kill(self._server.pid, 9)
+
+        if graceful and not BaseRequest.breaker.isOpen():
+            self._logger.debug("Requesting server shutdown")
+            response = RequestShutdown().sendRequest(fast_fail=False)
+            # The server may exit before responding, so wait for it anyway,
+            # but not as long as if it had acknowledged the request
+            if self._waitForServerExit(_SHUTDOWN_TIMEOUT if response else
+                                       _TERMINATE_TIMEOUT):
+                self._logger.debug("Server exited")
+                return
+
+        self._logger.debug("Sending SIGTERM")
         self._server.terminate()
-        self._logger.debug("Done")
+        if self._waitForServerExit(_TERMINATE_TIMEOUT):
+            self._logger.debug("Server terminated")
+            return
+
+        self._logger.warning("Server did not terminate, killing it")
+        self._server.kill()
+        self._server.wait()
+
+    def shutdown(self):
+        """
+        Stops the hdlcc server, letting it save its state
+        """
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+            vim.command('call vimhdl#stopWatchPolling()')
+        self._stopServerProcess()
+        if self._cache_dir is not None:
+            cache_dir.release(self._cache_dir)
+            self._cache_dir = None
+        self._stopTrace()
+        if self._session_log is not None:
+            self._session_log.stop()
 
     def _handleAsyncRequest(self, response):
         """
-        Callback passed to asynchronous requests
+        Callback passed to asynchronous requests. Runs on the request's
+        thread, so decoding the response doesn't block Vim
         """
         if response is not None:
-            self._ui_queue.put(response)
+            with _span('json decode'):
+                ui_messages = response.json().get('ui_messages', [])
+            if ui_messages:
+                self._ui_queue.put(ui_messages)
+
+    def _runOnMainThread(self, func, *args):
+        """
+        Schedules func to be called with args on Vim's main thread. Vim's
+        API can't be used by any other thread
+        """
+        self._events.put((func, args))
+
+    def _startBackgroundJob(self, func, *args):
+        """
+        Runs func in a separate thread and starts polling for events it
+        generates
+        """
+        def job():
+            """
+            Keeps track of jobs running
+            """
+            try:
+                func(*args)
+            except: # pragma: no cover
+                self._logger.exception("Error running background job")
+            finally:
+                with self._jobs_lock:
+                    self._running_jobs -= 1
+
+        with self._jobs_lock:
+            self._running_jobs += 1
+
+        thread = Thread(target=job)
+        # Don't let pending jobs prevent Vim from exiting
+        thread.daemon = True
+        thread.start()
+        self._startPolling()
+
+    def _startPolling(self):
+        """
+        Makes Vim poll for events until there's nothing left to do
+        """
+        if not self._polling:
+            self._polling = True
+            vim.command('call vimhdl#startPolling()')
+
+    @_traced
+    def processPendingEvents(self):
+        """
+        Runs callables scheduled by background jobs. Returns True while
+        there are jobs or requests running or events to handle
+        """
+        while True:
+            try:
+                func, args = self._events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except: # pragma: no cover
+                self._logger.exception("Error handling event")
+
+        self._updateStatus()
+
+        with self._jobs_lock:
+            busy = self._running_jobs > 0 or not self._events.empty() or \
+                    bool(self._fetching)
+        if not busy:
+            self._polling = False
+        return busy
+
+    def _getStatus(self):
+        """
+        Returns the text for g:vimhdl_status
+        """
+        parts = []
+        if self._server is not None:
+            if self._health.isStarting():
+                parts.append('server starting')
+            else:
+                state = self._health.getState()
+                if state == DOWN:
+                    parts.append('server down')
+                elif state == DEGRADED:
+                    parts.append('server degraded')
+
+        if self._progress:
+            parts.append(self._progress.replace('vimhdl: ', '', 1))
+
+        # Requests sent by hooks aren't counted, otherwise every cursor move
+        # would change the status (and redraw status lines) twice
+        with self._jobs_lock:
+            pending = self._running_jobs + len(self._fetching)
+        if pending:
+            parts.append('%d pending' % pending)
+
+        if self._last_check_latency is not None:
+            parts.append('last check %dms' %
+                         (1000 * self._last_check_latency))
+
+        return 'vimhdl: ' + ', '.join(parts) if parts else ''
+
+    def _updateStatus(self):
+        """
+        Updates g:vimhdl_status and redraws status lines if it has changed,
+        so that vimhdl#status() only needs to read it. Returns True if it
+        has changed. Runs on Vim's main thread
+        """
+        status = self._getStatus()
+        if status == self._status:
+            return False
+        self._status = status
+        vim.vars['vimhdl_status'] = status
+        vim.command('redrawstatus!')
+        return True
 
     def _postQueuedMessages(self):
         """
         Empty our queue in a single message
         """
+        self.processPendingEvents()
         while not self._ui_queue.empty():
-            messages = self._ui_queue.get()
-            for severity, message in messages.json().get('ui_messages', []):
+            for severity, message in self._ui_queue.get():
                 if severity == 'info':
                     vim_helpers.postVimInfo(message)
                 elif severity == 'warning':
@@ -219,6 +895,300 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
                         "Unknown severity '%s' for message '%s'" %
                         (severity, message))
 
+    def _getHdlBuffers(self):  # pylint: disable=no-self-use
+        """
+        Returns the listed buffers that are HDL files
+        """
+        result = []
+        for vim_buffer in vim.buffers:
+            if not vim_buffer.name or not vim_buffer.options['buflisted']:
+                continue
+            if p.splitext(vim_buffer.name)[1].lower() in _HDL_EXTENSIONS:
+                result.append(vim_buffer)
+        return result
+
+    def _requestMessages(self, project_file, paths):
+        """
+        Requests messages for all paths, returning a dict indexed by path or
+        None if the server did not respond. Uses a single request when the
+        server supports it, otherwise only the first path is requested
+        """
+        if self._batch_supported and len(paths) > 1:
+            request = RequestMessagesByPaths(project_file=project_file,
+                                             paths=paths)
+            response = request.sendRequest()
+            messages_by_path = None
+            if response is not None:
+                with _span('json decode'):
+                    messages_by_path = response.json().get('messages')
+                if isinstance(messages_by_path, dict):
+                    return messages_by_path
+
+            # Only give up on batches if the server rejects them, not when
+            # it fails to respond for some other reason
+            if response is not None or \
+                    (request.status is not None and
+                     400 <= request.status < 500):
+                self._logger.info("Server doesn't seem to support requesting "
+                                  "messages for multiple paths")
+                self._batch_supported = False
+
+        # Either the server can't handle multiple paths, the batch request
+        # failed or we only need one, so stick to the first one
+        request = RequestMessagesByPath(project_file=project_file,
+                                        path=paths[0])
+        response = request.sendRequest()
+        if response is None:
+            return None
+
+        with _span('json decode'):
+            return {paths[0]: response.json().get('messages', [])}
+
+    def _getPathsToCheck(self, path):
+        """
+        Returns path followed by the paths of other HDL buffers that haven't
+        been checked since they were last modified
+        """
+        paths = [path]
+        for vim_buffer in self._getHdlBuffers():
+            other = p.abspath(vim_buffer.name)
+            if other not in paths and self._messages_cache.needsCheck(other):
+                paths.append(other)
+        return paths
+
+    def _getCachedMessages(self, path):
+        """
+        Returns messages for path that don't need to be requested, either
+        because they were fetched along with another path or because another
+        frontend has just requested them. Returns None otherwise
+        """
+        messages = self._messages_cache.pop(path)
+        if messages is not None:
+            self._logger.debug("Using cached messages for %s", path)
+            self._messages_cache.share(path, messages)
+            return messages
+
+        return self._messages_cache.getShared(path)
+
+    def _getMessagesByPath(self, project_file, path):
+        """
+        Gets messages for path, either from the cache or from the server.
+        When requesting, messages for other HDL buffers that haven't been
+        checked since they were last modified are also requested and cached
+        """
+        messages = self._getCachedMessages(path)
+        if messages is not None:
+            return messages
+
+        return self._fetchMessages(project_file, self._getPathsToCheck(path))
+
+    def _fetchMessages(self, project_file, paths):
+        """
+        Requests messages for paths, returning the ones for the first path
+        (which are shared with other frontends) and caching the others.
+        Returns None if the server did not respond. Can be called from any
+        thread
+        """
+        path = paths[0]
+        start = time.time()
+        messages_by_path = self._requestMessages(project_file, paths)
+        if messages_by_path is None:
+            return None
+        self._last_check_latency = time.time() - start
+
+        for other in paths[1:]:
+            if other in messages_by_path:
+                self._messages_cache.put(other, messages_by_path[other])
+
+        messages = messages_by_path.get(path, [])
+        self._messages_cache.share(path, messages)
+        return messages
+
+    def _fetchMessagesAsync(self, vim_buffer, callback):
+        """
+        Calls callback on Vim's main thread with the messages for vim_buffer
+        once they're available or None if the server did not respond.
+        Messages are requested on a worker thread and callers asking for the
+        same path while it's being requested wait for the same request
+        """
+        path = p.abspath(vim_buffer.name)
+        if path in self._fetching:
+            self._fetching[path].append(callback)
+            return
+
+        messages = self._getCachedMessages(path)
+        if messages is not None:
+            callback(messages)
+            return
+
+        self._fetching[path] = [callback]
+        self._startFetch(vim_helpers.getProjectFile(vim_buffer), path)
+
+    def _startFetch(self, project_file, path):
+        """
+        Requests messages for path on a worker thread
+        """
+        paths = self._getPathsToCheck(path)
+        mtime = getMtime(path)
+
+        def job():
+            messages = self._fetchMessages(project_file, paths)
+            self._runOnMainThread(self._onMessagesFetched, project_file,
+                                  path, mtime, messages)
+
+        BaseRequest.async_queue.put(job)
+        self._updateStatus()
+        self._startPolling()
+
+    def _onMessagesFetched(self, project_file, path, mtime, messages):
+        """
+        Hands messages requested by _fetchMessagesAsync to the callbacks
+        waiting for them
+        """
+        if messages is not None and getMtime(path) != mtime:
+            self._logger.debug("%s changed while being checked", path)
+            self._startFetch(project_file, path)
+            return
+
+        for callback in self._fetching.pop(path, []):
+            try:
+                callback(messages)
+            except: # pragma: no cover
+                self._logger.exception("Error handling messages for %s", path)
+
+    def _getRenderers(self):  # pylint: disable=no-self-use
+        """
+        Returns the list of frontends set by g:vimhdl_renderer
+        """
+        renderers = vim_helpers.getVimGlobal('vimhdl_renderer', 'syntastic')
+        if isinstance(renderers, list):
+            return renderers
+        return [renderers]
+
+    def _toBufferRecords(self, bufnr, changedtick, messages):
+        # pylint: disable=no-self-use
+        """
+        Converts messages for buffer bufnr into location list records and
+        updates the buffer's status. Returns None if the buffer no longer
+        exists
+        """
+        try:
+            vim_buffer = vim.buffers[bufnr]
+        except KeyError:
+            return None
+        if not vim_buffer.valid:
+            return None
+
+        with _span('vim conversion'):
+            records = _sortBuildMessages(
+                [_toVimMessage(msg, vim_buffer.name, bufnr)
+                 for msg in messages])
+            vim_buffer.vars['vimhdl_status'] = _formatCounts(records)
+            vim_buffer.vars['vimhdl_checked_tick'] = changedtick
+        return records
+
+    def _renderMessages(self, bufnr, changedtick, messages):
+        """
+        Shows messages on buffer bufnr with the frontends driven by vim-hdl
+        itself: the built-in renderer, which also updates the location list
+        if it's the current buffer, and Neovim's vim.diagnostic
+        """
+        if messages is None:
+            return
+        records = self._toBufferRecords(bufnr, changedtick, messages)
+        if records is None:
+            return
+
+        self._rendered.add(bufnr)
+        renderers = self._getRenderers()
+        with _span('render'):
+            if 'native' in renderers:
+                self._renderer.render(bufnr, records)
+                if vim.current.buffer.number == bufnr:
+                    vim.command("call setloclist(0, {0}, 'r')".format(
+                        vim_helpers.toVimLiteral(records)))
+            if 'diagnostic' in renderers:
+                vim.command("call vimhdl#setDiagnostics({0}, {1})".format(
+                    bufnr, vim_helpers.toVimLiteral(records)))
+
+    def _callAdapter(self, bufnr, callback, changedtick, messages):
+        """
+        Calls the Vim function callback with bufnr and the records for
+        messages, or an empty list if they couldn't be fetched
+        """
+        records = []
+        if messages is not None:
+            records = self._toBufferRecords(bufnr, changedtick,
+                                            messages) or []
+        vim.command("call {0}({1}, {2})".format(
+            callback, bufnr, vim_helpers.toVimLiteral(records)))
+
+    @_traced
+    def requestMessagesAsync(self, bufnr, callback):
+        """
+        Requests messages for buffer bufnr in the background and calls the
+        Vim function named callback with the buffer number and a list of
+        messages in the location list format once they're available (empty
+        if the server can't be reached). Used by adapters for plugins that
+        check buffers asynchronously, such as ALE. Requests are shared with
+        other frontends asking for the same buffer
+        """
+        self._postQueuedMessages()
+        bufnr = int(bufnr)
+
+        try:
+            vim_buffer = vim.buffers[bufnr]
+        except KeyError:
+            vim_buffer = None
+
+        if vim_buffer is None or not vim_buffer.name or \
+                not self._isServerAlive():
+            self._callAdapter(bufnr, callback, None, None)
+            return
+
+        changedtick = vim.eval("getbufvar({0}, 'changedtick')".format(bufnr))
+        self._fetchMessagesAsync(
+            vim_buffer,
+            lambda messages: self._callAdapter(bufnr, callback, changedtick,
+                                               messages))
+
+    @_traced
+    def requestRender(self, event):
+        """
+        Shows messages for the current buffer with the built-in renderer or
+        vim.diagnostic (enabled by g:vimhdl_renderer). Messages are requested
+        in the background and rendered once they arrive. Entering a buffer
+        only renders it if it hasn't been yet or if messages were cached for
+        it
+        """
+        self._postQueuedMessages()
+
+        vim_buffer = vim.current.buffer
+        if not vim_buffer.name:
+            return
+
+        bufnr = vim_buffer.number
+        changedtick = vim.eval('b:changedtick')
+
+        # Buffer has been (re)loaded, which removes text properties
+        if event == 'FileType':
+            self._renderer.reset(bufnr)
+            self._rendered.discard(bufnr)
+        elif event == 'BufEnter' and bufnr in self._rendered:
+            messages = self._getCachedMessages(p.abspath(vim_buffer.name))
+            if messages is not None:
+                self._renderMessages(bufnr, changedtick, messages)
+            return
+
+        if not self._isServerAlive():
+            return
+
+        self._fetchMessagesAsync(
+            vim_buffer,
+            lambda messages: self._renderMessages(bufnr, changedtick,
+                                                  messages))
+
+    @_traced
     def getMessages(self, vim_buffer=None, vim_var=None):
         """
         Returns a list of messages to populate the quickfix list. For
@@ -236,47 +1206,138 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
         project_file = vim_helpers.getProjectFile()
         path = p.abspath(vim_buffer.name)
+        changedtick = vim.eval(
+            "getbufvar({0}, 'changedtick')".format(vim_buffer.number))
 
-        request = RequestMessagesByPath(project_file=project_file, path=path)
-
-        response = request.sendRequest()
-        if response is None:
+        raw_messages = self._getMessagesByPath(project_file, path)
+        if raw_messages is None:
             return
 
-        messages = []
-        for msg in response.json().get('messages', []):
-            text = str(msg['error_message']) if msg['error_message'] else ''
-            vim_fmt_dict = {
-                'lnum'     : str(msg['line_number']) or '-1',
-                'bufnr'    : str(vim_buffer.number),
-                'filename' : str(msg['filename']) or vim_buffer.name,
-                'valid'    : '1',
-                'text'     : text,
-                'nr'       : str(msg['error_number']) or '0',
-                'type'     : str(msg['error_type']) or 'E',
-                'col'      : str(msg['column']) or '0'}
-            try:
-                vim_fmt_dict['subtype'] = str(msg['error_subtype'])
-            except KeyError:
-                pass
-
-            _logger.info(vim_fmt_dict)
-            messages.append(vim_fmt_dict)
+        with _span('vim conversion'):
+            messages = _sortBuildMessages(
+                [_toVimMessage(msg, vim_buffer.name, vim_buffer.number)
+                 for msg in raw_messages])
+            vim_buffer.vars['vimhdl_status'] = _formatCounts(messages)
+            vim_buffer.vars['vimhdl_checked_tick'] = changedtick
 
         self.requestUiMessages('getMessages')
 
         if vim_var is None:
-            return _sortBuildMessages(messages)
+            return messages
+
+        with _span('vim variable update'):
+            for msg in messages:
+                vim_helpers.toVimDict(msg, '_dict')
+                vim.command("let {0} += [{1}]".format(vim_var, '_dict'))
+                vim.command("unlet! _dict")
+
+    def _iterProjectMessages(self, project_file):
+        """
+        Yields (path, messages) for every source on the project as soon as
+        they're available. If the server can't stream them, request them in
+        chunks of paths found on the project file
+        """
+        items = RequestProjectMessages(
+            project_file=project_file).sendStreamingRequest()
+
+        if items is not None:
+            for item in items:
+                yield item['path'], item.get('messages', [])
+            return
+
+        self._logger.info("Server can't stream project messages, requesting "
+                          "by path instead")
+
+        paths = [source.path for source in
+                 project_file_reader.getSources(project_file)]
+
+        for path, messages in self._iterMessagesByPaths(project_file, paths):
+            yield path, messages
+
+    def _iterMessagesByPaths(self, project_file, paths):
+        """
+        Yields (path, messages) for every path, requesting them in chunks
+        """
+        paths = list(paths)
+        while paths:
+            size = _PROJECT_MESSAGES_CHUNK_SIZE if self._batch_supported else 1
+            chunk, paths = paths[:size], paths[size:]
+
+            messages_by_path = self._requestMessages(project_file, chunk)
+            if messages_by_path is None:
+                return
+
+            # Requeue the ones left out if only the first path could be
+            # requested
+            paths = [x for x in chunk[1:] if x not in messages_by_path] + \
+                    paths
+
+            for path in chunk:
+                if path in messages_by_path:
+                    yield path, messages_by_path[path]
+
+    def _appendToQuickfix(self, path, messages):  # pylint: disable=no-self-use
+        """
+        Appends messages to the quickfix list
+        """
+        records = _sortBuildMessages(
+            [_toVimMessage(msg, path) for msg in messages])
+        vim.command("call setqflist({0}, 'a')".format(
+            vim_helpers.toVimLiteral(records)))
 
-        for msg in _sortBuildMessages(messages):
-            vim_helpers.toVimDict(msg, '_dict')
-            vim.command("let {0} += [{1}]".format(vim_var, '_dict'))
-            vim.command("unlet! _dict")
+    def _streamProjectMessages(self, project_file):
+        """
+        Appends messages for the project sources to the quickfix list as
+        they're received. Runs on a separate thread
+        """
+        paths = 0
+        count = 0
+        try:
+            for path, messages in self._iterProjectMessages(project_file):
+                paths += 1
+                if messages:
+                    count += len(messages)
+                    self._runOnMainThread(self._appendToQuickfix, path,
+                                          messages)
+        # Connection dropped (requests' exceptions are IOErrors) or the
+        # server sent something that isn't JSON
+        except (IOError, ValueError) as exc:
+            self._logger.exception("Error getting project diagnostics")
+            self._runOnMainThread(
+                vim_helpers.postVimWarning,
+                "Project diagnostics interrupted after %d source(s): %s" %
+                (paths, exc))
+            return
+
+        self._runOnMainThread(
+            vim_helpers.postVimInfo,
+            "Project diagnostics done: %d message(s) from %d source(s)" %
+            (count, paths))
+
+    @_traced
+    def getProjectDiagnostics(self):
+        """
+        Populates the quickfix list with messages for all sources on the
+        project. Messages are appended as soon as the server produces them
+        """
+        if not self._isServerAlive():
+            return
 
+        project_file = vim_helpers.getProjectFile()
+        if project_file is None:
+            vim_helpers.postVimWarning(
+                "No project file set, can't get project diagnostics")
+            return
+
+        vim.command("call setqflist([], 'r')")
+        vim_helpers.postVimInfo("Getting project diagnostics...")
+        self._startBackgroundJob(self._streamProjectMessages, project_file)
+
+    @_traced
     def requestUiMessages(self, event):
         """Retrieves UI messages from the server and post them with the
         appropriate severity level"""
-        self._logger.info("Handling event '%s'. Filetype is %s",
+        self._logger.debug("Handling event '%s'. Filetype is %s",
                           event, vim.eval('&filetype'))
         self._postQueuedMessages()
 
@@ -289,6 +1350,7 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
         request.sendRequestAsync(self._handleAsyncRequest)
 
+    @_traced
     def getVimhdlInfo(self):
         """
         Gets info about the current project and hdlcc server
@@ -298,39 +1360,184 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
         response = request.sendRequest()
 
+        info = ["vimhdl version: %s\n" % vimhdl.__version__]
+
         if response is not None:
             # The server has responded something, so just print it
             self._logger.info("Response: %s", str(response.json()['info']))
+            info += response.json()['info']
+        else:
+            info += ["hdlcc server is not running"]
 
-            return "\n".join(
-                ["- %s" % x for x in
-                 ["vimhdl version: %s\n" % vimhdl.__version__] +
-                 response.json()['info']])
+        if BaseRequest.recorder is not None:
+            info += ["Trace file: %s" % BaseRequest.recorder.path]
+
+        lines = ["- %s" % x for x in info]
+
+        # Output that hasn't been redirected to the log files, usually
+        # errors before the server is up
+        output = list(self._server_output)
+        if output:
+            lines += ["- Recent server output:"]
+            lines += ["    %s" % x for x in output]
+
+        return "\n".join(lines)
+
+    def exportTrace(self, path):
+        """
+        Writes the trace of the current session to path in Chrome's trace
+        event format. The trace is converted in the background
+        """
+        recorder = BaseRequest.recorder
+        if recorder is None:
+            vim_helpers.postVimWarning(
+                "Tracing is disabled, see :help 'g:vimhdl_trace'")
+            return
 
-        return "\n".join(
-            ["- %s" % x for x in
-             ["vimhdl version: %s\n" % vimhdl.__version__,
-              "hdlcc server is not running"]])
+        recorder.flush()
+        self._startBackgroundJob(self._exportTrace, recorder.path,
+                                 p.abspath(p.expanduser(path)))
 
+    def _exportTrace(self, trace_path, path):
+        """
+        Converts the trace on trace_path and writes it to path. Runs on a
+        separate thread
+        """
+        try:
+            header, records = readTrace(trace_path)
+            with AtomicFile(path) as fd:
+                json.dump(toChromeTrace(header, records), fd)
+        except (IOError, OSError, ValueError) as exc:
+            self._logger.exception("Unable to export trace")
+            self._runOnMainThread(vim_helpers.postVimWarning,
+                                  "Unable to export trace: %s" % exc)
+            return
+
+        self._runOnMainThread(vim_helpers.postVimInfo,
+                              "Trace written to %s" % path)
+
+    def _setProgress(self, text):
+        """
+        Updates the progress text shown on the statusline
+        """
+        self._progress = text
+        vim.vars['vimhdl_progress'] = text
+        # g:vimhdl_progress may be shown directly even if the status didn't
+        # change
+        if not self._updateStatus():
+            vim.command('redrawstatus!')
+
+    def _runRebuild(self, request, cancel):
+        """
+        Sends the rebuild request and handles progress and messages streamed
+        by the server until done or cancelled. Runs on a separate thread
+        """
+        items = request.sendStreamingRequest()
+
+        if items is None:
+            self._runOnMainThread(self._onRebuildDone, cancel,
+                                  "Unable to rebuild, hdlcc server is not "
+                                  "responding")
+            return
+
+        count = 0
+        try:
+            for item in items:
+                if cancel.is_set():
+                    break
+
+                if 'total' in item:
+                    progress = "vimhdl: rebuilding %d/%d" % (
+                        item.get('compiled', 0), item['total'])
+                    if item.get('library'):
+                        progress += " (%s)" % item['library']
+                    self._runOnMainThread(self._onRebuildEvent, cancel,
+                                          self._setProgress, progress)
+
+                if item.get('path') and item.get('messages'):
+                    count += len(item['messages'])
+                    self._runOnMainThread(self._onRebuildEvent, cancel,
+                                          self._appendToQuickfix,
+                                          item['path'], item['messages'])
+        # Read timed out, the connection dropped (requests' exceptions are
+        # IOErrors) or the server sent something that isn't JSON. Aborting
+        # a cancelled rebuild may also end up here
+        except (IOError, ValueError) as exc:
+            if not cancel.is_set():
+                self._logger.warning("Error rebuilding project: %s", exc)
+                self._runOnMainThread(self._onRebuildDone, cancel,
+                                      "Project rebuild interrupted: %s" % exc)
+            return
+        finally:
+            items.close()
+
+        self._runOnMainThread(self._onRebuildDone, cancel,
+                              "Project rebuild done: %d message(s)" % count)
+
+    def _onRebuildEvent(self, cancel, func, *args):  # pylint: disable=no-self-use
+        """
+        Calls func with args unless the rebuild has been cancelled since
+        the event was scheduled
+        """
+        if not cancel.is_set():
+            func(*args)
+
+    def _onRebuildDone(self, cancel, message):
+        """
+        Clears the rebuild progress and posts message unless the rebuild has
+        been cancelled
+        """
+        if cancel.is_set() or cancel is not self._rebuild_cancel:
+            return
+        self._rebuild_cancel = None
+        self._rebuild_request = None
+        self._setProgress('')
+        vim_helpers.postVimInfo(message)
+
+    @_traced
     def rebuildProject(self):
         """
-        Rebuilds the current project
+        Rebuilds the current project in the background. Progress is shown
+        on the statusline and messages are added to the quickfix list as
+        they're received
         """
         if vim.eval('&filetype') not in ('vhdl', 'verilog', 'systemverilog'):
             vim_helpers.postVimWarning("Not a VHDL file, can't rebuild")
             return
 
+        if self._rebuild_cancel is not None:
+            vim_helpers.postVimWarning("Project rebuild is already running")
+            return
+
         vim_helpers.postVimInfo("Rebuilding project...")
         project_file = vim_helpers.getProjectFile()
-        request = RequestProjectRebuild(project_file=project_file)
 
-        response = request.sendRequest()
+        vim.command("call setqflist([], 'r')")
+        self._rebuild_cancel = Event()
+        self._rebuild_request = RequestProjectRebuild(
+            project_file=project_file)
+        self._setProgress("vimhdl: rebuilding")
+        self._startBackgroundJob(self._runRebuild, self._rebuild_request,
+                                 self._rebuild_cancel)
 
-        if response is None:
-            return "hdlcc server is not running"
+    @_traced
+    def cancelRebuild(self):
+        """
+        Stops waiting for the project rebuild. The server will carry on
+        building, but results will be ignored
+        """
+        if self._rebuild_cancel is None:
+            vim_helpers.postVimInfo("No project rebuild is running")
+            return
 
-        self._logger.info("Response: %s", repr(response))
+        self._rebuild_cancel.set()
+        self._rebuild_request.abort()
+        self._rebuild_cancel = None
+        self._rebuild_request = None
+        self._setProgress('')
+        vim_helpers.postVimInfo("Project rebuild cancelled")
 
+    @_traced
     def onBufferVisit(self):
         """
         Notifies the hdlcc server that Vim user has entered the current
@@ -342,12 +1549,14 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
             return
 
         project_file = vim_helpers.getProjectFile()
+        self._startWatcher(project_file)
 
         request = OnBufferVisit(project_file=project_file,
                                 path=vim.current.buffer.name)
 
         request.sendRequestAsync(self._handleAsyncRequest)
 
+    @_traced
     def onBufferLeave(self):
         """
         Notifies the hdlcc server that Vim user has left the current
@@ -365,6 +1574,7 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
         request.sendRequestAsync(self._handleAsyncRequest)
 
+    @_traced
     def getDependencies(self):
         """
         Gets the dependencies for a given path
@@ -389,6 +1599,7 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
         return "Source has no dependencies"
 
+    @_traced
     def getBuildSequence(self):
         """
         Gets the build sequence for the current path
@@ -419,16 +1630,283 @@ class VimhdlClient:  #pylint: disable=too-many-instance-attributes
 
         return ""
 
+    def _loadGeneratorCache(self, cache_file):
+        """
+        Returns the cached project file generator results or an empty dict
+        if there are none
+        """
+        if cache_file is None:
+            return {}
+        try:
+            with open(cache_file) as fd:
+                return json.load(fd)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _saveGeneratorCache(self, cache_file, cache):
+        """
+        Saves the project file generator results to cache_file
+        """
+        if cache_file is None:
+            return
+        try:
+            with AtomicFile(cache_file) as fd:
+                fd.write(json.dumps(cache))
+        except (IOError, OSError):
+            self._logger.exception("Unable to write %s", cache_file)
+
+    def _iterConfigGeneratorLines(self, paths):
+        """
+        Yields chunks of the project file generated for paths as the server
+        sends them or returns None if the server could not be reached.
+        Servers that can't stream send the whole content at once, which is
+        then split into chunks
+        """
+        items = RunConfigGenerator(generator='SimpleFinder',
+                                   paths=paths).sendStreamingRequest()
+        if items is None:
+            return None
+
+        def iterLines():
+            """
+            Lines from streamed ('lines') or complete ('content') responses
+            """
+            for item in items:
+                if 'lines' in item:
+                    for line in item['lines']:
+                        yield line
+                else:
+                    for line in item.get('content', '').splitlines():
+                        yield line
+
+        return _iterChunks(iterLines(), _GENERATOR_CHUNK_SIZE)
+
+    def _runConfigGenerator(self, paths, cache_file, on_lines):
+        """
+        Gets the project file contents for paths from the server unless
+        none of the directories or sources found on paths changed since the
+        last run. Contents are passed to on_lines in chunks as soon as
+        they're available. Returns True if the contents are complete
+        """
+        cache = self._loadGeneratorCache(cache_file)
+        fingerprint = None
+        content_file = None
+
+        if cache_file is not None:
+            content_file = p.join(p.dirname(cache_file), 'sources.prj')
+            scanner = TreeScanner(cache.get('listings'))
+            start = time.time()
+            fingerprint = scanner.scan([p.abspath(x) for x in paths])
+            self._logger.debug("Scanning %s took %.3fs", paths,
+                               time.time() - start)
+            cache['listings'] = scanner.listings
+
+        done = False
+        try:
+            if fingerprint is not None and \
+                    cache.get('fingerprint') == fingerprint and \
+                    p.exists(content_file):
+                self._logger.info("Sources on %s haven't changed, reusing "
+                                  "previous results", paths)
+                with open(content_file) as fd:
+                    for chunk in _iterChunks((x.rstrip('\n') for x in fd),
+                                             _GENERATOR_CHUNK_SIZE):
+                        on_lines(chunk)
+                done = True
+                return done
+
+            chunks = self._iterConfigGeneratorLines(paths)
+            if chunks is None:
+                return done
+
+            # Results are only cached once complete
+            cache.pop('fingerprint', None)
+            fd = None
+            if content_file is not None:
+                fd = AtomicFile(content_file)
+
+            try:
+                for chunk in chunks:
+                    if fd is not None:
+                        fd.write('\n'.join(chunk) + '\n')
+                    on_lines(chunk)
+
+                if fd is not None:
+                    fd.commit()
+                    cache['fingerprint'] = fingerprint
+                    fd = None
+            finally:
+                # Not committed, so the stream was interrupted
+                if fd is not None:
+                    fd.discard()
+
+            done = True
+        finally:
+            self._saveGeneratorCache(cache_file, cache)
+
+        return done
+
+    def _createProjectFile(self, paths, cache_file):
+        """
+        Runs the project file generator, passing its output to the main
+        thread as soon as it's available. Runs on a separate thread
+        """
+        done = False
+        try:
+            done = self._runConfigGenerator(
+                paths, cache_file,
+                lambda chunk: self._runOnMainThread(
+                    self._onConfigGeneratorLines, chunk))
+        finally:
+            self._runOnMainThread(self._onConfigGeneratorDone, done)
+
+    def _updateProjectFile(self, paths, cache_file, project_file, cwd):
+        """
+        Runs the project file generator and updates the contents of
+        project_file with the sources added, removed or moved. Runs on a
+        separate thread
+        """
+        lines = None
+        changes = None
+        try:
+            generated = []
+            if not self._runConfigGenerator(paths, cache_file,
+                                            generated.extend):
+                return
+
+            with open(project_file) as fd:
+                existing = [line.rstrip('\r\n') for line in fd]
+
+            # The modeline is added back when saving
+            while existing and \
+                    existing[-1].strip() in ('', '# vim: filetype=vimhdl'):
+                existing.pop()
+
+            lines, changes = project_file_reader.updateSources(
+                existing, p.dirname(project_file), generated, cwd, paths)
+        finally:
+            self._runOnMainThread(self._onProjectFileUpdated, project_file,
+                                  lines, changes)
+
+    def _onConfigGeneratorLines(self, lines):
+        """
+        Adds lines to the project file being generated, opening it for
+        editing on the first chunk
+        """
+        if not self._generator_started:
+            self._generator_started = True
+            self.helper_wrapper.start()
+
+        self.helper_wrapper.append(lines)
+        self._generator_lines += len(lines)
+        self._setProgress("vimhdl: searching for sources (%d lines)" %
+                          self._generator_lines)
+
+    def _onConfigGeneratorDone(self, done):
+        """
+        Completes the project file generated or warns if the server could
+        not generate it
+        """
+        self._generator_running = False
+        self._setProgress('')
+        if not done:
+            vim_helpers.postVimWarning(
+                "Unable to create project file, hdlcc server is not "
+                "responding")
+            # What has been generated so far is incomplete and must not
+            # replace the existing project file
+            if self._generator_started:
+                self.helper_wrapper.discard()
+            return
+
+        if not self._generator_started:
+            self.helper_wrapper.start()
+        self.helper_wrapper.finish()
+
+    def _getGeneratorCacheFile(self, paths):
+        """
+        Returns the file to cache project file generator results for paths
+        or None if caching is disabled
+        """
+        root = vim_helpers.getVimGlobal('vimhdl_cache_dir',
+                                        cache_dir.getDefaultCacheRoot())
+        if not root:
+            return None
+        try:
+            return cache_dir.getGeneratorCacheFile(p.expanduser(root), paths)
+        except OSError:
+            self._logger.exception("Unable to create cache directory")
+            return None
+
+    def _onProjectFileUpdated(self, project_file, lines, changes):
+        """
+        Opens the updated project_file for review or tells the user if
+        there's nothing to update
+        """
+        self._generator_running = False
+        self._setProgress('')
+        if lines is None:
+            vim_helpers.postVimWarning(
+                "Unable to update project file, hdlcc server is not "
+                "responding")
+            return
+
+        added, removed, moved = changes
+        if not added and not removed and not moved:
+            vim_helpers.postVimInfo("Project file is up to date")
+            return
+
+        self.helper_wrapper.run(
+            '\n'.join(lines),
+            notes=["Sources added: %d, removed: %d, moved: %d" %
+                   (added, removed, moved),
+                   "Removed sources have been commented out and new ones "
+                   "added to the end"],
+            project_file=project_file)
+
+    @_traced
     def updateHelperWrapper(self):
         """
-        Requests the config file content from the server and return the wrapper
-        class
+        Requests the config file content from the server in the background
+        and opens it for editing via the wrapper class when done
         """
+        if self._generator_running:
+            vim_helpers.postVimWarning("Project file generator is already "
+                                       "running")
+            return
+
         paths = vim.eval('b:local_arg') or ['.', ]
+        cache_file = self._getGeneratorCacheFile(paths)
 
-        request = RunConfigGenerator(generator='SimpleFinder', paths=paths)
-        response = request.sendRequest()
-        if response is None:
+        self._generator_running = True
+        self._generator_started = False
+        self._generator_lines = 0
+        self._setProgress("vimhdl: searching for sources")
+        self._startBackgroundJob(self._createProjectFile, paths, cache_file)
+
+    @_traced
+    def updateProjectFile(self):
+        """
+        Updates the current project file with sources added, removed or
+        moved on the paths the generator searches and opens the result for
+        review via the wrapper class
+        """
+        if self._generator_running:
+            vim_helpers.postVimWarning("Project file generator is already "
+                                       "running")
             return
 
-        self.helper_wrapper.run(response.json()['content'])
+        project_file = vim_helpers.getProjectFile()
+        if project_file is None or not p.exists(project_file):
+            vim_helpers.postVimWarning(
+                "No project file to update, use VimhdlCreateProjectFile to "
+                "create one")
+            return
+
+        paths = vim.eval('b:local_arg') or ['.', ]
+        cache_file = self._getGeneratorCacheFile(paths)
+
+        self._generator_running = True
+        self._setProgress("vimhdl: updating project file")
+        self._startBackgroundJob(self._updateProjectFile, paths, cache_file,
+                                 p.abspath(project_file), os.getcwd())
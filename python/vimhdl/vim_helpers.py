@@ -16,6 +16,7 @@
 # along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
 "Misc helpers for common vim-hdl operations"
 
+import json
 import logging
 import os.path as p
 import socket
@@ -65,6 +66,16 @@ def toVimDict(obj, vim_variable):
             key = _escapeForVim(key)
         vim.command("let {0}['{1}'] = '{2}'".format(vim_variable, key, value))
 
+def toVimLiteral(obj):
+    """
+    Returns a Vim expression equivalent to 'obj', which must be made of
+    lists, dicts, strings and numbers only. JSON encoded strings use double
+    quotes and backslash escapes, which Vim understands as well, so this
+    is much faster than assigning items one by one when handling large
+    amounts of data
+    """
+    return json.dumps(obj)
+
 def postVimInfo(message):
     """
     These were "Borrowed" from YCM.
@@ -124,14 +135,24 @@ def _getBufferVars(vbuffer=None, var=None):
         return vbuffer.vars
     return vbuffer.vars[var]
 
-def getProjectFile():
+def getVimGlobal(name, default=None):
+    """
+    Returns the value of g:<name> as returned by vim.eval (so numbers are
+    returned as strings) or default if the variable doesn't exist
+    """
+    if not int(vim.eval("exists('g:{0}')".format(name))):
+        return default
+    return vim.eval('g:' + name)
+
+def getProjectFile(vbuffer=None):
     """
     Searches for a valid hdlcc configuration file in buffer vars (i.e.,
-    inside b:) then in global vars (i.e., inside g:)
+    inside b:) then in global vars (i.e., inside g:). Buffer vars are taken
+    from the current buffer unless vbuffer is given
     """
-    if 'vimhdl_conf_file' in _getBufferVars():
+    if 'vimhdl_conf_file' in _getBufferVars(vbuffer):
         conf_file = p.abspath(p.expanduser(
-            _getBufferVars(var='vimhdl_conf_file')))
+            _getBufferVars(vbuffer, 'vimhdl_conf_file')))
         if p.exists(p.dirname(conf_file)) and p.exists(conf_file):
             return conf_file
 
@@ -147,7 +168,7 @@ def getProjectFile():
         _logger.debug("Global config file '%s' is set but not "
                       "readable", conf_file)
 
-    _logger.info("Couldn't find a valid config file")
+    _logger.debug("Couldn't find a valid config file")
     return None
 
 # See YouCompleteMe/python/ycm/vimsupport.py